@@ -0,0 +1,178 @@
+# bench_compresion.py
+# Compresión extractiva del texto extraído de URLs: ratio de tokens, tiempo
+# de compresión y deriva del veredicto sobre un conjunto local de artículos.
+#
+# Sin red, la deriva se mide en lo que decide el propio backend con el texto:
+# si la afirmación clave sobrevive, si cambia el tipo de contenido, qué modo
+# auto se usa (se elige con el texto sin comprimir, como en los endpoints) y
+# cuál se habría elegido con el comprimido, y el veredicto de un verificador
+# simulado por palabras clave. Con --real se compara además el veredicto de
+# Gemini (necesita GEMINI_API_KEY) y el resultado de FactCheck con el texto
+# completo y el comprimido.
+#
+# Uso: python bench_compresion.py [presupuesto_tokens] [--real]
+import sys
+import time
+import statistics
+
+from services.compresion_texto import combinar_con_extraido, combinar_sin_comprimir, comprimir_texto, estimar_tokens
+from services.hybrid_verifier import _detectar_tipo_contenido, _elegir_modo_inteligente
+from services.niveles_gemini import elegir_nivel
+
+PRESUPUESTO = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else None
+REAL = "--real" in sys.argv
+REPETICIONES = 200
+
+RELLENO = (
+    "Utilizamos cookies propias y de terceros para mejorar tu experiencia. "
+    "Suscríbete a nuestra newsletter y recibe las noticias más importantes del día. "
+    "Te puede interesar: las diez recetas más fáciles para el verano. "
+    "Compartir en Facebook Compartir en Twitter Enviar por correo electrónico. "
+    "Todos los derechos reservados. Política de privacidad y aviso legal. "
+)
+
+# (texto del usuario, artículo extraído, frase con la afirmación que hay que verificar)
+FIXTURES = [
+    (
+        "",
+        "El Gobierno aprobó ayer una subida del 8,5% de las pensiones contributivas para el próximo año. "
+        "La medida beneficiará a casi 10 millones de pensionistas, según informó el Ministerio de Inclusión. "
+        "La portavoz explicó que la revalorización se financiará con cargo a los presupuestos. "
+        "Los sindicatos celebraron la noticia aunque pidieron más ayudas a la vivienda. "
+        "La oposición criticó que la medida llega tarde. " + RELLENO * 3,
+        "subida del 8,5% de las pensiones",
+    ),
+    (
+        "¿Es verdad que la Gran Muralla se ve desde el espacio?",
+        "Es una de las creencias más extendidas sobre las maravillas del mundo. "
+        "Muchos libros de texto repitieron durante décadas que la Gran Muralla China es visible desde la Luna. "
+        "El astronauta Yang Liwei declaró en 2003 que no pudo verla a simple vista desde la órbita. "
+        "La NASA confirmó que la muralla es demasiado estrecha para distinguirse sin ayuda óptica. "
+        "Aun así el mito sigue circulando en redes. " + RELLENO * 4,
+        "Yang Liwei declaró en 2003",
+    ),
+    (
+        "",
+        RELLENO +
+        "Un estudio publicado en la revista Nature asegura que el consumo de café reduce un 15% el riesgo de infarto. "
+        "Los investigadores de la Universidad de Harvard siguieron a 200.000 personas durante 20 años. "
+        "Los autores advirtieron que la relación no implica causalidad. "
+        "El café es una de las bebidas más consumidas del planeta. "
+        "Hay muchas formas de prepararlo en casa. " + RELLENO * 3,
+        "reduce un 15% el riesgo de infarto",
+    ),
+    (
+        "vacuna covid infertilidad",
+        "Circula por WhatsApp una cadena que afirma que la vacuna contra la covid provoca infertilidad. "
+        "La Organización Mundial de la Salud negó cualquier relación entre las vacunas y la fertilidad. "
+        "Varios estudios con más de 40.000 mujeres no encontraron diferencias en las tasas de embarazo. "
+        "Los expertos recomiendan consultar fuentes oficiales antes de compartir este tipo de mensajes. "
+        "Es un bulo que ya se desmintió en 2021. " + RELLENO * 4,
+        "la vacuna contra la covid provoca infertilidad",
+    ),
+    (
+        "",
+        "Última hora: el presidente anunció que las elecciones se celebrarán el 12 de mayo de 2027. "
+        "La decisión se tomó tras una reunión del Consejo de Ministros que se prolongó durante horas. "
+        "Fuentes del partido aseguraron que la fecha busca coincidir con las elecciones autonómicas. "
+        "Los mercados reaccionaron con calma. Hacía sol en la capital. " + RELLENO * 3,
+        "elecciones se celebrarán el 12 de mayo de 2027",
+    ),
+    (
+        "Einstein suspendió matemáticas",
+        "Albert Einstein nació en Ulm en 1879. "
+        "Una anécdota muy repetida dice que suspendió matemáticas en el colegio. "
+        "El propio Einstein desmintió el rumor en 1935 y aseguró que dominaba el cálculo antes de los 15 años. "
+        "Sus notas del instituto de Aarau muestran la máxima calificación en álgebra y geometría. "
+        "El bulo pudo nacer de un cambio en la escala de notas suiza. " + RELLENO * 3,
+        "desmintió el rumor en 1935",
+    ),
+]
+
+# Señales del verificador simulado: desmentidos y confirmaciones que tienen
+# que sobrevivir a la compresión para que el veredicto no cambie
+SENALES_FALSO = ["bulo", "desmintió", "desmiente", "negó", "mito", "no pudo", "no encontraron", "demasiado estrecha"]
+SENALES_VERDADERO = ["aprobó", "confirmó", "informó", "anunció", "publicado", "según"]
+
+def comprimir(texto: str, extraido: str) -> str:
+    if PRESUPUESTO is None:
+        return combinar_con_extraido(texto, extraido)
+    extraido, _ = comprimir_texto(extraido, PRESUPUESTO)
+    return combinar_sin_comprimir(texto, extraido)
+
+def veredicto_simulado(texto: str) -> str:
+    """Veredicto determinista sin red: pesa desmentidos contra confirmaciones"""
+    texto = texto.lower()
+    falso = sum(texto.count(senal) for senal in SENALES_FALSO)
+    verdadero = sum(texto.count(senal) for senal in SENALES_VERDADERO)
+    if falso > verdadero:
+        return "probablemente_falso"
+    if verdadero > falso:
+        return "probablemente_verdadero"
+    return "mixto" if falso else "no_verificable"
+
+def veredicto_gemini(texto: str):
+    from services.gemini_analyzer import analizar_con_gemini
+    resultado = analizar_con_gemini(texto, nivel="completo")
+    return resultado.get("resultado") if resultado.get("success") else "error"
+
+def resultado_factcheck(texto: str):
+    from services.factcheck_api import consultar_factcheck
+    resultado = consultar_factcheck(texto)
+    return resultado.get("resultado") if resultado.get("success") else "error"
+
+def main():
+    ratios, tiempos = [], []
+    derivas_tipo = derivas_modo = derivas_nivel = derivas_simuladas = perdidas = 0
+    derivas_reales = {"gemini": 0, "factcheck": 0}
+
+    print(f"{'#':>2} {'tokens':>13} {'ratio':>6} {'clave':>6} {'tipo':>28} {'modo':>16} {'veredicto simulado':>48}")
+    for numero, (texto, extraido, clave) in enumerate(FIXTURES, 1):
+        completo = combinar_sin_comprimir(texto, extraido)
+
+        comprimido = comprimir(texto, extraido)
+        inicio = time.perf_counter()
+        for _ in range(REPETICIONES):
+            comprimir(texto, extraido)
+        tiempos.append((time.perf_counter() - inicio) / REPETICIONES * 1e6)
+
+        ratio = estimar_tokens(comprimido) / estimar_tokens(completo)
+        ratios.append(ratio)
+        conservada = clave in comprimido
+        perdidas += not conservada
+        tipo = (_detectar_tipo_contenido(completo), _detectar_tipo_contenido(comprimido))
+        modo = _elegir_modo_inteligente(completo)
+        modo_si_comprimido = _elegir_modo_inteligente(comprimido)
+        veredicto = (veredicto_simulado(completo), veredicto_simulado(comprimido))
+        derivas_tipo += tipo[0] != tipo[1]
+        derivas_modo += modo != modo_si_comprimido
+        derivas_simuladas += veredicto[0] != veredicto[1]
+        # El nivel de Gemini sí se elige con el texto que se le envía
+        derivas_nivel += elegir_nivel(completo) != elegir_nivel(comprimido)
+
+        print(f"{numero:>2} {estimar_tokens(completo):>5} → {estimar_tokens(comprimido):>5} {ratio:>6.2f} "
+              f"{'✅' if conservada else '❌':>5} {' → '.join(tipo):>28} "
+              f"{modo + ('' if modo == modo_si_comprimido else '*'):>16} {' → '.join(veredicto):>48}")
+
+        if REAL:
+            for nombre, consultar in (("gemini", veredicto_gemini), ("factcheck", resultado_factcheck)):
+                antes, despues = consultar(completo), consultar(comprimido)
+                derivas_reales[nombre] += antes != despues
+                print(f"   {nombre}: {antes} → {despues}{'' if antes == despues else '  ⚠️ deriva'}")
+
+    total = len(FIXTURES)
+    print(f"\n✂️ Ratio de tokens medio: {statistics.mean(ratios):.2f} (ahorro {1 - statistics.mean(ratios):.0%})")
+    print(f"⏱️ Compresión: {statistics.mean(tiempos):.0f} µs/texto")
+    print(f"🎯 Afirmación clave conservada: {total - perdidas}/{total}")
+    print(f"🧭 Deriva del tipo de contenido: {derivas_tipo}/{total}")
+    print(f"🛣️ Modo auto elegido con el texto sin comprimir: sin deriva "
+          f"(con el comprimido habría cambiado en {derivas_modo}/{total}, marcados con *)")
+    print(f"🪜 Deriva del nivel inicial de Gemini: {derivas_nivel}/{total}")
+    print(f"⚖️ Deriva del veredicto simulado: {derivas_simuladas}/{total}")
+    if REAL:
+        print(f"🔎 Deriva del veredicto: Gemini {derivas_reales['gemini']}/{total} · FactCheck {derivas_reales['factcheck']}/{total}")
+    else:
+        print("ℹ️ Añade --real para comparar veredictos de Gemini y FactCheck")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench_historial.py
+# Benchmark de /historial: paginación antigua (OFFSET/LIMIT + COUNT completo,
+# sin índices) frente a la paginación por cursor con índices compuestos.
+#
+# Uso: python bench_historial.py [filas] [usuarios]
+# Por defecto usa una BD SQLite temporal; con BENCH_DATABASE_URL se puede
+# apuntar a una BD PostgreSQL vacía de pruebas.
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+os.environ["DATABASE_URL"] = os.getenv(
+    "BENCH_DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bench_historial.db"
+)
+
+from sqlalchemy import func, text
+from database import engine, SessionLocal, Base, ConsultaNoticia, TextoConsulta
+from services.historial import consultar_historial, codificar_cursor
+
+FILAS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+USUARIOS = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+LOTE = 50_000
+REPETICIONES = 5
+USUARIO_INTENSIVO = "usuario-intensivo"
+
+def poblar() -> None:
+    Base.metadata.drop_all(bind=engine, tables=[ConsultaNoticia.__table__])
+    Base.metadata.create_all(bind=engine, tables=[TextoConsulta.__table__, ConsultaNoticia.__table__])
+    # Partimos sin los índices nuevos para medir el camino antiguo tal cual
+    with engine.begin() as conn:
+        for indice in ConsultaNoticia.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {indice.name}"))
+
+    random.seed(42)
+    inicio_fechas = datetime.utcnow() - timedelta(days=365)
+    paso = timedelta(days=365) / FILAS
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        for base in range(0, FILAS, LOTE):
+            filas = []
+            for i in range(base, min(base + LOTE, FILAS)):
+                # ~2% de las consultas son de un único usuario muy activo
+                usuario = USUARIO_INTENSIVO if random.random() < 0.02 else f"usuario-{random.randrange(USUARIOS)}"
+                filas.append({
+                    "texto_consultado": f"Afirmación de prueba {i}",
+                    "resultado": random.choice(("verificado", "no_encontrado", "mixto", "falso")),
+                    "fecha_consulta": inicio_fechas + paso * i,
+                    "usuario_id": usuario,
+                    "respuesta_api": "{}"
+                })
+            conn.execute(ConsultaNoticia.__table__.insert(), filas)
+    print(f"📦 {FILAS:,} filas insertadas en {time.perf_counter() - inicio:.0f}s")
+
+def crear_indices() -> None:
+    inicio = time.perf_counter()
+    for indice in ConsultaNoticia.__table__.indexes:
+        indice.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"🗂️ Índices compuestos creados en {time.perf_counter() - inicio:.0f}s")
+
+def historial_antiguo(db, limit: int, offset: int, usuario_id=None) -> None:
+    """Copia de la implementación anterior de /historial"""
+    query = db.query(ConsultaNoticia)
+    if usuario_id:
+        query = query.filter(ConsultaNoticia.usuario_id == usuario_id)
+    query.order_by(ConsultaNoticia.fecha_consulta.desc()).offset(offset).limit(limit).all()
+    query.count()
+
+def cursor_en(db, offset: int, usuario_id=None):
+    """Cursor equivalente a la página que empieza en `offset` (no se mide)"""
+    if offset == 0:
+        return None
+    query = db.query(ConsultaNoticia.fecha_consulta, ConsultaNoticia.id)
+    if usuario_id:
+        query = query.filter(ConsultaNoticia.usuario_id == usuario_id)
+    fila = query.order_by(ConsultaNoticia.fecha_consulta.desc(), ConsultaNoticia.id.desc())\
+        .offset(offset - 1).limit(1).first()
+    return codificar_cursor(fila.fecha_consulta, fila.id)
+
+def medir(funcion) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+def main():
+    poblar()
+    db = SessionLocal()
+    intensivas = db.query(func.count(ConsultaNoticia.id))\
+        .filter(ConsultaNoticia.usuario_id == USUARIO_INTENSIVO).scalar()
+    escenarios = [
+        ("global, página 1", 0, None),
+        ("global, offset 100k", 100_000, None),
+        (f"global, offset {FILAS // 2:,}", FILAS // 2, None),
+        ("usuario normal, página 1", 0, "usuario-7"),
+        ("usuario intensivo, página 1", 0, USUARIO_INTENSIVO),
+        (f"usuario intensivo, offset {intensivas // 2:,}", intensivas // 2, USUARIO_INTENSIVO),
+    ]
+
+    antes = {nombre: medir(lambda: historial_antiguo(db, 20, offset, usuario))
+             for nombre, offset, usuario in escenarios}
+
+    crear_indices()
+    despues_antiguo = {nombre: medir(lambda: historial_antiguo(db, 20, offset, usuario))
+                       for nombre, offset, usuario in escenarios}
+    nuevo = {}
+    for nombre, offset, usuario in escenarios:
+        cursor = cursor_en(db, offset, usuario)
+        nuevo[nombre] = medir(lambda: consultar_historial(db, limit=20, cursor=cursor, usuario_id=usuario))
+    db.close()
+
+    print(f"\n{'escenario':<36}{'antiguo':>12}{'antiguo+idx':>14}{'cursor+idx':>13}")
+    for nombre, _, _ in escenarios:
+        print(f"{nombre:<36}{antes[nombre]:>10.1f}ms{despues_antiguo[nombre]:>12.1f}ms{nuevo[nombre]:>11.1f}ms")
+
+if __name__ == "__main__":
+    main()
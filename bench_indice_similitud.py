@@ -0,0 +1,74 @@
+# bench_indice_similitud.py
+# Benchmark del índice de casi-duplicados: tiempo de construcción, memoria,
+# latencia de búsqueda y recall sobre variantes de cadenas "reenviadas".
+#
+# Uso: python bench_indice_similitud.py [consultas_almacenadas] [busquedas]
+import sys
+import time
+import random
+import resource
+import statistics
+
+from services.indice_similitud import IndiceCasiDuplicados, jaccard, DUP_UMBRAL
+
+ALMACENADAS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BUSQUEDAS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+random.seed(42)
+VOCABULARIO = [f"palabra{i}" for i in range(20000)]
+
+def afirmacion_aleatoria() -> str:
+    return " ".join(random.choices(VOCABULARIO, k=random.randint(15, 60)))
+
+def variante(texto: str, cambios: int = 1) -> str:
+    """Simula un reenvío: cambia unas pocas palabras del texto original"""
+    palabras = texto.split()
+    for _ in range(cambios):
+        palabras[random.randrange(len(palabras))] = random.choice(VOCABULARIO)
+    return " ".join(palabras)
+
+def memoria_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    indice = IndiceCasiDuplicados()
+    originales = {}
+    memoria_inicial = memoria_mb()
+
+    inicio = time.perf_counter()
+    for consulta_id in range(1, ALMACENADAS + 1):
+        texto = afirmacion_aleatoria()
+        indice.agregar(consulta_id, texto)
+        if consulta_id % max(1, ALMACENADAS // BUSQUEDAS) == 0:
+            originales[consulta_id] = texto
+    construccion = time.perf_counter() - inicio
+
+    print(f"📦 {len(indice)} consultas indexadas en {construccion:.1f}s "
+          f"({len(indice) / construccion:,.0f}/s), memoria +{memoria_mb() - memoria_inicial:.0f} MB")
+
+    latencias = []
+    aciertos = 0
+    sobre_umbral = 0
+    for consulta_id, texto in list(originales.items())[:BUSQUEDAS]:
+        consulta = variante(texto)
+        t = time.perf_counter()
+        candidatos = indice.buscar(consulta)
+        latencias.append((time.perf_counter() - t) * 1000)
+        if jaccard(consulta, texto) >= DUP_UMBRAL:
+            sobre_umbral += 1
+            if any(c == consulta_id for c, _ in candidatos):
+                aciertos += 1
+
+    latencias.sort()
+    p = lambda q: latencias[min(len(latencias) - 1, int(q * len(latencias)))]
+    print(f"🔍 {len(latencias)} búsquedas: p50 {p(0.50):.2f} ms, p95 {p(0.95):.2f} ms, "
+          f"p99 {p(0.99):.2f} ms, media {statistics.mean(latencias):.2f} ms")
+    print(f"🎯 Recall con Jaccard ≥ {DUP_UMBRAL}: {aciertos}/{sobre_umbral}")
+
+    inicio = time.perf_counter()
+    falsos = sum(1 for _ in range(BUSQUEDAS) if indice.buscar(afirmacion_aleatoria()))
+    print(f"🚫 Textos no relacionados con candidatos: {falsos}/{BUSQUEDAS} "
+          f"({(time.perf_counter() - inicio) / BUSQUEDAS * 1000:.2f} ms/búsqueda)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# bench_prompt_gemini.py
+# Benchmark del prompt de Gemini: coste de construirlo y tokens enviados por
+# petición con el prompt completo de antes (instrucciones + afirmación en cada
+# llamada) frente al prefijo estático del día más solo la afirmación.
+#
+# Sin clave los tokens se estiman (~4 caracteres por token). Con GEMINI_API_KEY
+# y --real se cuentan con count_tokens y se mide el tiempo hasta el primer
+# fragmento de respuesta (streaming) de unas pocas llamadas de cada tipo.
+#
+# Uso: python bench_prompt_gemini.py [construcciones] [--real [llamadas]]
+import os
+import sys
+import time
+import statistics
+from datetime import datetime
+
+from services.gemini_analyzer import (
+    MODELO_GEMINI,
+    GENERATION_CONFIG,
+    instrucciones_del_dia,
+    _construir_prompt,
+    get_client
+)
+
+CONSTRUCCIONES = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100_000
+REAL = "--real" in sys.argv
+LLAMADAS_REALES = int(sys.argv[sys.argv.index("--real") + 1]) if REAL and len(sys.argv) > sys.argv.index("--real") + 1 else 5
+
+AFIRMACIONES = [
+    "El agua hierve a 100 grados al nivel del mar",
+    "La Gran Muralla China se ve desde el espacio a simple vista",
+    "El gobierno aprobó ayer una subida del 20% de las pensiones",
+    "Einstein suspendió matemáticas en el colegio",
+    "Los murciélagos son ciegos",
+]
+
+def prompt_anterior(texto: str) -> str:
+    """El prompt tal y como se construía antes: instrucciones y fecha en cada llamada"""
+    return f"""
+        Eres un verificador de hechos profesional. Analiza esta afirmación y responde EXCLUSIVAMENTE en formato JSON válido:
+
+        {{
+            "veredicto": "probablemente_verdadero|probablemente_falso|mixto|no_verificable",
+            "confianza": 1-10,
+            "razonamiento": "explicación breve de tu análisis basado en información disponible",
+            "sesgos_detectados": ["lista de posibles sesgos"],
+            "recomendacion": "recomendación al usuario",
+            "elementos_clave": ["puntos importantes identificados"],
+            "fecha_analisis": "{datetime.now().strftime('%Y-%m-%d')}"
+        }}
+
+        INSTRUCCIONES CRÍTICAS:
+        1. Para noticias recientes o eventos actuales, usa la información más actualizada disponible
+        2. Si la afirmación menciona fechas futuras, analiza su plausibilidad basándote en patrones históricos
+        3. Considera el contexto y la coherencia lógica
+        4. Identifica lenguaje sensacionalista o emocional
+        5. Si es una noticia, analiza fuentes y posibles sesgos
+
+        FECHA ACTUAL: {datetime.now().strftime('%d de %B de %Y')}
+
+        Afirmación a verificar: "{texto}"
+        """
+
+def prompt_nuevo(texto: str):
+    return instrucciones_del_dia(), _construir_prompt(texto)
+
+def medir_construccion(construir) -> float:
+    """Microsegundos por prompt construido"""
+    inicio = time.perf_counter()
+    for i in range(CONSTRUCCIONES):
+        construir(AFIRMACIONES[i % len(AFIRMACIONES)])
+    return (time.perf_counter() - inicio) / CONSTRUCCIONES * 1e6
+
+def tokens_estimados(texto: str) -> int:
+    return max(1, round(len(texto) / 4))
+
+def tokens_reales(client, contenido: str) -> int:
+    return client.models.count_tokens(model=MODELO_GEMINI, contents=contenido).total_tokens
+
+def primer_fragmento_ms(client, contenido: str, config) -> float:
+    inicio = time.perf_counter()
+    for _ in client.models.generate_content_stream(model=MODELO_GEMINI, contents=contenido, config=config):
+        return (time.perf_counter() - inicio) * 1000
+    return (time.perf_counter() - inicio) * 1000
+
+def main():
+    print(f"🧱 Construcción del prompt ({CONSTRUCCIONES:,} por variante)")
+    antes = medir_construccion(prompt_anterior)
+    despues = medir_construccion(prompt_nuevo)
+    print(f"   antes:   {antes:.2f} µs/prompt")
+    print(f"   después: {despues:.2f} µs/prompt  ({antes / despues:.1f}x)")
+
+    instrucciones = instrucciones_del_dia()
+    por_peticion_antes = [tokens_estimados(prompt_anterior(texto)) for texto in AFIRMACIONES]
+    por_peticion_despues = [tokens_estimados(_construir_prompt(texto)) for texto in AFIRMACIONES]
+    prefijo = tokens_estimados(instrucciones)
+    print("\n🔢 Tokens de entrada por petición (estimados, ~4 caracteres/token)")
+    print(f"   antes (prompt completo):            {statistics.mean(por_peticion_antes):.0f}")
+    print(f"   después (solo afirmación):          {statistics.mean(por_peticion_despues):.0f}")
+    print(f"   prefijo estático (una vez al día):  {prefijo}")
+    print(f"   después con prefijo sin cachear:    {statistics.mean(por_peticion_despues) + prefijo:.0f}")
+
+    if not REAL:
+        print("\nℹ️ Añade --real (con GEMINI_API_KEY) para contar tokens con la API y medir el primer fragmento")
+        return
+    if not os.getenv("GEMINI_API_KEY"):
+        print("\n❌ --real necesita GEMINI_API_KEY")
+        return
+
+    client = get_client()
+    print(f"\n📡 Tokens según count_tokens ({MODELO_GEMINI})")
+    print(f"   antes:     {statistics.mean(tokens_reales(client, prompt_anterior(t)) for t in AFIRMACIONES):.0f}")
+    print(f"   después:   {statistics.mean(tokens_reales(client, _construir_prompt(t)) for t in AFIRMACIONES):.0f}")
+    print(f"   prefijo:   {tokens_reales(client, instrucciones)}")
+
+    print(f"\n⏱️ Tiempo hasta el primer fragmento ({LLAMADAS_REALES} llamadas por variante)")
+    textos = [AFIRMACIONES[i % len(AFIRMACIONES)] for i in range(LLAMADAS_REALES)]
+    ttft_antes = [primer_fragmento_ms(client, prompt_anterior(t), GENERATION_CONFIG) for t in textos]
+    config_nuevo = {**GENERATION_CONFIG, "system_instruction": instrucciones}
+    ttft_despues = [primer_fragmento_ms(client, _construir_prompt(t), config_nuevo) for t in textos]
+    print(f"   antes:   mediana {statistics.median(ttft_antes):.0f} ms")
+    print(f"   después: mediana {statistics.median(ttft_despues):.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 # database.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, BigInteger, String, DateTime, Text, Boolean, Float, Index, LargeBinary, JSON, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
 # Obtener DATABASE_URL desde variables de entorno
@@ -12,36 +13,217 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-print(f"🔗 Conectando a: {DATABASE_URL.split('@')[1] if DATABASE_URL else 'NO URL'}")
+print(f"🔗 Conectando a: {DATABASE_URL.split('@')[-1] if DATABASE_URL else 'NO URL'}")
 
-engine = create_engine(DATABASE_URL)
+# Pool de conexiones configurable por entorno
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+def _opciones_pool() -> dict:
+    opciones = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    # SQLite (solo desarrollo local) no usa QueuePool en memoria
+    if DATABASE_URL and not DATABASE_URL.startswith("sqlite"):
+        opciones.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+    return opciones
+
+engine = create_engine(DATABASE_URL, **_opciones_pool())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+class TextoConsulta(Base):
+    """Texto de una afirmación guardado una sola vez y direccionado por su contenido"""
+    __tablename__ = "textos_consulta"
+    
+    hash = Column(String(64), primary_key=True)  # sha256 del texto exacto
+    texto = Column(Text, nullable=False)
+    longitud = Column(Integer, nullable=False)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+
 class ConsultaNoticia(Base):
     __tablename__ = "consultas_noticias"
     
     id = Column(Integer, primary_key=True, index=True)
-    texto_consultado = Column(Text, nullable=False)
+    # Al crear la consulta se rellena texto_consultado; al guardarla el texto
+    # pasa a textos_consulta y solo queda texto_hash. Usar la propiedad `texto`.
+    texto_consultado = Column(Text, nullable=True)
+    texto_hash = Column(String(64), ForeignKey("textos_consulta.hash"), nullable=True)
     resultado = Column(String(255), nullable=False)
     fecha_consulta = Column(DateTime, default=datetime.utcnow)
     url_consulta = Column(String(500), nullable=True)
-    respuesta_api = Column(Text)
+    respuesta_api = Column(Text)  # Legado (str(dict)) y texto de error; ver respuesta_json
     usuario_id = Column(String(100), nullable=True)
+    
+    # Resultado estructurado: consultable por SQL sin parsear respuesta_api
+    modo = Column(String(50), nullable=True)
+    fuente_primaria = Column(String(50), nullable=True)
+    confianza = Column(Integer, nullable=True)
+    latencia_factcheck_ms = Column(Integer, nullable=True)
+    latencia_gemini_ms = Column(Integer, nullable=True)
+    latencia_total_ms = Column(Integer, nullable=True)
+    respuesta_json = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    
+    texto_guardado = relationship(TextoConsulta, lazy="joined")
+    
+    __table_args__ = (
+        # Paginación por clave del historial (global y por usuario)
+        Index("ix_consultas_fecha_id", "fecha_consulta", "id"),
+        Index("ix_consultas_usuario_fecha_id", "usuario_id", "fecha_consulta", "id"),
+        # Comprobar si un texto sigue referenciado (purga de textos huérfanos)
+        Index("ix_consultas_texto_hash", "texto_hash"),
+    )
+    
+    @property
+    def texto(self) -> str:
+        if self.texto_guardado is not None:
+            return self.texto_guardado.texto
+        return self.texto_consultado or ""
+
+class TrabajoVerificacion(Base):
+    """Verificación encolada con POST /verificar/v2?async=true"""
+    __tablename__ = "trabajos_verificacion"
+    
+    id = Column(String(36), primary_key=True)
+    estado = Column(String(20), nullable=False, default="pendiente")
+    texto = Column(Text, nullable=False)
+    url = Column(String(500), nullable=True)
+    usuario_id = Column(String(100), nullable=True)
+    modo = Column(String(50), nullable=False, default="auto")
+    use_ia = Column(Boolean, nullable=False, default=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    resultado = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_inicio = Column(DateTime, nullable=True)
+    fecha_fin = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_trabajos_estado_fecha", "estado", "fecha_creacion"),
+    )
+
+class AgregadoConsultas(Base):
+    """Consultas y suma de longitudes por hora/día y resultado (mantenido al escribir)"""
+    __tablename__ = "agregados_consultas"
+    
+    granularidad = Column(String(10), primary_key=True)  # "hora" | "dia"
+    inicio = Column(DateTime, primary_key=True)
+    resultado = Column(String(255), primary_key=True)
+    consultas = Column(BigInteger, nullable=False, default=0)
+    suma_longitud = Column(BigInteger, nullable=False, default=0)
+
+class AgregadoResultados(Base):
+    """
+    Consultas por hora/día, fuente primaria, modo y confianza, con sumas y
+    recuentos de latencias para las medias ("" / -1 cuando no hay dato)
+    """
+    __tablename__ = "agregados_resultados"
+
+    granularidad = Column(String(10), primary_key=True)  # "hora" | "dia"
+    inicio = Column(DateTime, primary_key=True)
+    fuente_primaria = Column(String(50), primary_key=True)
+    modo = Column(String(50), primary_key=True)
+    confianza = Column(Integer, primary_key=True)
+    consultas = Column(BigInteger, nullable=False, default=0)
+    suma_latencia_factcheck_ms = Column(BigInteger, nullable=False, default=0)
+    latencias_factcheck = Column(BigInteger, nullable=False, default=0)
+    suma_latencia_gemini_ms = Column(BigInteger, nullable=False, default=0)
+    latencias_gemini = Column(BigInteger, nullable=False, default=0)
+    suma_latencia_total_ms = Column(BigInteger, nullable=False, default=0)
+    latencias_total = Column(BigInteger, nullable=False, default=0)
+
+class AgregadoUsuarios(Base):
+    """Sketch HyperLogLog de usuarios únicos por hora/día"""
+    __tablename__ = "agregados_usuarios"
+    
+    granularidad = Column(String(10), primary_key=True)
+    inicio = Column(DateTime, primary_key=True)
+    hll = Column(LargeBinary, nullable=False)
+
+class CuboLimite(Base):
+    """Token bucket del limitador de peticiones compartido entre workers (RATE_LIMIT_BACKEND=bd)"""
+    __tablename__ = "cubos_limite"
+    
+    clave = Column(String(255), primary_key=True)  # "<endpoint|upstream>:<usuario|dispositivo|ip>:<id>"
+    tokens = Column(Float, nullable=False)
+    actualizado = Column(Float, nullable=False)  # epoch en segundos
+    permitido = Column(Boolean, nullable=False, default=True)  # decisión de la última petición
+    
+    __table_args__ = (
+        Index("ix_cubos_limite_actualizado", "actualizado"),
+    )
 
 def create_tables():
     try:
         print("🟡 Creando tablas...")
         Base.metadata.create_all(bind=engine)
+        _migrar_columnas(ConsultaNoticia.__table__)
+        _permitir_nulos(ConsultaNoticia.__table__, "texto_consultado")
+        # create_all no añade índices nuevos a tablas que ya existían
+        for indice in ConsultaNoticia.__table__.indexes:
+            indice.create(bind=engine, checkfirst=True)
         print("✅ Tablas creadas exitosamente")
     except Exception as e:
         print(f"❌ Error creando tablas: {e}")
         # No lances excepción, permite que la app continúe
         pass
 
+def _migrar_columnas(tabla) -> None:
+    """Añade a una tabla existente las columnas nuevas del modelo (create_all no lo hace)"""
+    existentes = {columna["name"] for columna in inspect(engine).get_columns(tabla.name)}
+    with engine.begin() as conexion:
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+            tipo = columna.type.compile(dialect=engine.dialect)
+            conexion.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"))
+            print(f"🟡 Columna añadida: {tabla.name}.{columna.name}")
+
+def _permitir_nulos(tabla, nombre_columna: str) -> None:
+    """Quita el NOT NULL de una columna existente que el modelo ya declara como opcional"""
+    columna = next(c for c in inspect(engine).get_columns(tabla.name) if c["name"] == nombre_columna)
+    if columna["nullable"]:
+        return
+    if engine.dialect.name == "sqlite":
+        # SQLite no permite ALTER COLUMN: las BD locales antiguas hay que recrearlas
+        print(f"⚠️ {tabla.name}.{nombre_columna} sigue siendo NOT NULL; recrea la BD local")
+        return
+    with engine.begin() as conexion:
+        conexion.execute(text(f"ALTER TABLE {tabla.name} ALTER COLUMN {nombre_columna} DROP NOT NULL"))
+    print(f"🟡 Columna {tabla.name}.{nombre_columna} ahora admite NULL")
+
+def estado_pool() -> dict:
+    """Ocupación actual del pool de conexiones"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"tipo": type(pool).__name__}
+    
+    tamano = pool.size()
+    max_desbordamiento = getattr(pool, "_max_overflow", 0)
+    en_uso = pool.checkedout()
+    capacidad = tamano + max(max_desbordamiento, 0)
+    return {
+        "tipo": type(pool).__name__,
+        "tamano": tamano,
+        "max_desbordamiento": max_desbordamiento,
+        "en_uso": en_uso,
+        "libres": pool.checkedin(),
+        "desbordamiento": max(pool.overflow(), 0),
+        "utilizacion": round(en_uso / capacidad, 4) if capacidad > 0 else None
+    }
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Las consultas nuevas guardan su texto deduplicado en textos_consulta
+from services.textos_consulta import deduplicar_textos
+event.listen(SessionLocal, "before_flush", deduplicar_textos)
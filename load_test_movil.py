@@ -0,0 +1,86 @@
+# load_test_movil.py
+# Prueba de carga local de /verificar/movil con los servicios externos simulados.
+# Lanza N peticiones concurrentes y, a la vez, sondea /health para comprobar
+# que el event loop no se queda bloqueado mientras se espera a los upstreams.
+#
+# Uso: python load_test_movil.py [peticiones] [latencia_upstream_segundos]
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/load_test_movil.db")
+
+import httpx
+import main
+from database import create_tables
+from services import factcheck_api, gemini_analyzer, url_extractor
+
+PETICIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+LATENCIA = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+async def _factcheck_simulado(texto: str, timeout: float = 30):
+    await asyncio.sleep(LATENCIA)
+    return {"success": True, "resultado": "no_encontrado", "detalle": None}
+
+async def _gemini_simulado(texto: str, usar_busqueda: bool = True):
+    await asyncio.sleep(LATENCIA)
+    return {
+        "success": True,
+        "fuente": "gemini",
+        "resultado": "mixto",
+        "confianza": 6,
+        "detalle": {"razonamiento": "Respuesta simulada para la prueba de carga"}
+    }
+
+async def _scraperapi_simulado(url: str):
+    await asyncio.sleep(LATENCIA)
+    return "Contenido simulado del artículo para la prueba de carga."
+
+factcheck_api.consultar_factcheck_async = _factcheck_simulado
+gemini_analyzer.analizar_con_gemini_async = _gemini_simulado
+url_extractor.extraer_con_scraperapi_async = _scraperapi_simulado
+
+async def _sondear_health(client: httpx.AsyncClient, parar: asyncio.Event, latencias: list):
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await client.get("/health")
+        latencias.append(time.perf_counter() - inicio)
+        await asyncio.sleep(0.05)
+
+async def ejecutar():
+    create_tables()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        parar = asyncio.Event()
+        latencias_health = []
+        sonda = asyncio.create_task(_sondear_health(client, parar, latencias_health))
+
+        cuerpos = [
+            {"texto": f"Afirmación de prueba número {i}", "url": "https://example.com/noticia" if i % 2 else None}
+            for i in range(PETICIONES)
+        ]
+        inicio = time.perf_counter()
+        respuestas = await asyncio.gather(*(client.post("/verificar/movil", json=c) for c in cuerpos))
+        total = time.perf_counter() - inicio
+
+        parar.set()
+        await sonda
+
+    correctas = sum(1 for r in respuestas if r.status_code == 200 and r.json().get("success"))
+    # Con URL: extracción + Gemini (ia_first); sin URL: auto en paralelo → ~2x o ~1x latencia
+    secuencial = sum(2 * LATENCIA if c["url"] else LATENCIA for c in cuerpos)
+
+    print(f"📱 Peticiones: {PETICIONES} (correctas: {correctas})")
+    print(f"⏱️ Tiempo total: {total:.2f}s (serializado sería ~{secuencial:.2f}s)")
+    print(f"🩺 /health durante la carga: máx {max(latencias_health) * 1000:.0f} ms en {len(latencias_health)} sondeos")
+
+    if total > secuencial / 2:
+        print("❌ Las peticiones móviles se están serializando")
+        sys.exit(1)
+    print("✅ Las peticiones móviles se procesan de forma concurrente")
+
+if __name__ == "__main__":
+    asyncio.run(ejecutar())
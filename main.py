@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 # 🔥 CARGAR VARIABLES DE ENTORNO AL INICIO - ANTES DE CUALQUIER IMPORT
 load_dotenv()
 
+import time
+import asyncio
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,22 +19,64 @@ if not os.getenv("GEMINI_API_KEY"):
 
 print(f"✅ API Key cargada: {os.getenv('GEMINI_API_KEY')[:20]}...")
 
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 from typing import Optional
 
 # Importar modelos y servicios DESPUÉS de cargar .env
-from models.noticia import Noticia
+from models.noticia import Noticia, LoteNoticias
 from services.factcheck_api import verificar_api
-from services.url_extractor import extraer_texto_desde_url
+from services.url_extractor import extraer_texto_desde_url, extraer_texto_desde_url_async
+from services.compresion_texto import combinar_con_extraido, combinar_sin_comprimir
 from services.hybrid_verifier import (
     verificar_hibrido, 
-    obtener_estadisticas_hibridas,
-    limpiar_consultas_antiguas
+    verificar_hibrido_async,
+    verificar_lote_async,
+    transmitir_verificacion,
+    LOTE_CONCURRENCIA,
+    LOTE_MAX_NOTICIAS,
+    obtener_estadisticas_hibridas
 )
-from database import get_db, create_tables
+from services.indice_similitud import (
+    iniciar_reconstruccion_indice,
+    iniciar_compactacion_indice,
+    detener_compactacion_indice
+)
+from services.historial import consultar_historial
+from services.estadisticas_agregadas import (
+    resumen_global,
+    consultas_desde,
+    iniciar_estadisticas_agregadas,
+    detener_estadisticas_agregadas,
+    iniciar_recalculo,
+    estado_recalculo
+)
+from services.retencion import (
+    iniciar_purga,
+    estado_purga,
+    iniciar_retencion_programada,
+    detener_retencion_programada
+)
+from services.salud import get_monitor, iniciar_monitor_salud, detener_monitor_salud
+from services.clientes_http import cerrar_clientes as cerrar_clientes_http
+from services.resiliencia import estado_circuitos
+from services.limite_peticiones import (
+    ip_cliente,
+    identidades_cliente,
+    comprobar_limite,
+    comprobar_limite_async
+)
+from services.cola_trabajos import (
+    encolar_trabajo,
+    obtener_trabajo,
+    iniciar_cola_trabajos,
+    detener_cola_trabajos,
+    ESTADOS_FINALES
+)
+from database import get_db, create_tables, SessionLocal, estado_pool
 
 # Lifespan events
 @asynccontextmanager
@@ -41,10 +85,23 @@ async def lifespan(app: FastAPI):
     print("🟡 Iniciando aplicación FactCheck API...")
     create_tables()
     print("✅ Tablas de la base de datos creadas/verificadas")
+    iniciar_reconstruccion_indice()
+    print("🟡 Reconstruyendo índice de casi-duplicados en segundo plano")
+    iniciar_compactacion_indice()
+    iniciar_estadisticas_agregadas()
+    iniciar_cola_trabajos()
+    iniciar_retencion_programada()
+    iniciar_monitor_salud()
     print("🚀 Sistema híbrido FactCheck + Gemini AI cargado")
     yield
     # Shutdown - se ejecuta al apagar la aplicación
     print("🔴 Apagando aplicación...")
+    detener_monitor_salud()
+    detener_retencion_programada()
+    detener_cola_trabajos()
+    detener_estadisticas_agregadas()
+    detener_compactacion_indice()
+    await cerrar_clientes_http()
 
 app = FastAPI(
     title="FactCheck API",
@@ -62,6 +119,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==================== LÍMITE DE PETICIONES ====================
+
+def _identidades(request: Request, noticias):
+    return identidades_cliente(ip_cliente(request.client.host if request.client else None, request.headers), noticias)
+
+def _usa_gemini(modo: str, use_ia: bool) -> bool:
+    return use_ia and modo != "solo_factcheck"
+
+def _rechazar_si_limitado(decision) -> None:
+    if not decision.permitido:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas peticiones. Vuelve a intentarlo más tarde.",
+            headers={"Retry-After": decision.retry_after}
+        )
+
+def limitar(request: Request, endpoint: str, noticias, upstream: Optional[str] = None) -> None:
+    """Lanza 429 con Retry-After si el usuario, dispositivo o IP ha agotado su cupo"""
+    _rechazar_si_limitado(comprobar_limite(endpoint, _identidades(request, noticias), upstream))
+
+async def limitar_async(request: Request, endpoint: str, noticias, upstream: Optional[str] = None) -> None:
+    _rechazar_si_limitado(await comprobar_limite_async(endpoint, _identidades(request, noticias), upstream))
+
 # ==================== ENDPOINTS PRINCIPALES ====================
 
 @app.post("/verificar", tags=["Verificación"])
@@ -72,7 +152,7 @@ def verificar_noticia(noticia: Noticia, db: Session = Depends(get_db)):
     if noticia.url:
         try:
             texto_extraido = extraer_texto_desde_url(noticia.url)
-            texto = f"{texto} {texto_extraido}" if texto else texto_extraido
+            texto = combinar_con_extraido(texto, texto_extraido)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error al extraer texto de la URL: {str(e)}")
     
@@ -87,17 +167,33 @@ def verificar_noticia(noticia: Noticia, db: Session = Depends(get_db)):
 @app.post("/verificar/v2", tags=["Verificación Híbrida"])
 def verificar_hibrido_endpoint(
     noticia: Noticia, 
+    request: Request,
     db: Session = Depends(get_db),
     modo: str = Query("auto", description="Modo de verificación"),
-    use_ia: bool = Query(True, description="Usar IA en el análisis")
+    use_ia: bool = Query(True, description="Usar IA en el análisis"),
+    asincrono: bool = Query(False, alias="async", description="Encolar y devolver un job_id")
 ):
     """NUEVO - Sistema Híbrido FactCheck + Gemini AI"""
-    texto = noticia.texto
+    limitar(request, "verificar_v2", [noticia], "gemini" if _usa_gemini(modo, use_ia) else None)
+    
+    if asincrono:
+        trabajo = encolar_trabajo(
+            db,
+            texto=noticia.texto,
+            url=noticia.url,
+            usuario_id=noticia.usuario_id,
+            modo=modo,
+            use_ia=use_ia
+        )
+        return JSONResponse(status_code=202, content=trabajo)
+    
+    texto = texto_modo = noticia.texto
     
     if noticia.url:
         try:
             texto_extraido = extraer_texto_desde_url(noticia.url)
-            texto = f"{texto} {texto_extraido}" if texto else texto_extraido
+            texto_modo = combinar_sin_comprimir(texto, texto_extraido)
+            texto = combinar_con_extraido(texto, texto_extraido)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Error al extraer texto de la URL: {str(e)}")
     
@@ -107,13 +203,61 @@ def verificar_hibrido_endpoint(
         url=noticia.url,
         usuario_id=noticia.usuario_id,
         modo=modo,
-        use_ia=use_ia
+        use_ia=use_ia,
+        texto_modo=texto_modo
     )
     return resultado
 
+@app.post("/verificar/v2/stream", tags=["Verificación Híbrida"])
+async def verificar_hibrido_stream(
+    noticia: Noticia,
+    request: Request,
+    modo: str = Query("auto", description="Modo de verificación"),
+    use_ia: bool = Query(True, description="Usar IA en el análisis")
+):
+    """Variante SSE de /verificar/v2 - emite cada etapa según termina"""
+    await limitar_async(request, "verificar_v2", [noticia], "gemini" if _usa_gemini(modo, use_ia) else None)
+    
+    async def verificacion(notificar):
+        texto = texto_modo = noticia.texto
+        
+        if noticia.url:
+            try:
+                texto_extraido = await extraer_texto_desde_url_async(noticia.url)
+            except Exception as e:
+                return {"detail": f"Error al extraer texto de la URL: {str(e)}"}
+            notificar("url_extraida", {"url": noticia.url, "caracteres": len(texto_extraido)})
+            texto_modo = combinar_sin_comprimir(texto, texto_extraido)
+            texto = combinar_con_extraido(texto, texto_extraido)
+        
+        return await verificar_hibrido_async(
+            texto=texto,
+            url=noticia.url,
+            usuario_id=noticia.usuario_id,
+            modo=modo,
+            use_ia=use_ia,
+            notificar=notificar,
+            texto_modo=texto_modo
+        )
+    
+    return StreamingResponse(transmitir_verificacion(verificacion), media_type="text/event-stream")
+
 @app.post("/verificar/movil")
-async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db)):
-    """Endpoint optimizado para aplicaciones móviles - VERSIÓN CORREGIDA"""
+async def verificar_noticia_movil(noticia: Noticia, request: Request):
+    """Endpoint optimizado para aplicaciones móviles - pipeline 100% asíncrono"""
+    await limitar_async(request, "verificar_movil", [noticia], "gemini")
+    return await _verificar_movil(noticia)
+
+@app.post("/verificar/movil/stream")
+async def verificar_noticia_movil_stream(noticia: Noticia, request: Request):
+    """Variante SSE de /verificar/movil - emite cada etapa según termina"""
+    await limitar_async(request, "verificar_movil", [noticia], "gemini")
+    return StreamingResponse(
+        transmitir_verificacion(lambda notificar: _verificar_movil(noticia, notificar)),
+        media_type="text/event-stream"
+    )
+
+async def _verificar_movil(noticia: Noticia, notificar=None):
     try:
         texto = noticia.texto or ""
         url = noticia.url
@@ -124,7 +268,7 @@ async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db
         if url and url.strip():
             logger.info(f"🔗 Procesando URL: {url}")
             try:
-                texto_extraido = extraer_texto_desde_url(url.strip())
+                texto_extraido = await extraer_texto_desde_url_async(url.strip())
                 
                 if texto_extraido.startswith("❌"):
                     return {
@@ -134,8 +278,11 @@ async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db
                         "razonamiento": texto_extraido
                     }
                 
+                if notificar:
+                    notificar("url_extraida", {"url": url, "caracteres": len(texto_extraido)})
+                
                 # USAR EXCLUSIVAMENTE el contenido extraído, ignorar texto si hay URL
-                texto_combinado = texto_extraido
+                texto_combinado = combinar_con_extraido("", texto_extraido)
                 logger.info(f"✅ URL procesada - Texto extraído: {len(texto_combinado)} chars")
                 
             except Exception as e:
@@ -157,13 +304,13 @@ async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db
             }
         
         # Para contenido de URLs, forzar modo que priorice el análisis contextual
-        resultado = verificar_hibrido(
+        resultado = await verificar_hibrido_async(
             texto=texto_combinado,
-            db=db,
             url=url,
             usuario_id=noticia.usuario_id,
             modo="ia_first" if url else "auto",  # Forzar IA primero para URLs
-            use_ia=True
+            use_ia=True,
+            notificar=notificar
         )
         
         return resultado
@@ -176,70 +323,53 @@ async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db
             "resultado": "error",
             "razonamiento": "Estamos teniendo problemas técnicos. Por favor, intenta más tarde."
         }
-    """Endpoint optimizado para aplicaciones móviles - VERSIÓN CORREGIDA"""
-    try:
-        texto = noticia.texto or ""
-        url = noticia.url
-        
-        logger.info(f"📱 Verificación móvil - Texto: {len(texto)} chars, URL: {url}")
-        
-        # Procesar URL si existe
-        if url and url.strip():
-            logger.info(f"🔗 Procesando URL: {url}")
-            try:
-                texto_extraido = extraer_texto_desde_url(url.strip())
-                
-                if texto_extraido.startswith("❌"):
-                    # Si falla la extracción, devolver error claro
-                    return {
-                        "success": False,
-                        "error": texto_extraido,
-                        "resultado": "error_url",
-                        "razonamiento": texto_extraido
-                    }
-                
-                # Combinar texto y contenido extraído
-                texto_combinado = f"{texto} {texto_extraido}".strip()
-                logger.info(f"✅ URL procesada - Texto total: {len(texto_combinado)} chars")
-                
-            except Exception as e:
-                logger.error(f"❌ Error procesando URL: {e}")
-                return {
-                    "success": False,
-                    "error": f"Error procesando enlace: {str(e)}",
-                    "resultado": "error_url",
-                    "razonamiento": f"No se pudo analizar el enlace: {str(e)}"
-                }
-        else:
-            texto_combinado = texto
-        
-        if not texto_combinado.strip():
-            return {
-                "success": False,
-                "error": "No se proporcionó texto para verificar",
-                "resultado": "error_vacio"
-            }
-        
-        # Usar el sistema híbrido para verificación
-        resultado = verificar_hibrido(
-            texto=texto_combinado,
-            db=db,
-            url=url,
-            usuario_id=noticia.usuario_id,
-            modo="auto",
-            use_ia=True
+
+@app.post("/verificar/lote", tags=["Verificación Híbrida"])
+async def verificar_lote_endpoint(
+    lote: LoteNoticias,
+    request: Request,
+    modo: str = Query("auto", description="Modo de verificación"),
+    use_ia: bool = Query(True, description="Usar IA en el análisis"),
+    concurrencia: int = Query(LOTE_CONCURRENCIA, ge=1, le=50, description="Noticias procesadas a la vez")
+):
+    """Verificación de varias noticias en una petición - resultados en NDJSON según terminan"""
+    if not lote.noticias:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    
+    if len(lote.noticias) > LOTE_MAX_NOTICIAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote supera el máximo de {LOTE_MAX_NOTICIAS} noticias"
         )
-        
-        return resultado
-        
-    except Exception as e:
-        logger.error(f"❌ Error en verificación móvil: {e}")
-        return {
-            "success": False,
-            "error": f"Error interno: {str(e)}",
-            "resultado": "error",
-            "razonamiento": "Estamos teniendo problemas técnicos. Por favor, intenta más tarde."
-        }
+    
+    await limitar_async(request, "verificar_lote", lote.noticias, "gemini" if _usa_gemini(modo, use_ia) else None)
+    
+    return StreamingResponse(
+        verificar_lote_async(lote.noticias, modo=modo, use_ia=use_ia, concurrencia=concurrencia),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/jobs/{job_id}", tags=["Verificación Híbrida"])
+async def obtener_trabajo_endpoint(
+    job_id: str,
+    esperar: float = Query(0, ge=0, le=30, description="Segundos a esperar a que termine (long-poll)")
+):
+    """Estado y resultado de una verificación encolada con ?async=true"""
+    limite = time.monotonic() + esperar
+    while True:
+        trabajo = await asyncio.to_thread(_leer_trabajo, job_id)
+        if trabajo is None:
+            raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+        if trabajo["estado"] in ESTADOS_FINALES or time.monotonic() >= limite:
+            return trabajo
+        await asyncio.sleep(0.5)
+
+def _leer_trabajo(job_id: str):
+    db = SessionLocal()
+    try:
+        return obtener_trabajo(db, job_id)
+    finally:
+        db.close()
 
 # ==================== GESTIÓN DE CONSULTAS ====================
 
@@ -247,40 +377,22 @@ async def verificar_noticia_movil(noticia: Noticia, db: Session = Depends(get_db
 def obtener_historial(
     db: Session = Depends(get_db), 
     limit: int = Query(10, le=100),
-    offset: int = Query(0),
-    usuario_id: Optional[str] = Query(None)
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    offset: int = Query(0, description="Obsoleto: usar cursor"),
+    usuario_id: Optional[str] = Query(None),
+    total: str = Query("estimado", pattern="^(exacto|estimado|ninguno)$", description="Cómo calcular el total")
 ):
-    from database import ConsultaNoticia
-    
-    query = db.query(ConsultaNoticia)
-    
-    if usuario_id:
-        query = query.filter(ConsultaNoticia.usuario_id == usuario_id)
-    
-    consultas = query.order_by(ConsultaNoticia.fecha_consulta.desc())\
-        .offset(offset)\
-        .limit(limit)\
-        .all()
-    
-    total = query.count()
-    
-    return {
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-        "usuario_id": usuario_id,
-        "consultas": [
-            {
-                "id": c.id,
-                "texto": c.texto_consultado[:100] + "..." if len(c.texto_consultado) > 100 else c.texto_consultado,
-                "resultado": c.resultado,
-                "url": c.url_consulta,
-                "fecha": c.fecha_consulta.isoformat(),
-                "usuario_id": c.usuario_id
-            }
-            for c in consultas
-        ]
-    }
+    try:
+        return consultar_historial(
+            db,
+            limit=limit,
+            cursor=cursor,
+            usuario_id=usuario_id,
+            offset=offset,
+            total=total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/consulta/{consulta_id}", tags=["Historial"])
 def obtener_consulta(consulta_id: int, db: Session = Depends(get_db)):
@@ -292,31 +404,33 @@ def obtener_consulta(consulta_id: int, db: Session = Depends(get_db)):
     
     return {
         "id": consulta.id,
-        "texto_consultado": consulta.texto_consultado,
+        "texto_consultado": consulta.texto,
         "resultado": consulta.resultado,
         "url_consulta": consulta.url_consulta,
         "fecha_consulta": consulta.fecha_consulta.isoformat(),
         "usuario_id": consulta.usuario_id,
-        "respuesta_api": consulta.respuesta_api
+        "modo": consulta.modo,
+        "fuente_primaria": consulta.fuente_primaria,
+        "confianza": consulta.confianza,
+        "latencias_ms": {
+            "factcheck": consulta.latencia_factcheck_ms,
+            "gemini": consulta.latencia_gemini_ms,
+            "total": consulta.latencia_total_ms
+        },
+        # Filas nuevas: payload JSON; filas antiguas sin migrar o con error: texto original
+        "respuesta_api": consulta.respuesta_json if consulta.respuesta_json is not None else consulta.respuesta_api
     }
 
 # ==================== ESTADÍSTICAS ====================
 
 @app.get("/estadisticas", tags=["Estadísticas"])
 def obtener_estadisticas(db: Session = Depends(get_db)):
-    from database import ConsultaNoticia
-    from sqlalchemy import func
-    
-    stats = db.query(
-        func.count(ConsultaNoticia.id).label("total_consultas"),
-        func.count(func.distinct(ConsultaNoticia.usuario_id)).label("usuarios_unicos"),
-        func.avg(func.length(ConsultaNoticia.texto_consultado)).label("longitud_promedio")
-    ).first()
+    stats = resumen_global(db)
     
     return {
-        "total_consultas": stats.total_consultas,
-        "usuarios_unicos": stats.usuarios_unicos,
-        "longitud_promedio_texto": round(stats.longitud_promedio or 0, 2)
+        "total_consultas": stats["total_consultas"],
+        "usuarios_unicos": stats["usuarios_unicos"],
+        "longitud_promedio_texto": stats["longitud_promedio_texto"]
     }
 
 @app.get("/estadisticas/v2", tags=["Estadísticas"])
@@ -327,43 +441,51 @@ def obtener_estadisticas_avanzadas(db: Session = Depends(get_db)):
 
 @app.delete("/admin/limpiar", tags=["Administración"])
 def limpiar_consultas_antiguas_endpoint(
-    db: Session = Depends(get_db),
-    dias: int = Query(30, description="Eliminar consultas más antiguas que X días")
+    dias: int = Query(30, description="Eliminar consultas más antiguas que X días"),
+    archivar: bool = Query(False, description="Guardar antes las consultas en NDJSON comprimido")
 ):
+    """Lanza en segundo plano la purga por lotes; el progreso se consulta con GET /admin/limpiar"""
     if dias < 1:
         raise HTTPException(status_code=400, detail="El número de días debe ser al menos 1")
     
-    resultado = limpiar_consultas_antiguas(db, dias)
-    return resultado
+    if not iniciar_purga(dias, archivar):
+        raise HTTPException(status_code=409, detail="Ya hay una purga en curso")
+    return JSONResponse(status_code=202, content={"dias": dias, "archivar": archivar, **estado_purga()})
+
+@app.get("/admin/limpiar", tags=["Administración"])
+def estado_limpieza_endpoint():
+    return estado_purga()
+
+@app.post("/admin/estadisticas/recalcular", tags=["Administración"])
+def recalcular_estadisticas_endpoint():
+    """Reconstruye en segundo plano los agregados de estadísticas desde el historial"""
+    if not iniciar_recalculo():
+        raise HTTPException(status_code=409, detail="Ya hay un recálculo en curso")
+    return JSONResponse(status_code=202, content=estado_recalculo())
+
+@app.get("/admin/estadisticas/recalcular", tags=["Administración"])
+def estado_recalculo_endpoint():
+    return estado_recalculo()
 
 @app.post("/admin/verificar-ia", tags=["Administración"])
 def verificar_estado_ia():
-    try:
-        from services.gemini_analyzer import analizar_con_gemini
-        
-        resultado = analizar_con_gemini("Test de conexión")
-        
-        if resultado.get("success"):
-            return {
-                "status": "healthy",
-                "servicio_ia": "gemini",
-                "mensaje": "✅ Servicio de IA funcionando correctamente"
-            }
-        else:
-            return {
-                "status": "error",
-                "servicio_ia": "gemini",
-                "error": resultado.get("error", "Error desconocido"),
-                "mensaje": "❌ Error en el servicio de IA"
-            }
-            
-    except Exception as e:
+    """Sondeo en vivo de Gemini (lee los metadatos del modelo, sin generar contenido)"""
+    estado = get_monitor().sondear(["gemini_ai"])["gemini_ai"]
+    
+    if estado["estado"] == "healthy":
         return {
-            "status": "error",
+            "status": "healthy",
             "servicio_ia": "gemini",
-            "error": str(e),
-            "mensaje": "❌ No se pudo conectar con el servicio de IA"
+            "latencia_ms": estado["latencia_ms"],
+            "mensaje": "✅ Servicio de IA funcionando correctamente"
         }
+    return {
+        "status": "error",
+        "servicio_ia": "gemini",
+        "error": estado.get("error", estado["estado"]),
+        "errores_consecutivos": estado["errores_consecutivos"],
+        "mensaje": "❌ Error en el servicio de IA"
+    }
 
 # ==================== HEALTH & INFO ====================
 
@@ -388,7 +510,8 @@ def health_check():
     return {
         "status": "healthy",
         "service": "factcheck-api",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "database_pool": estado_pool()
     }
 
 @app.get("/info", tags=["Información"])
@@ -406,44 +529,34 @@ def info_completa():
     }
 
 @app.get("/status", tags=["Salud"])
-def status_detallado(db: Session = Depends(get_db)):
-    from database import ConsultaNoticia
-    from sqlalchemy import func
+def status_detallado(
+    db: Session = Depends(get_db),
+    refresh: bool = Query(False, description="Sondear los servicios en vivo en lugar de usar el último estado")
+):
     from datetime import datetime, timedelta
     
     try:
-        stats = db.query(
-            func.count(ConsultaNoticia.id).label("total_consultas"),
-            func.count(func.distinct(ConsultaNoticia.usuario_id)).label("usuarios_unicos")
-        ).first()
-        
-        hace_24_horas = datetime.utcnow() - timedelta(hours=24)
-        consultas_24h = db.query(ConsultaNoticia)\
-            .filter(ConsultaNoticia.fecha_consulta >= hace_24_horas)\
-            .count()
+        # Estado del último sondeo en segundo plano; refresh=true fuerza uno en vivo
+        monitor = get_monitor()
+        servicios = monitor.sondear() if refresh else monitor.estado()
         
-        estado_ia = "unknown"
-        try:
-            from services.gemini_analyzer import analizar_con_gemini
-            test_result = analizar_con_gemini("test de conexión")
-            estado_ia = "healthy" if test_result.get("success") else "error"
-        except Exception as e:
-            estado_ia = f"error: {str(e)}"
+        stats = resumen_global(db)
+        consultas_24h = consultas_desde(db, datetime.utcnow() - timedelta(hours=24))
         
         return {
-            "status": "operational",
+            "status": "degraded" if any(e["estado"] == "error" for e in servicios.values()) else "operational",
             "timestamp": datetime.utcnow().isoformat(),
             "database": {
-                "status": "connected",
-                "total_consultas": stats.total_consultas or 0,
-                "usuarios_unicos": stats.usuarios_unicos or 0,
+                "status": "connected" if servicios["database"]["estado"] != "error" else "error",
+                "total_consultas": stats["total_consultas"],
+                "usuarios_unicos": stats["usuarios_unicos"],
                 "consultas_24h": consultas_24h
             },
             "services": {
-                "factcheck_api": "healthy",
-                "gemini_ai": estado_ia,
-                "url_extractor": "healthy"
+                nombre: estado["estado"] for nombre, estado in servicios.items() if nombre != "database"
             },
+            "services_detail": servicios,
+            "circuit_breakers": estado_circuitos(),
             "system": {
                 "version": "2.0.0"
             }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 class Noticia(BaseModel):
@@ -8,6 +8,9 @@ class Noticia(BaseModel):
     usuario_id: Optional[str] = None
     dispositivo_id: Optional[str] = None  # Para identificar el dispositivo móvil
 
+class LoteNoticias(BaseModel):
+    noticias: List[Noticia]
+
 class NoticiaResponse(BaseModel):
     id: int
     resultado: str
@@ -0,0 +1,137 @@
+# services/cache_veredictos.py
+import os
+import re
+import copy
+import json
+import time
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL_SECONDS", "3600"))
+CACHE_MAX_ENTRADAS = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("VERDICT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_DIACRITICOS = re.compile(r"[\u0300-\u036f]")
+_PUNTUACION = re.compile(r"[^\w\s]")
+
+def normalizar_afirmacion(texto: str) -> str:
+    """
+    Forma canónica de una afirmación: minúsculas, sin acentos,
+    sin puntuación y con espacios unificados
+    """
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto))
+    texto = _PUNTUACION.sub(" ", texto)
+    return " ".join(texto.split())
+
+class CacheVeredictos:
+    """
+    Cache LRU con TTL de resultados de verificación, acotada en número de
+    entradas y en bytes aproximados
+    """
+
+    def __init__(self, ttl: int = CACHE_TTL, max_entradas: int = CACHE_MAX_ENTRADAS, max_bytes: int = CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # clave -> (expira_en, tamaño, resultado)
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self._aciertos = 0
+        self._fallos = 0
+        self._expulsiones = 0
+        self._expiradas = 0
+
+    @staticmethod
+    def _clave(texto: str, modo: str) -> Tuple[str, str]:
+        return (modo, normalizar_afirmacion(texto))
+
+    def obtener(self, texto: str, modo: str) -> Optional[Dict[str, Any]]:
+        clave = self._clave(texto, modo)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._fallos += 1
+                return None
+
+            expira_en, _, resultado = entrada
+            if expira_en < time.monotonic():
+                self._eliminar(clave)
+                self._expiradas += 1
+                self._fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self._aciertos += 1
+            return copy.deepcopy(resultado)
+
+    def guardar(self, texto: str, modo: str, resultado: Dict[str, Any]) -> None:
+        clave = self._clave(texto, modo)
+        tamano = len(clave[1]) + len(json.dumps(resultado, default=str))
+        if tamano > self.max_bytes:
+            return
+
+        with self._lock:
+            if clave in self._entradas:
+                self._eliminar(clave)
+
+            self._entradas[clave] = (time.monotonic() + self.ttl, tamano, copy.deepcopy(resultado))
+            self._bytes += tamano
+
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                clave_antigua = next(iter(self._entradas))
+                self._eliminar(clave_antigua)
+                self._expulsiones += 1
+
+    def _eliminar(self, clave: Tuple[str, str]) -> None:
+        _, tamano, _ = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self._aciertos + self._fallos
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "aciertos": self._aciertos,
+                "fallos": self._fallos,
+                "tasa_aciertos": round(self._aciertos / consultas, 4) if consultas else 0,
+                "expulsiones": self._expulsiones,
+                "expiradas": self._expiradas,
+                "ttl_segundos": self.ttl,
+                "max_entradas": self.max_entradas,
+                "max_bytes": self.max_bytes
+            }
+
+# Cache global
+_cache = None
+
+def get_cache() -> CacheVeredictos:
+    """Obtener cache de veredictos (singleton)"""
+    global _cache
+    if _cache is None:
+        _cache = CacheVeredictos()
+    return _cache
+
+def es_cacheable(resultado: Dict[str, Any]) -> bool:
+    """
+    Solo se cachean veredictos completos: ni errores ni resultados parciales
+    por timeout o por un backend que falló (circuito abierto, caída...)
+    """
+    return (
+        resultado.get("resultado_final") not in (None, "error", "procesado")
+        and not resultado.get("backends_agotados")
+        and not resultado.get("backends_fallidos")
+    )
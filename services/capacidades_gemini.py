@@ -0,0 +1,127 @@
+# services/capacidades_gemini.py
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que se da por buena una capacidad no disponible antes de volver a sondearla
+TTL_CAPACIDADES = float(os.getenv("GEMINI_CAPABILITY_TTL_SECONDS", "600"))
+
+def capacidad_busqueda(modelo: str) -> str:
+    return f"google_search:{modelo}"
+
+def capacidad_modelo(modelo: str) -> str:
+    return f"modelo:{modelo}"
+
+def capacidad_cache_contexto(modelo: str) -> str:
+    return f"cache_contexto:{modelo}"
+
+def es_error_de_capacidad(error: Exception) -> bool:
+    """
+    El cliente o la API no admiten lo pedido (herramienta o modelo): el SDK
+    rechaza el argumento, o la API responde 400/403/404. Los errores
+    transitorios (timeouts, 429, 5xx) no dicen nada de la capacidad.
+    """
+    from services.resiliencia import es_error_de_peticion
+
+    return isinstance(error, (TypeError, ValueError)) or es_error_de_peticion(error)
+
+def _sondear(capacidad: str) -> None:
+    """Llamada mínima que usa la capacidad; lanza excepción si no está disponible"""
+    from services.gemini_analyzer import get_client, crear_cache_contexto
+
+    tipo, modelo = capacidad.split(":", 1)
+    client = get_client()
+    if tipo == "modelo":
+        client.models.get(model=modelo)
+    elif tipo == "google_search":
+        client.models.generate_content(
+            model=modelo,
+            contents="ping",
+            config={"tools": [{"google_search": {}}], "max_output_tokens": 1}
+        )
+    elif tipo == "cache_contexto":
+        # La sonda deja creada la caché del día, que ya usarán las siguientes llamadas
+        crear_cache_contexto(modelo, client=client)
+    else:
+        raise ValueError(f"Capacidad desconocida: {capacidad}")
+
+class RegistroCapacidades:
+    """
+    Qué herramientas y modelos de Gemini funcionan con este cliente y esta
+    clave. Una capacidad que ha fallado se salta durante TTL_CAPACIDADES
+    segundos; pasado ese tiempo se vuelve a sondear en segundo plano y,
+    mientras tanto, se sigue saltando.
+    """
+
+    def __init__(self, ttl: float = TTL_CAPACIDADES):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._capacidades: Dict[str, Dict[str, Any]] = {}
+        self._sondeando = set()
+
+    def disponible(self, capacidad: str) -> bool:
+        """True si funciona o aún no se ha probado (la primera llamada real hace de sonda)"""
+        with self._lock:
+            entrada = self._capacidades.get(capacidad)
+            if entrada is None or entrada["disponible"]:
+                return True
+            caducada = time.monotonic() - entrada["comprobado"] >= self.ttl
+            if caducada and capacidad not in self._sondeando:
+                self._sondeando.add(capacidad)
+                threading.Thread(
+                    target=self._resondear, args=(capacidad,), name="sonda-capacidad", daemon=True
+                ).start()
+        incrementar("capacidades_gemini.saltadas")
+        return False
+
+    def registrar(self, capacidad: str, disponible: bool, error: Optional[str] = None) -> None:
+        with self._lock:
+            anterior = self._capacidades.get(capacidad)
+            self._capacidades[capacidad] = {
+                "disponible": disponible,
+                "comprobado": time.monotonic(),
+                "fecha": datetime.utcnow().isoformat(),
+                "error": error
+            }
+        if anterior is None or anterior["disponible"] != disponible:
+            if disponible:
+                logger.info(f"🟢 Capacidad de Gemini disponible: {capacidad}")
+            else:
+                logger.warning(f"⚠️ Capacidad de Gemini no disponible: {capacidad} ({error}); se reintentará en {self.ttl:g}s")
+
+    def _resondear(self, capacidad: str) -> None:
+        incrementar("capacidades_gemini.sondeos")
+        try:
+            _sondear(capacidad)
+            self.registrar(capacidad, True)
+        except Exception as e:
+            # Un error transitorio tampoco la confirma: se vuelve a probar tras otro TTL
+            self.registrar(capacidad, False, str(e))
+        finally:
+            with self._lock:
+                self._sondeando.discard(capacidad)
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            capacidades = {
+                nombre: {clave: valor for clave, valor in entrada.items() if clave != "comprobado"}
+                for nombre, entrada in self._capacidades.items()
+            }
+        return {"capacidades": capacidades, **obtener_contadores("capacidades_gemini")}
+
+_registro = None
+_registro_lock = threading.Lock()
+
+def get_registro_capacidades() -> RegistroCapacidades:
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroCapacidades()
+        return _registro
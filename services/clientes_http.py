@@ -0,0 +1,40 @@
+# services/clientes_http.py
+import asyncio
+import logging
+import weakref
+from typing import Dict
+
+import httpx
+
+from services.limites import LIMITES_UPSTREAM
+
+logger = logging.getLogger(__name__)
+
+# Un cliente por upstream y event loop: reutiliza conexiones (TCP/TLS) entre
+# llamadas. Las conexiones de httpx quedan ligadas al loop que las abrió.
+_clientes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+def cliente_upstream(nombre: str) -> httpx.AsyncClient:
+    """
+    Cliente async compartido hacia un upstream. El pool admite tantas
+    conexiones como llamadas simultáneas permite limite_upstream; el timeout
+    se pasa en cada petición.
+    """
+    loop = asyncio.get_running_loop()
+    por_loop = _clientes.setdefault(loop, {})
+    cliente = por_loop.get(nombre)
+    if cliente is None or cliente.is_closed:
+        limite = LIMITES_UPSTREAM[nombre]
+        cliente = por_loop[nombre] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=limite, max_keepalive_connections=limite)
+        )
+    return cliente
+
+async def cerrar_clientes() -> None:
+    """Cierra los clientes del loop actual (al apagar la aplicación)"""
+    por_loop = _clientes.pop(asyncio.get_running_loop(), {})
+    for nombre, cliente in por_loop.items():
+        try:
+            await cliente.aclose()
+        except Exception as e:
+            logger.error(f"❌ Error cerrando cliente HTTP de {nombre}: {e}")
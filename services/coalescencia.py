@@ -0,0 +1,103 @@
+# services/coalescencia.py
+import copy
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Awaitable, Hashable, Tuple
+
+from services.metricas import incrementar, obtener_contadores
+
+class CoalescedorLlamadas:
+    """
+    "Single-flight": las llamadas concurrentes con la misma clave esperan a
+    una única ejecución y comparten su resultado. Funciona igual desde hilos
+    y desde corrutinas porque el resultado se publica en un Future de
+    concurrent.futures.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Hashable, Future] = {}
+
+    def _unirse(self, clave: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            if futuro is not None:
+                incrementar(f"coalescencia_{self.nombre}.seguidores")
+                return futuro, False
+            futuro = Future()
+            self._en_vuelo[clave] = futuro
+            incrementar(f"coalescencia_{self.nombre}.lideres")
+            return futuro, True
+
+    def _publicar(self, clave: Hashable, futuro: Future, resultado: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._en_vuelo.pop(clave, None)
+        if error is not None:
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(resultado)
+
+    def ejecutar(self, clave: Hashable, funcion: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Devuelve (resultado, compartido); compartido=True si otra llamada hizo el trabajo"""
+        futuro, lider = self._unirse(clave)
+        if not lider:
+            return copy.deepcopy(futuro.result()), True
+
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            self._publicar(clave, futuro, error=e)
+            raise
+        self._publicar(clave, futuro, resultado=resultado)
+        return resultado, False
+
+    async def ejecutar_async(self, clave: Hashable, funcion: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Variante asíncrona de ejecutar"""
+        futuro, lider = self._unirse(clave)
+        if not lider:
+            return copy.deepcopy(await asyncio.wrap_future(futuro)), True
+
+        try:
+            resultado = await funcion()
+        except asyncio.CancelledError:
+            # Los seguidores no deben heredar la cancelación del líder
+            self._publicar(clave, futuro, error=RuntimeError("La llamada compartida fue cancelada"))
+            raise
+        except Exception as e:
+            self._publicar(clave, futuro, error=e)
+            raise
+        self._publicar(clave, futuro, resultado=resultado)
+        return resultado, False
+
+    def estadisticas(self) -> Dict[str, Any]:
+        contadores = obtener_contadores(f"coalescencia_{self.nombre}")
+        lideres = contadores.get("lideres", 0)
+        seguidores = contadores.get("seguidores", 0)
+        total = lideres + seguidores
+        with self._lock:
+            en_vuelo = len(self._en_vuelo)
+        return {
+            "llamadas": total,
+            "lideres": lideres,
+            "seguidores": seguidores,
+            "ratio_coalescencia": round(seguidores / total, 4) if total else 0,
+            "en_vuelo": en_vuelo
+        }
+
+# Coalescedores globales por nombre
+_coalescedores: Dict[str, CoalescedorLlamadas] = {}
+_coalescedores_lock = threading.Lock()
+
+def get_coalescedor(nombre: str) -> CoalescedorLlamadas:
+    """Obtener coalescedor por nombre (singleton por nombre)"""
+    with _coalescedores_lock:
+        if nombre not in _coalescedores:
+            _coalescedores[nombre] = CoalescedorLlamadas(nombre)
+        return _coalescedores[nombre]
+
+def estadisticas_coalescencia() -> Dict[str, Any]:
+    with _coalescedores_lock:
+        coalescedores = list(_coalescedores.values())
+    return {c.nombre: c.estadisticas() for c in coalescedores}
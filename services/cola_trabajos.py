@@ -0,0 +1,301 @@
+# services/cola_trabajos.py
+import os
+import json
+import uuid
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional
+
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# Hilos trabajadores dentro del proceso de la API (0 = no procesar trabajos aquí)
+NUM_TRABAJADORES = int(os.getenv("JOB_WORKERS", "4"))
+INTERVALO_SONDEO = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+# Un trabajo "en_proceso" más antiguo que esto se considera abandonado (p. ej. reinicio)
+TRABAJO_ABANDONADO_SEGUNDOS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+MAX_INTENTOS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+ESTADOS_FINALES = ("completado", "error")
+
+def encolar_trabajo(
+    db: Session,
+    texto: str,
+    url: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    modo: str = "auto",
+    use_ia: bool = True
+) -> Dict[str, Any]:
+    """Guarda una verificación pendiente en la BD y despierta a los trabajadores"""
+    from database import TrabajoVerificacion
+
+    trabajo = TrabajoVerificacion(
+        id=str(uuid.uuid4()),
+        estado="pendiente",
+        texto=texto or "",
+        url=url,
+        usuario_id=usuario_id,
+        modo=modo,
+        use_ia=use_ia,
+        intentos=0,
+        fecha_creacion=datetime.utcnow()
+    )
+    db.add(trabajo)
+    db.commit()
+    db.refresh(trabajo)
+
+    incrementar("trabajos.encolados")
+    if _cola is not None:
+        _cola.avisar()
+
+    logger.info(f"📥 Trabajo encolado: {trabajo.id}")
+    return serializar_trabajo(trabajo)
+
+def obtener_trabajo(db: Session, trabajo_id: str) -> Optional[Dict[str, Any]]:
+    from database import TrabajoVerificacion
+
+    trabajo = db.query(TrabajoVerificacion).filter(TrabajoVerificacion.id == trabajo_id).first()
+    return serializar_trabajo(trabajo) if trabajo else None
+
+def serializar_trabajo(trabajo: Any) -> Dict[str, Any]:
+    respuesta = {
+        "job_id": trabajo.id,
+        "estado": trabajo.estado,
+        "intentos": trabajo.intentos,
+        "fecha_creacion": trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        "fecha_inicio": trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+        "fecha_fin": trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None
+    }
+    if trabajo.resultado:
+        respuesta["resultado"] = json.loads(trabajo.resultado)
+    if trabajo.error:
+        respuesta["error"] = trabajo.error
+    return respuesta
+
+def reclamar_trabajo(db: Session) -> Optional[Any]:
+    """
+    Toma el trabajo pendiente más antiguo (o uno abandonado). El UPDATE
+    condicional garantiza que dos trabajadores, aunque estén en procesos
+    distintos, nunca reclaman el mismo trabajo.
+    """
+    from database import TrabajoVerificacion
+
+    ahora = datetime.utcnow()
+    limite_abandono = ahora - timedelta(seconds=TRABAJO_ABANDONADO_SEGUNDOS)
+    reclamable = or_(
+        TrabajoVerificacion.estado == "pendiente",
+        and_(
+            TrabajoVerificacion.estado == "en_proceso",
+            TrabajoVerificacion.fecha_inicio < limite_abandono
+        )
+    )
+
+    candidatos = db.query(TrabajoVerificacion.id, TrabajoVerificacion.estado)\
+        .filter(reclamable)\
+        .order_by(TrabajoVerificacion.fecha_creacion)\
+        .limit(10)\
+        .all()
+
+    for candidato in candidatos:
+        actualizadas = db.query(TrabajoVerificacion)\
+            .filter(TrabajoVerificacion.id == candidato.id)\
+            .filter(TrabajoVerificacion.estado == candidato.estado)\
+            .filter(reclamable)\
+            .update({
+                "estado": "en_proceso",
+                "fecha_inicio": ahora,
+                "intentos": TrabajoVerificacion.intentos + 1
+            }, synchronize_session=False)
+        db.commit()
+        if actualizadas == 1:
+            if candidato.estado == "en_proceso":
+                incrementar("trabajos.recuperados")
+            trabajo = db.query(TrabajoVerificacion).filter(TrabajoVerificacion.id == candidato.id).first()
+            # Soltar la conexión antes de ejecutar: el trabajo queda en memoria ya cargado
+            db.expunge(trabajo)
+            db.commit()
+            return trabajo
+
+    return None
+
+def ejecutar_trabajo(trabajo: Any, db: Session) -> Dict[str, Any]:
+    """Ejecuta la verificación igual que POST /verificar/v2 síncrono"""
+    from services.url_extractor import extraer_texto_desde_url
+    from services.compresion_texto import combinar_con_extraido, combinar_sin_comprimir
+    from services.hybrid_verifier import verificar_hibrido
+    from services.gemini_analyzer import agrupando_llamadas
+
+    texto = texto_modo = trabajo.texto
+    if trabajo.url:
+        texto_extraido = extraer_texto_desde_url(trabajo.url)
+        texto_modo = combinar_sin_comprimir(texto, texto_extraido)
+        texto = combinar_con_extraido(texto, texto_extraido)
+
+    # Los trabajadores de la cola comparten micro-lotes de Gemini entre sí
+    with agrupando_llamadas():
+        return verificar_hibrido(
+            texto=texto,
+            db=db,
+            url=trabajo.url,
+            usuario_id=trabajo.usuario_id,
+            modo=trabajo.modo,
+            use_ia=trabajo.use_ia,
+            texto_modo=texto_modo
+        )
+
+def procesar_siguiente(ejecutar: Callable[[Any, Session], Dict[str, Any]] = ejecutar_trabajo) -> bool:
+    """Reclama y procesa un trabajo. Devuelve False si la cola estaba vacía."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        trabajo = reclamar_trabajo(db)
+        if trabajo is None:
+            return False
+
+        trabajo_id = trabajo.id
+        if trabajo.intentos > MAX_INTENTOS:
+            _finalizar(db, trabajo_id, "error", error=f"Superado el máximo de {MAX_INTENTOS} intentos")
+            incrementar("trabajos.fallidos")
+            return True
+
+        inicio = time.perf_counter()
+        try:
+            resultado = ejecutar(trabajo, db)
+        except Exception as e:
+            logger.error(f"❌ Error procesando trabajo {trabajo_id}: {e}")
+            db.rollback()
+            _finalizar(db, trabajo_id, "error", error=str(e))
+            incrementar("trabajos.fallidos")
+            return True
+
+        _finalizar(db, trabajo_id, "completado", resultado=resultado)
+        incrementar("trabajos.completados")
+        logger.info(f"✅ Trabajo {trabajo_id} completado en {time.perf_counter() - inicio:.2f}s")
+        return True
+    finally:
+        db.close()
+
+def _finalizar(
+    db: Session,
+    trabajo_id: str,
+    estado: str,
+    resultado: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None
+) -> None:
+    from database import TrabajoVerificacion
+
+    db.query(TrabajoVerificacion)\
+        .filter(TrabajoVerificacion.id == trabajo_id)\
+        .update({
+            "estado": estado,
+            "resultado": json.dumps(resultado, ensure_ascii=False, default=str) if resultado is not None else None,
+            "error": error,
+            "fecha_fin": datetime.utcnow()
+        }, synchronize_session=False)
+    db.commit()
+
+class ColaTrabajos:
+    """
+    Pool de hilos que consume la cola de trabajos guardada en la BD.
+    Los trabajos encolados desde este mismo proceso despiertan a los
+    trabajadores al momento; los demás se recogen en el siguiente sondeo.
+    """
+
+    def __init__(
+        self,
+        num_trabajadores: int = NUM_TRABAJADORES,
+        ejecutar: Callable[[Any, Session], Dict[str, Any]] = ejecutar_trabajo,
+        intervalo: float = INTERVALO_SONDEO
+    ):
+        self.num_trabajadores = num_trabajadores
+        self.ejecutar = ejecutar
+        self.intervalo = intervalo
+        self._aviso = threading.Event()
+        self._parar = threading.Event()
+        self._hilos: List[threading.Thread] = []
+
+    def iniciar(self) -> None:
+        for i in range(self.num_trabajadores):
+            hilo = threading.Thread(target=self._bucle, name=f"trabajos-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info(f"🟢 Cola de trabajos iniciada con {self.num_trabajadores} trabajadores")
+
+    def detener(self, espera: float = 5.0) -> None:
+        self._parar.set()
+        self._aviso.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=espera)
+        self._hilos = []
+
+    def avisar(self) -> None:
+        self._aviso.set()
+
+    def _bucle(self) -> None:
+        while not self._parar.is_set():
+            try:
+                hubo_trabajo = procesar_siguiente(self.ejecutar)
+            except Exception as e:
+                # Errores de BD al reclamar: esperar y reintentar
+                logger.error(f"❌ Error en trabajador de la cola: {e}")
+                hubo_trabajo = False
+
+            if not hubo_trabajo:
+                self._aviso.wait(self.intervalo)
+                self._aviso.clear()
+
+# Cola global del proceso
+_cola = None
+
+def iniciar_cola_trabajos(num_trabajadores: int = NUM_TRABAJADORES) -> Optional[ColaTrabajos]:
+    """Arranca los trabajadores del proceso (singleton); no hace nada con 0 trabajadores"""
+    global _cola
+    if _cola is None and num_trabajadores > 0:
+        _cola = ColaTrabajos(num_trabajadores)
+        _cola.iniciar()
+    return _cola
+
+def detener_cola_trabajos() -> None:
+    global _cola
+    if _cola is not None:
+        _cola.detener()
+        _cola = None
+
+def estadisticas_trabajos(db: Session) -> Dict[str, Any]:
+    from database import TrabajoVerificacion
+    from sqlalchemy import func
+
+    por_estado = db.query(TrabajoVerificacion.estado, func.count(TrabajoVerificacion.id))\
+        .group_by(TrabajoVerificacion.estado)\
+        .all()
+    return {
+        "por_estado": {estado: total for estado, total in por_estado},
+        "trabajadores": _cola.num_trabajadores if _cola else 0,
+        **obtener_contadores("trabajos")
+    }
+
+if __name__ == "__main__":
+    # Trabajadores en un proceso aparte: python -m services.cola_trabajos
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from database import create_tables
+    from services.estadisticas_agregadas import iniciar_estadisticas_agregadas, detener_estadisticas_agregadas
+    create_tables()
+    iniciar_estadisticas_agregadas()
+
+    cola = ColaTrabajos(max(1, NUM_TRABAJADORES))
+    cola.iniciar()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        cola.detener()
+        detener_estadisticas_agregadas()
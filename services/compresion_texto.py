@@ -0,0 +1,156 @@
+# services/compresion_texto.py
+import os
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto de tokens del texto que se envía a Gemini y a FactCheck cuando
+# incluye el contenido extraído de una URL (~4 caracteres por token)
+COMPRESION_ACTIVA = os.getenv("INPUT_COMPRESSION_ENABLED", "true").lower() == "true"
+PRESUPUESTO_TOKENS = int(os.getenv("INPUT_TOKEN_BUDGET", "300"))
+CARACTERES_POR_TOKEN = 4
+
+_FIN_FRASE = re.compile(r"(?<=[.!?…])\s+(?=[\"«¿¡(\w])")
+_NUMERO = re.compile(r"\d")
+_MAYUSCULA = re.compile(r"\b[A-ZÁÉÍÓÚÑ][\wáéíóúñ]+")
+
+VERBOS_DECLARATIVOS = [
+    "dijo", "afirmó", "aseguró", "confirmó", "negó", "denunció", "reveló", "explicó",
+    "advirtió", "según", "asegura", "afirma", "declara", "anuncia", "informa", "publicó"
+]
+
+# Restos de la página que no aportan nada a la verificación
+PALABRAS_RELLENO = [
+    "cookies", "suscríbete", "suscribete", "newsletter", "publicidad", "inicia sesión",
+    "todos los derechos", "compartir en", "síguenos", "leer más", "lee también",
+    "te puede interesar", "política de privacidad", "haz clic", "comentarios"
+]
+
+@lru_cache(maxsize=1)
+def _patrones() -> Dict[str, "re.Pattern"]:
+    """Listas de palabras compiladas una sola vez en una expresión cada una"""
+    from services.hybrid_verifier import PATRONES_FUTUROS, PALABRAS_NOTICIA_RECIENTE
+
+    def _alternativas(palabras: List[str]) -> "re.Pattern":
+        return re.compile("|".join(re.escape(palabra) for palabra in palabras))
+
+    return {
+        "relleno": _alternativas(PALABRAS_RELLENO),
+        "declarativos": _alternativas(VERBOS_DECLARATIVOS),
+        "actualidad": _alternativas(PALABRAS_NOTICIA_RECIENTE),
+        "futuro": re.compile("|".join(PATRONES_FUTUROS)),
+    }
+
+def estimar_tokens(texto: str) -> int:
+    return -(-len(texto) // CARACTERES_POR_TOKEN)
+
+def dividir_frases(texto: str) -> List[str]:
+    return [frase.strip() for frase in _FIN_FRASE.split(" ".join(texto.split())) if frase.strip()]
+
+def puntuar_frase(frase: str, posicion: int) -> float:
+    """
+    Cuánto se parece la frase a una afirmación verificable: cifras, entidades,
+    verbos declarativos y las mismas señales de actualidad que usa el modo auto.
+    """
+    patrones = _patrones()
+    frase_lower = frase.lower()
+    palabras = len(frase.split())
+    if palabras < 4 or patrones["relleno"].search(frase_lower):
+        return -1.0
+
+    puntuacion = 0.0
+    if _NUMERO.search(frase):
+        puntuacion += 2
+    # Palabras en mayúscula que no abren la frase: personas, lugares, organismos
+    entidades = len(_MAYUSCULA.findall(frase.split(" ", 1)[1]))
+    puntuacion += min(3, entidades) * 0.75
+    if patrones["declarativos"].search(frase_lower):
+        puntuacion += 2
+    if patrones["actualidad"].search(frase_lower):
+        puntuacion += 1.5
+    if patrones["futuro"].search(frase_lower):
+        puntuacion += 1.5
+    # El arranque de un artículo suele resumir la noticia
+    puntuacion += max(0.0, 1.0 - posicion * 0.2)
+    # Frases kilométricas gastan presupuesto sin ser más verificables
+    if palabras > 60:
+        puntuacion -= 1
+    return puntuacion
+
+def comprimir_texto(texto: str, presupuesto_tokens: int = PRESUPUESTO_TOKENS) -> Tuple[str, Dict[str, Any]]:
+    """
+    Se queda con las frases más verificables que caben en el presupuesto, en
+    su orden original. Devuelve (texto, info) con los tokens antes y después.
+    """
+    tokens_originales = estimar_tokens(texto)
+    info = {"tokens_originales": tokens_originales, "tokens_comprimidos": tokens_originales, "frases_descartadas": 0}
+    if tokens_originales <= presupuesto_tokens:
+        return texto, info
+
+    frases = dividir_frases(texto)
+    candidatas = sorted(
+        ((puntuar_frase(frase, posicion), posicion) for posicion, frase in enumerate(frases)),
+        key=lambda candidata: (-candidata[0], candidata[1])
+    )
+    elegidas, usados = [], 0
+    for puntuacion, posicion in candidatas:
+        if puntuacion < 0:
+            break
+        tokens = estimar_tokens(frases[posicion]) + 1
+        if usados + tokens <= presupuesto_tokens:
+            elegidas.append(posicion)
+            usados += tokens
+
+    if not elegidas:
+        # Ninguna frase cabe entera (texto sin puntuación): se corta por el presupuesto
+        comprimido = texto[:presupuesto_tokens * CARACTERES_POR_TOKEN].rsplit(" ", 1)[0]
+    else:
+        comprimido = " ".join(frases[posicion] for posicion in sorted(elegidas))
+    info.update(tokens_comprimidos=estimar_tokens(comprimido), frases_descartadas=len(frases) - len(elegidas))
+    return comprimido, info
+
+def combinar_sin_comprimir(texto: str, texto_extraido: str) -> str:
+    """
+    Texto del usuario y artículo enteros. Con este texto se elige el modo auto:
+    la compresión se queda con las frases con cifras y fechas y cambiaría la ruta.
+    """
+    texto = texto or ""
+    return f"{texto} {texto_extraido}" if texto else texto_extraido
+
+def combinar_con_extraido(texto: str, texto_extraido: str) -> str:
+    """
+    Texto que se verifica cuando hay URL: lo que escribió el usuario entero y,
+    del artículo, solo las frases que caben en el resto del presupuesto.
+    """
+    texto = texto or ""
+    if not COMPRESION_ACTIVA:
+        return combinar_sin_comprimir(texto, texto_extraido)
+
+    # Aunque el usuario haya escrito mucho, el artículo conserva un mínimo
+    restante = max(PRESUPUESTO_TOKENS // 4, PRESUPUESTO_TOKENS - estimar_tokens(texto))
+    extraido, info = comprimir_texto(texto_extraido, restante)
+    incrementar("compresion.textos")
+    incrementar("compresion.tokens_originales", info["tokens_originales"])
+    incrementar("compresion.tokens_comprimidos", info["tokens_comprimidos"])
+    if info["tokens_comprimidos"] < info["tokens_originales"]:
+        incrementar("compresion.comprimidos")
+        logger.info(f"✂️ Texto extraído comprimido: {info['tokens_originales']} → {info['tokens_comprimidos']} tokens")
+
+    if not extraido:
+        return texto
+    return f"{texto} {extraido}" if texto else extraido
+
+def estadisticas_compresion() -> Dict[str, Any]:
+    contadores = obtener_contadores("compresion")
+    originales = contadores.get("tokens_originales", 0)
+    return {
+        "activa": COMPRESION_ACTIVA,
+        "presupuesto_tokens": PRESUPUESTO_TOKENS,
+        **contadores,
+        "ratio": round(contadores.get("tokens_comprimidos", 0) / originales, 4) if originales else 1
+    }
@@ -0,0 +1,332 @@
+# services/ejecutor_paralelo.py
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# Plazo compartido (en segundos) para todos los backends de una misma petición
+PLAZO_HIBRIDO = float(os.getenv("HYBRID_DEADLINE_SECONDS", "30"))
+MAX_WORKERS = int(os.getenv("HYBRID_MAX_WORKERS", "16"))
+# Modo especulativo: lanzar el backend secundario antes de saber si hace falta
+GEMINI_ESPECULATIVO = os.getenv("GEMINI_SPECULATIVE", "false").lower() == "true"
+RETRASO_ESPECULATIVO_MS = int(os.getenv("GEMINI_HEDGE_DELAY_MS", "300"))
+
+# Hilos extra para las tareas que agotan el plazo: siguen ejecutándose (un hilo
+# no se puede interrumpir) pero dejan su plaza libre para peticiones nuevas
+MAX_ABANDONADAS = int(os.getenv("HYBRID_MAX_ABANDONED", str(MAX_WORKERS)))
+
+class PoolHibrido:
+    """
+    Pool de los backends con MAX_WORKERS plazas de trabajo activo y una reserva
+    de MAX_ABANDONADAS hilos para las tareas cuyo resultado ya no se espera.
+    Al abandonar una tarea en marcha su plaza se libera; si la reserva está
+    llena, la tarea conserva la plaza hasta terminar (como un pool normal).
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_abandonadas: int = MAX_ABANDONADAS):
+        self.max_workers = max_workers
+        self.max_abandonadas = max_abandonadas
+        self._executor = ThreadPoolExecutor(max_workers=max_workers + max_abandonadas, thread_name_prefix="hibrido")
+        self._plazas = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+        self._abandonadas = 0
+
+    def enviar(self, funcion: Callable, *args) -> Future:
+        """submit que conserva el contexto (contextvars) del hilo que lanza la tarea"""
+        contexto = contextvars.copy_context()
+        estado = {"plaza": False, "abandonada": False, "terminada": False}
+
+        def _ejecutar():
+            self._plazas.acquire()
+            with self._lock:
+                estado["plaza"] = True
+                abandonada = estado["abandonada"]
+            try:
+                # Abandonada mientras esperaba plaza: ni se empieza
+                return None if abandonada else contexto.run(funcion, *args)
+            finally:
+                self._terminar(estado)
+
+        futuro = self._executor.submit(_ejecutar)
+        futuro.estado_pool = estado
+        return futuro
+
+    def _terminar(self, estado: Dict[str, bool]) -> None:
+        with self._lock:
+            estado["terminada"] = True
+            if estado["abandonada"]:
+                self._abandonadas -= 1
+            if estado["plaza"]:
+                estado["plaza"] = False
+                self._plazas.release()
+
+    def abandonar(self, futuro: Future) -> bool:
+        """
+        Deja de esperar una tarea. True si no había empezado (se cancela sin
+        coste); si ya está en marcha pasa a la reserva de abandonadas.
+        """
+        if futuro.cancel():
+            return True
+        estado = futuro.estado_pool
+        with self._lock:
+            if estado["terminada"] or estado["abandonada"]:
+                return False
+            if self._abandonadas >= self.max_abandonadas:
+                incrementar("ejecutor_hibrido.abandonadas_sin_reserva")
+                return False
+            estado["abandonada"] = True
+            self._abandonadas += 1
+            if estado["plaza"]:
+                estado["plaza"] = False
+                self._plazas.release()
+        incrementar("ejecutor_hibrido.abandonadas")
+        return False
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            abandonadas = self._abandonadas
+        return {
+            "max_workers": self.max_workers,
+            "max_abandonadas": self.max_abandonadas,
+            "abandonadas_en_curso": abandonadas,
+            **obtener_contadores("ejecutor_hibrido")
+        }
+
+# Pool global
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> PoolHibrido:
+    """Obtener pool de hilos para los backends (singleton)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PoolHibrido()
+        return _pool
+
+def _resultado_agotado(nombre: str, plazo: float) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "agotado": True,
+        "error": f"{nombre} no respondió en {plazo:.1f}s"
+    }
+
+def _resultado_de_futuro(nombre: str, futuro: Future) -> Dict[str, Any]:
+    try:
+        return futuro.result()
+    except Exception as e:
+        logger.error(f"❌ Error en backend {nombre}: {e}")
+        return {"success": False, "error": str(e)}
+
+def ejecutar_en_paralelo(
+    tareas: Dict[str, Callable[[], Dict[str, Any]]],
+    plazo: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Lanza todos los backends a la vez y espera como máximo `plazo` segundos.
+    Los que no terminan a tiempo se devuelven como fallidos y se listan en "agotados".
+    """
+    plazo = PLAZO_HIBRIDO if plazo is None else plazo
+    pool = get_pool()
+    latencias = {}
+
+    def _medir(nombre: str, tarea: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        try:
+            return tarea()
+        finally:
+            latencias[nombre] = round((time.perf_counter() - inicio) * 1000)
+
+    futuros = {
+        nombre: pool.enviar(_medir, nombre, tarea)
+        for nombre, tarea in tareas.items()
+    }
+
+    wait(futuros.values(), timeout=plazo)
+
+    resultados = {}
+    agotados = []
+    for nombre, futuro in futuros.items():
+        if not futuro.done():
+            # El hilo sigue en marcha pero su resultado ya no se usará
+            pool.abandonar(futuro)
+            agotados.append(nombre)
+            resultados[nombre] = _resultado_agotado(nombre, plazo)
+            logger.warning(f"⏱️ {nombre} agotó el plazo de {plazo:.1f}s")
+            continue
+
+        resultados[nombre] = _resultado_de_futuro(nombre, futuro)
+
+    return {
+        "resultados": resultados,
+        "agotados": agotados,
+        "latencias_ms": dict(latencias)
+    }
+
+def ejecutar_con_especulacion(
+    principal: Callable[[], Dict[str, Any]],
+    especulativa: Callable[[], Dict[str, Any]],
+    es_definitivo: Callable[[Dict[str, Any]], bool],
+    retraso_ms: Optional[int] = None,
+    plazo: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Lanza `principal` y, si no ha dado un resultado definitivo tras `retraso_ms`,
+    arranca `especulativa` en paralelo. Si al final `principal` basta, la
+    especulativa se cancela (si aún no empezó) o su resultado se descarta.
+    """
+    retraso_ms = RETRASO_ESPECULATIVO_MS if retraso_ms is None else retraso_ms
+    plazo = PLAZO_HIBRIDO if plazo is None else plazo
+    pool = get_pool()
+    inicio = time.monotonic()
+
+    def _restante() -> float:
+        return max(0.0, plazo - (time.monotonic() - inicio))
+
+    futuro_principal = pool.enviar(principal)
+    wait([futuro_principal], timeout=min(retraso_ms / 1000, plazo))
+
+    if futuro_principal.done():
+        resultado_principal = _resultado_de_futuro("principal", futuro_principal)
+        if es_definitivo(resultado_principal):
+            # Resuelto antes del retraso: la llamada especulativa ni se lanza
+            incrementar("especulacion.ahorradas")
+            return {"principal": resultado_principal, "especulativa": None}
+
+    futuro_especulativo = pool.enviar(especulativa)
+    incrementar("especulacion.lanzadas")
+
+    wait([futuro_principal], timeout=_restante())
+    if futuro_principal.done():
+        resultado_principal = _resultado_de_futuro("principal", futuro_principal)
+    else:
+        pool.abandonar(futuro_principal)
+        resultado_principal = _resultado_agotado("principal", plazo)
+
+    if es_definitivo(resultado_principal):
+        if pool.abandonar(futuro_especulativo):
+            incrementar("especulacion.ahorradas")
+        else:
+            # Ya estaba en marcha: se paga la llamada pero se ignora el resultado
+            incrementar("especulacion.desperdiciadas")
+        return {"principal": resultado_principal, "especulativa": None}
+
+    wait([futuro_especulativo], timeout=_restante())
+    if futuro_especulativo.done():
+        incrementar("especulacion.aprovechadas")
+        resultado_especulativo = _resultado_de_futuro("especulativa", futuro_especulativo)
+    else:
+        pool.abandonar(futuro_especulativo)
+        resultado_especulativo = _resultado_agotado("especulativa", plazo)
+
+    return {"principal": resultado_principal, "especulativa": resultado_especulativo}
+
+# ==================== VARIANTES ASÍNCRONAS ====================
+
+async def _resultado_de_tarea(nombre: str, tarea: asyncio.Task) -> Dict[str, Any]:
+    try:
+        return await tarea
+    except Exception as e:
+        logger.error(f"❌ Error en backend {nombre}: {e}")
+        return {"success": False, "error": str(e)}
+
+async def ejecutar_en_paralelo_async(
+    tareas: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]],
+    plazo: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Igual que ejecutar_en_paralelo pero con corrutinas: los backends que
+    agotan el plazo se cancelan de verdad en lugar de quedar en segundo plano.
+    """
+    plazo = PLAZO_HIBRIDO if plazo is None else plazo
+    latencias = {}
+
+    async def _medir(nombre: str, tarea: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        try:
+            return await tarea()
+        finally:
+            latencias[nombre] = round((time.perf_counter() - inicio) * 1000)
+
+    pendientes = {
+        nombre: asyncio.create_task(_medir(nombre, tarea))
+        for nombre, tarea in tareas.items()
+    }
+
+    await asyncio.wait(pendientes.values(), timeout=plazo)
+
+    resultados = {}
+    agotados = []
+    for nombre, tarea in pendientes.items():
+        if not tarea.done():
+            tarea.cancel()
+            agotados.append(nombre)
+            resultados[nombre] = _resultado_agotado(nombre, plazo)
+            logger.warning(f"⏱️ {nombre} agotó el plazo de {plazo:.1f}s")
+            continue
+
+        resultados[nombre] = await _resultado_de_tarea(nombre, tarea)
+
+    return {
+        "resultados": resultados,
+        "agotados": agotados,
+        "latencias_ms": dict(latencias)
+    }
+
+async def ejecutar_con_especulacion_async(
+    principal: Callable[[], Awaitable[Dict[str, Any]]],
+    especulativa: Callable[[], Awaitable[Dict[str, Any]]],
+    es_definitivo: Callable[[Dict[str, Any]], bool],
+    retraso_ms: Optional[int] = None,
+    plazo: Optional[float] = None
+) -> Dict[str, Any]:
+    """Variante asíncrona de ejecutar_con_especulacion"""
+    retraso_ms = RETRASO_ESPECULATIVO_MS if retraso_ms is None else retraso_ms
+    plazo = PLAZO_HIBRIDO if plazo is None else plazo
+    inicio = time.monotonic()
+
+    def _restante() -> float:
+        return max(0.0, plazo - (time.monotonic() - inicio))
+
+    tarea_principal = asyncio.create_task(principal())
+    await asyncio.wait([tarea_principal], timeout=min(retraso_ms / 1000, plazo))
+
+    if tarea_principal.done():
+        resultado_principal = await _resultado_de_tarea("principal", tarea_principal)
+        if es_definitivo(resultado_principal):
+            incrementar("especulacion.ahorradas")
+            return {"principal": resultado_principal, "especulativa": None}
+
+    tarea_especulativa = asyncio.create_task(especulativa())
+    incrementar("especulacion.lanzadas")
+
+    await asyncio.wait([tarea_principal], timeout=_restante())
+    if tarea_principal.done():
+        resultado_principal = await _resultado_de_tarea("principal", tarea_principal)
+    else:
+        tarea_principal.cancel()
+        resultado_principal = _resultado_agotado("principal", plazo)
+
+    if es_definitivo(resultado_principal):
+        # La petición ya salió: se aborta pero cuenta como desperdiciada
+        tarea_especulativa.cancel()
+        incrementar("especulacion.desperdiciadas")
+        return {"principal": resultado_principal, "especulativa": None}
+
+    await asyncio.wait([tarea_especulativa], timeout=_restante())
+    if tarea_especulativa.done():
+        incrementar("especulacion.aprovechadas")
+        resultado_especulativo = await _resultado_de_tarea("especulativa", tarea_especulativa)
+    else:
+        tarea_especulativa.cancel()
+        resultado_especulativo = _resultado_agotado("especulativa", plazo)
+
+    return {"principal": resultado_principal, "especulativa": resultado_especulativo}
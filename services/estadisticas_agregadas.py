@@ -0,0 +1,507 @@
+# services/estadisticas_agregadas.py
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from services.hyperloglog import HyperLogLog
+from services.metricas import incrementar
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos se vuelcan a la BD las consultas nuevas de este proceso
+INTERVALO_VOLCADO = float(os.getenv("STATS_FLUSH_INTERVAL_SECONDS", "5"))
+
+GRANULARIDADES = ("hora", "dia")
+
+def inicio_periodo(fecha: datetime, granularidad: str) -> datetime:
+    if granularidad == "hora":
+        return fecha.replace(minute=0, second=0, microsecond=0)
+    return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# (fecha_consulta, resultado, longitud_texto, usuario_id, fuente_primaria, modo,
+#  confianza, latencia_factcheck_ms, latencia_gemini_ms, latencia_total_ms)
+Evento = Tuple[datetime, str, int, Optional[str], Optional[str], Optional[str],
+               Optional[int], Optional[int], Optional[int], Optional[int]]
+
+# Columnas de AgregadoResultados que se suman, en el orden de sus contadores
+COLUMNAS_RESULTADOS = (
+    "consultas",
+    "suma_latencia_factcheck_ms", "latencias_factcheck",
+    "suma_latencia_gemini_ms", "latencias_gemini",
+    "suma_latencia_total_ms", "latencias_total"
+)
+
+def _contadores_resultados():
+    return defaultdict(lambda: [0] * len(COLUMNAS_RESULTADOS))
+
+def _agregar_eventos(eventos: List[Evento]):
+    """
+    Agrupa eventos en contadores por (granularidad, inicio, resultado), en
+    contadores por (granularidad, inicio, fuente, modo, confianza) y en
+    sketches de usuarios por (granularidad, inicio)
+    """
+    contadores = defaultdict(lambda: [0, 0])
+    resultados = _contadores_resultados()
+    sketches: Dict[Tuple[str, datetime], HyperLogLog] = {}
+    for fecha, resultado, longitud, usuario_id, fuente, modo, confianza, *latencias in eventos:
+        for granularidad in GRANULARIDADES:
+            inicio = inicio_periodo(fecha, granularidad)
+            contador = contadores[(granularidad, inicio, resultado)]
+            contador[0] += 1
+            contador[1] += longitud or 0
+            contador = resultados[(granularidad, inicio, fuente or "", modo or "", -1 if confianza is None else confianza)]
+            contador[0] += 1
+            for posicion, latencia in enumerate(latencias):
+                if latencia is not None:
+                    contador[1 + 2 * posicion] += latencia
+                    contador[2 + 2 * posicion] += 1
+            if usuario_id:
+                sketch = sketches.get((granularidad, inicio))
+                if sketch is None:
+                    sketch = sketches[(granularidad, inicio)] = HyperLogLog()
+                sketch.agregar(usuario_id)
+    return contadores, sketches, resultados
+
+class AcumuladorEstadisticas:
+    """
+    Recoge las consultas insertadas (tras el commit) y las vuelca
+    periódicamente a las tablas de agregados horarios y diarios.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_VOLCADO):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pendientes: List[Evento] = []
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def registrar(self, eventos: List[Evento]) -> None:
+        with self._lock:
+            self._pendientes.extend(eventos)
+
+    def volcar(self) -> int:
+        from database import SessionLocal
+
+        with self._lock:
+            eventos, self._pendientes = self._pendientes, []
+        if not eventos:
+            return 0
+
+        db = SessionLocal()
+        try:
+            _sumar_en_bd(db, *_agregar_eventos(eventos))
+            incrementar("agregados.volcados", len(eventos))
+            return len(eventos)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Error volcando estadísticas agregadas: {e}")
+            # Se reintentan en el siguiente volcado
+            with self._lock:
+                self._pendientes = eventos + self._pendientes
+            return 0
+        finally:
+            db.close()
+
+    def iniciar(self) -> None:
+        self._hilo = threading.Thread(target=self._bucle, name="estadisticas-agregadas", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo + 5)
+        self.volcar()
+
+    def _bucle(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self.volcar()
+
+def _sumar_fila(db: Session, modelo, clave: Dict[str, Any], sumas: Dict[str, int]) -> None:
+    """Suma `sumas` a la fila de `clave`, creándola si no existe"""
+    for _ in range(3):
+        actualizadas = db.query(modelo)\
+            .filter_by(**clave)\
+            .update({
+                columna: getattr(modelo, columna) + valor for columna, valor in sumas.items()
+            }, synchronize_session=False)
+        if actualizadas:
+            return
+        try:
+            with db.begin_nested():
+                db.add(modelo(**clave, **sumas))
+            return
+        except IntegrityError:
+            # Otro proceso creó la fila a la vez: volver a intentar el UPDATE
+            continue
+
+def _sumar_en_bd(db: Session, contadores, sketches, resultados) -> None:
+    """Suma los contadores y fusiona los sketches en sus filas (creándolas si no existen)"""
+    from database import AgregadoConsultas, AgregadoResultados, AgregadoUsuarios
+
+    for (granularidad, inicio, resultado), (consultas, suma_longitud) in contadores.items():
+        _sumar_fila(
+            db, AgregadoConsultas,
+            {"granularidad": granularidad, "inicio": inicio, "resultado": resultado},
+            {"consultas": consultas, "suma_longitud": suma_longitud}
+        )
+
+    for (granularidad, inicio, fuente, modo, confianza), valores in resultados.items():
+        _sumar_fila(
+            db, AgregadoResultados,
+            {"granularidad": granularidad, "inicio": inicio, "fuente_primaria": fuente, "modo": modo, "confianza": confianza},
+            dict(zip(COLUMNAS_RESULTADOS, valores))
+        )
+
+    for (granularidad, inicio), sketch in sketches.items():
+        for _ in range(3):
+            fila = db.query(AgregadoUsuarios)\
+                .filter_by(granularidad=granularidad, inicio=inicio)\
+                .with_for_update()\
+                .first()
+            if fila is not None:
+                combinado = HyperLogLog(fila.hll)
+                combinado.fusionar(sketch)
+                fila.hll = combinado.a_bytes()
+                break
+            try:
+                with db.begin_nested():
+                    db.add(AgregadoUsuarios(granularidad=granularidad, inicio=inicio, hll=sketch.a_bytes()))
+                break
+            except IntegrityError:
+                continue
+
+    db.commit()
+
+# ==================== CAPTURA DE ESCRITURAS ====================
+
+def _despues_de_flush(session: Session, contexto) -> None:
+    from database import ConsultaNoticia
+
+    nuevas = [
+        (
+            c.fecha_consulta or datetime.utcnow(), c.resultado, len(c.texto), c.usuario_id,
+            c.fuente_primaria, c.modo, c.confianza,
+            c.latencia_factcheck_ms, c.latencia_gemini_ms, c.latencia_total_ms
+        )
+        for c in session.new
+        if isinstance(c, ConsultaNoticia)
+    ]
+    if nuevas:
+        session.info.setdefault("consultas_nuevas", []).extend(nuevas)
+
+def _despues_de_commit(session: Session) -> None:
+    nuevas = session.info.pop("consultas_nuevas", None)
+    if nuevas and _acumulador is not None:
+        _acumulador.registrar(nuevas)
+
+def _despues_de_rollback(session: Session) -> None:
+    session.info.pop("consultas_nuevas", None)
+
+# ==================== LECTURA ====================
+
+def resumen_global(db: Session) -> Dict[str, Any]:
+    """Totales históricos a partir de los agregados diarios"""
+    from database import AgregadoConsultas, AgregadoUsuarios
+
+    por_resultado = db.query(
+        AgregadoConsultas.resultado,
+        func.sum(AgregadoConsultas.consultas),
+        func.sum(AgregadoConsultas.suma_longitud)
+    ).filter(AgregadoConsultas.granularidad == "dia")\
+        .group_by(AgregadoConsultas.resultado)\
+        .all()
+
+    total = sum(int(consultas or 0) for _, consultas, _ in por_resultado)
+    suma_longitud = sum(int(longitud or 0) for _, _, longitud in por_resultado)
+
+    usuarios = HyperLogLog()
+    for (hll,) in db.query(AgregadoUsuarios.hll).filter(AgregadoUsuarios.granularidad == "dia"):
+        usuarios.fusionar(HyperLogLog(hll))
+
+    return {
+        "total_consultas": total,
+        "usuarios_unicos": usuarios.estimar(),
+        "longitud_promedio_texto": round(suma_longitud / total, 2) if total else 0,
+        "distribucion_resultados": {
+            resultado: int(consultas or 0) for resultado, consultas, _ in por_resultado
+        }
+    }
+
+def resultados_recientes(db: Session, dias: int) -> Dict[str, Any]:
+    """
+    Volumen, confianza y latencias por fuente primaria y volumen por modo de
+    los últimos `dias` (con resolución de un día), desde los agregados diarios
+    """
+    from database import AgregadoResultados
+
+    desde = inicio_periodo(datetime.utcnow() - timedelta(days=dias), "dia")
+    filas = db.query(
+        AgregadoResultados.fuente_primaria,
+        AgregadoResultados.modo,
+        AgregadoResultados.confianza,
+        *(func.sum(getattr(AgregadoResultados, columna)) for columna in COLUMNAS_RESULTADOS)
+    ).filter(AgregadoResultados.granularidad == "dia", AgregadoResultados.inicio >= desde)\
+        .group_by(AgregadoResultados.fuente_primaria, AgregadoResultados.modo, AgregadoResultados.confianza)\
+        .all()
+
+    por_fuente = _contadores_resultados()
+    confianzas = defaultdict(lambda: [0, 0])
+    por_confianza = defaultdict(lambda: defaultdict(int))
+    por_modo = defaultdict(int)
+    for fuente, modo, confianza, *sumas in filas:
+        sumas = [int(valor or 0) for valor in sumas]
+        if modo:
+            por_modo[modo] += sumas[0]
+        if not fuente:
+            continue
+        for posicion, valor in enumerate(sumas):
+            por_fuente[fuente][posicion] += valor
+        por_confianza[fuente][str(confianza) if confianza >= 0 else "sin_dato"] += sumas[0]
+        if confianza >= 0:
+            confianzas[fuente][0] += confianza * sumas[0]
+            confianzas[fuente][1] += sumas[0]
+
+    def _media(suma, cuantas):
+        return round(suma / cuantas, 1) if cuantas else None
+
+    return {
+        "ventana_dias": dias,
+        "por_fuente_primaria": {
+            fuente: {
+                "consultas": sumas[0],
+                "confianza_promedio": _media(*confianzas[fuente]),
+                "latencia_promedio_ms": {
+                    "factcheck": _media(sumas[1], sumas[2]),
+                    "gemini": _media(sumas[3], sumas[4]),
+                    "total": _media(sumas[5], sumas[6])
+                },
+                "por_confianza": dict(por_confianza[fuente])
+            }
+            for fuente, sumas in por_fuente.items()
+        },
+        "por_modo": dict(por_modo)
+    }
+
+def consultas_desde(db: Session, desde: datetime) -> int:
+    """Consultas desde una fecha, con resolución de una hora"""
+    from database import AgregadoConsultas
+
+    total = db.query(func.sum(AgregadoConsultas.consultas))\
+        .filter(AgregadoConsultas.granularidad == "hora")\
+        .filter(AgregadoConsultas.inicio >= inicio_periodo(desde, "hora"))\
+        .scalar()
+    return int(total or 0)
+
+# ==================== RECÁLCULO (BACKFILL) ====================
+
+_estado_recalculo: Dict[str, Any] = {"estado": "nunca_ejecutado"}
+_recalculo_lock = threading.Lock()
+
+def recalcular_desde_bd(tamano_bloque: int = 50000) -> Dict[str, Any]:
+    """
+    Reconstruye los agregados a partir de consultas_noticias. La hora en
+    curso no se recalcula (se alimenta de las escrituras en vivo) y el día en
+    curso se rehace como historial hasta esa hora + el agregado de la hora.
+    """
+    from database import SessionLocal, ConsultaNoticia, TextoConsulta, AgregadoConsultas, AgregadoResultados, AgregadoUsuarios
+
+    if not _recalculo_lock.acquire(blocking=False):
+        return {"success": False, "error": "Ya hay un recálculo en curso"}
+
+    inicio = time.perf_counter()
+    ahora = datetime.utcnow()
+    corte = inicio_periodo(ahora, "hora")
+    hoy = inicio_periodo(ahora, "dia")
+    _estado_recalculo.update(estado="en_curso", filas_leidas=0, iniciado=ahora.isoformat(), error=None)
+
+    db = SessionLocal()
+    try:
+        filas = db.query(
+            ConsultaNoticia.fecha_consulta,
+            ConsultaNoticia.resultado,
+            func.coalesce(TextoConsulta.longitud, func.length(ConsultaNoticia.texto_consultado)),
+            ConsultaNoticia.usuario_id,
+            ConsultaNoticia.fuente_primaria,
+            ConsultaNoticia.modo,
+            ConsultaNoticia.confianza,
+            ConsultaNoticia.latencia_factcheck_ms,
+            ConsultaNoticia.latencia_gemini_ms,
+            ConsultaNoticia.latencia_total_ms
+        ).outerjoin(TextoConsulta, ConsultaNoticia.texto_hash == TextoConsulta.hash)\
+            .filter(ConsultaNoticia.fecha_consulta < corte)\
+            .yield_per(tamano_bloque)
+
+        contadores = defaultdict(lambda: [0, 0])
+        resultados = _contadores_resultados()
+        sketches: Dict[Tuple[str, datetime], HyperLogLog] = {}
+        bloque: List[Evento] = []
+        for fila in filas:
+            bloque.append(tuple(fila))
+            if len(bloque) >= tamano_bloque:
+                _acumular(contadores, sketches, resultados, bloque)
+                _estado_recalculo["filas_leidas"] += len(bloque)
+                bloque = []
+        _acumular(contadores, sketches, resultados, bloque)
+        _estado_recalculo["filas_leidas"] += len(bloque)
+
+        # Lo pendiente de este proceso se vuelca antes de reemplazar: así lo
+        # anterior al corte queda sustituido por el recálculo y no se cuenta dos veces
+        if _acumulador is not None:
+            _acumulador.volcar()
+
+        # El día en curso incluye también lo ya agregado en vivo en la hora en curso
+        for resultado, consultas, suma_longitud in db.query(
+            AgregadoConsultas.resultado, AgregadoConsultas.consultas, AgregadoConsultas.suma_longitud
+        ).filter_by(granularidad="hora", inicio=corte):
+            contadores[("dia", hoy, resultado)][0] += consultas
+            contadores[("dia", hoy, resultado)][1] += suma_longitud
+        for fila in db.query(AgregadoResultados).filter_by(granularidad="hora", inicio=corte):
+            contador = resultados[("dia", hoy, fila.fuente_primaria, fila.modo, fila.confianza)]
+            for posicion, columna in enumerate(COLUMNAS_RESULTADOS):
+                contador[posicion] += getattr(fila, columna)
+        fila_hora = db.query(AgregadoUsuarios).filter_by(granularidad="hora", inicio=corte).first()
+        if fila_hora is not None:
+            _acumular_sketch(sketches, ("dia", hoy), HyperLogLog(fila_hora.hll))
+
+        for modelo in (AgregadoConsultas, AgregadoResultados, AgregadoUsuarios):
+            db.query(modelo)\
+                .filter(modelo.granularidad == "hora", modelo.inicio < corte)\
+                .delete(synchronize_session=False)
+            db.query(modelo)\
+                .filter(modelo.granularidad == "dia", modelo.inicio <= hoy)\
+                .delete(synchronize_session=False)
+
+        db.bulk_save_objects([
+            AgregadoConsultas(
+                granularidad=granularidad, inicio=inicio_bucket, resultado=resultado,
+                consultas=consultas, suma_longitud=suma_longitud
+            )
+            for (granularidad, inicio_bucket, resultado), (consultas, suma_longitud) in contadores.items()
+        ])
+        db.bulk_save_objects([
+            AgregadoResultados(
+                granularidad=granularidad, inicio=inicio_bucket, fuente_primaria=fuente, modo=modo,
+                confianza=confianza, **dict(zip(COLUMNAS_RESULTADOS, valores))
+            )
+            for (granularidad, inicio_bucket, fuente, modo, confianza), valores in resultados.items()
+        ])
+        db.bulk_save_objects([
+            AgregadoUsuarios(granularidad=granularidad, inicio=inicio_bucket, hll=sketch.a_bytes())
+            for (granularidad, inicio_bucket), sketch in sketches.items()
+        ])
+        db.commit()
+
+        _estado_recalculo.update(
+            estado="completado",
+            filas_agregadas=len(contadores) + len(resultados),
+            segundos=round(time.perf_counter() - inicio, 2),
+            finalizado=datetime.utcnow().isoformat()
+        )
+        logger.info(f"✅ Agregados recalculados: {_estado_recalculo['filas_leidas']} consultas")
+        return {"success": True, **_estado_recalculo}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error recalculando agregados: {e}")
+        _estado_recalculo.update(estado="error", error=str(e))
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+        _recalculo_lock.release()
+
+def _acumular(contadores, sketches, resultados, eventos: List[Evento]) -> None:
+    parciales, parciales_sketches, parciales_resultados = _agregar_eventos(eventos)
+    for clave, (consultas, suma_longitud) in parciales.items():
+        contadores[clave][0] += consultas
+        contadores[clave][1] += suma_longitud
+    for clave, valores in parciales_resultados.items():
+        for posicion, valor in enumerate(valores):
+            resultados[clave][posicion] += valor
+    for clave, sketch in parciales_sketches.items():
+        _acumular_sketch(sketches, clave, sketch)
+
+def _acumular_sketch(sketches, clave, sketch: HyperLogLog) -> None:
+    if clave in sketches:
+        sketches[clave].fusionar(sketch)
+    else:
+        sketches[clave] = sketch
+
+def iniciar_recalculo() -> bool:
+    """Lanza el recálculo en segundo plano; False si ya había uno en curso"""
+    if _recalculo_lock.locked():
+        return False
+    threading.Thread(target=recalcular_desde_bd, name="recalculo-agregados", daemon=True).start()
+    return True
+
+def estado_recalculo() -> Dict[str, Any]:
+    return dict(_estado_recalculo)
+
+# ==================== CICLO DE VIDA ====================
+
+_acumulador = None
+
+def iniciar_estadisticas_agregadas() -> AcumuladorEstadisticas:
+    """
+    Engancha la captura de escrituras y arranca el volcado periódico. Si los
+    agregados están vacíos pero hay historial, lanza el recálculo inicial.
+    """
+    global _acumulador
+    from database import SessionLocal, ConsultaNoticia, AgregadoConsultas, AgregadoResultados
+
+    if _acumulador is not None:
+        return _acumulador
+
+    event.listen(SessionLocal, "after_flush", _despues_de_flush)
+    event.listen(SessionLocal, "after_commit", _despues_de_commit)
+    event.listen(SessionLocal, "after_rollback", _despues_de_rollback)
+
+    _acumulador = AcumuladorEstadisticas()
+    _acumulador.iniciar()
+
+    db = SessionLocal()
+    try:
+        # Los agregados por resultado llegaron después: también se rellenan desde el historial
+        sin_agregados = any(
+            db.query(modelo.inicio).first() is None for modelo in (AgregadoConsultas, AgregadoResultados)
+        )
+        con_historial = db.query(ConsultaNoticia.id).first() is not None
+    except Exception as e:
+        logger.error(f"❌ Error comprobando agregados: {e}")
+        sin_agregados = con_historial = False
+    finally:
+        db.close()
+
+    if sin_agregados and con_historial:
+        logger.info("🟡 Agregados vacíos: recalculando desde el historial en segundo plano")
+        iniciar_recalculo()
+
+    return _acumulador
+
+def detener_estadisticas_agregadas() -> None:
+    global _acumulador
+    from database import SessionLocal
+
+    if _acumulador is None:
+        return
+    _acumulador.detener()
+    event.remove(SessionLocal, "after_flush", _despues_de_flush)
+    event.remove(SessionLocal, "after_commit", _despues_de_commit)
+    event.remove(SessionLocal, "after_rollback", _despues_de_rollback)
+    _acumulador = None
+
+if __name__ == "__main__":
+    # Recálculo manual: python -m services.estadisticas_agregadas
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from database import create_tables
+    create_tables()
+    print(recalcular_desde_bd())
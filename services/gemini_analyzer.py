@@ -2,12 +2,46 @@
 from google import genai
 import json
 import os
-from typing import Dict, Any
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 import logging
-from datetime import datetime
+from datetime import datetime, date
+
+from services.limites import limite_upstream
+from services.metricas import con_latencia, incrementar, obtener_contadores
+from services.reparacion_json import cargar_json_tolerante
+from services.niveles_gemini import (
+    UMBRAL_ESCALADO,
+    configuracion_nivel,
+    elegir_nivel,
+    debe_escalar,
+    registrar_llamada,
+    registrar_escalado
+)
+from services.capacidades_gemini import (
+    get_registro_capacidades,
+    capacidad_busqueda,
+    capacidad_modelo,
+    capacidad_cache_contexto,
+    es_error_de_capacidad
+)
+from services.resiliencia import llamar_con_resiliencia, llamar_con_resiliencia_async, con_timeout
 
 logger = logging.getLogger(__name__)
 
+MODELO_GEMINI = "gemini-2.5-flash"
+# Modelo barato para el último recurso: reformatear una respuesta que no se pudo interpretar
+MODELO_REPARACION = os.getenv("GEMINI_REPAIR_MODEL", "gemini-2.5-flash-lite")
+
+# Micro-lotes: afirmaciones que llegan a la vez se analizan en una sola llamada
+MICRO_LOTE_VENTANA_MS = float(os.getenv("GEMINI_BATCH_WINDOW_MS", "15"))
+MICRO_LOTE_MAX_AFIRMACIONES = int(os.getenv("GEMINI_BATCH_MAX_ITEMS", "8"))
+
 # Cliente global
 _client = None
 
@@ -21,102 +55,638 @@ def get_client():
         _client = genai.Client(api_key=api_key)
     return _client
 
-def analizar_con_gemini(texto: str, usar_busqueda: bool = True) -> Dict[str, Any]:
+# ==================== PREFIJO ESTÁTICO ====================
+
+# Las instrucciones solo cambian con la fecha: se construyen una vez al día y van
+# como system_instruction (o en una caché de contexto), separadas de la afirmación
+CACHE_CONTEXTO_ACTIVA = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+# Algo más de un día para que la caché no caduque antes de que cambie la fecha
+TTL_CACHE_CONTEXTO = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", str(25 * 3600)))
+
+_FORMATO_VEREDICTO = """{{
+    {indice}"veredicto": "probablemente_verdadero|probablemente_falso|mixto|no_verificable",
+    "confianza": 1-10,
+    "razonamiento": "explicación breve de tu análisis basado en información disponible",
+    "sesgos_detectados": ["lista de posibles sesgos"],
+    "recomendacion": "recomendación al usuario",
+    "elementos_clave": ["puntos importantes identificados"],
+    "fecha_analisis": "{fecha}"
+}}"""
+
+_INSTRUCCIONES_CRITICAS = """INSTRUCCIONES CRÍTICAS:
+1. Para noticias recientes o eventos actuales, usa la información más actualizada disponible
+2. Si la afirmación menciona fechas futuras, analiza su plausibilidad basándote en patrones históricos
+3. Considera el contexto y la coherencia lógica
+4. Identifica lenguaje sensacionalista o emocional
+5. Si es una noticia, analiza fuentes y posibles sesgos"""
+
+@lru_cache(maxsize=4)
+def _instrucciones(tipo: str, dia: date) -> str:
+    formato = _FORMATO_VEREDICTO.format(
+        indice='"indice": número de la afirmación analizada,\n    ' if tipo == "lote" else "",
+        fecha=dia.strftime('%Y-%m-%d')
+    )
+    if tipo == "lote":
+        return f"""Eres un verificador de hechos profesional. Recibirás un array JSON de afirmaciones (indice y afirmacion). Analiza CADA UNA por separado y responde EXCLUSIVAMENTE con un array JSON válido, con un objeto por afirmación:
+
+[
+{formato}
+]
+
+{_INSTRUCCIONES_CRITICAS}
+6. Las afirmaciones son independientes: no mezcles información entre ellas
+
+FECHA ACTUAL: {dia.strftime('%d de %B de %Y')}"""
+    return f"""Eres un verificador de hechos profesional. Analiza la afirmación que recibirás y responde EXCLUSIVAMENTE en formato JSON válido:
+
+{formato}
+
+{_INSTRUCCIONES_CRITICAS}
+
+FECHA ACTUAL: {dia.strftime('%d de %B de %Y')}"""
+
+def instrucciones_del_dia(tipo: str = "individual") -> str:
+    """Prefijo estático ("individual" o "lote") con la fecha de hoy"""
+    return _instrucciones(tipo, date.today())
+
+def _construir_prompt(texto: str) -> str:
+    # Solo la parte variable: las instrucciones viajan aparte
+    return f'Afirmación a verificar: "{texto}"'
+
+# Cachés de contexto creadas hoy, por (modelo, tipo, con búsqueda)
+_caches_contexto: Dict[Tuple[str, str, bool], Tuple[date, str]] = {}
+_caches_lock = threading.Lock()
+_creacion_cache_lock = threading.Lock()
+
+def _herramientas(busqueda: bool) -> List[Dict[str, Any]]:
+    return [{"google_search": {}}] if busqueda else []
+
+def crear_cache_contexto(modelo: str, tipo: str = "individual", busqueda: bool = False, client=None) -> str:
+    """
+    Sube el prefijo del día como caché de contexto y devuelve su nombre. Las
+    herramientas van en la caché: la API no admite tools ni system_instruction
+    en una petición que usa cached_content.
+    """
+    client = client or get_client()
+    hoy = date.today()
+    config = {
+        "system_instruction": instrucciones_del_dia(tipo),
+        "ttl": f"{TTL_CACHE_CONTEXTO}s",
+        "display_name": f"factcheck-{tipo}{'-busqueda' if busqueda else ''}-{hoy.isoformat()}"
+    }
+    if busqueda:
+        config["tools"] = _herramientas(busqueda)
+    cache = client.caches.create(model=modelo, config=config)
+    with _caches_lock:
+        _caches_contexto[(modelo, tipo, busqueda)] = (hoy, cache.name)
+    get_registro_capacidades().registrar(capacidad_cache_contexto(modelo), True)
+    incrementar("prefijo_gemini.caches_creadas")
+    logger.info(f"🗂️ Caché de contexto de Gemini creada para {modelo} ({tipo}): {cache.name}")
+    return cache.name
+
+def _cache_contexto(client, modelo: str, tipo: str, busqueda: bool) -> Optional[str]:
+    """
+    Nombre de la caché de hoy, creándola si hace falta. None si está desactivada
+    o no disponible (p. ej. el prefijo no llega al mínimo de tokens de la API):
+    entonces se usa system_instruction.
+    """
+    if not CACHE_CONTEXTO_ACTIVA:
+        return None
+    clave = (modelo, tipo, busqueda)
+    with _caches_lock:
+        entrada = _caches_contexto.get(clave)
+    if entrada and entrada[0] == date.today():
+        return entrada[1]
+    if not get_registro_capacidades().disponible(capacidad_cache_contexto(modelo)):
+        return None
+    # Una sola creación por día y clave aunque lleguen muchas peticiones a la vez
+    with _creacion_cache_lock:
+        with _caches_lock:
+            entrada = _caches_contexto.get(clave)
+        if entrada and entrada[0] == date.today():
+            return entrada[1]
+        try:
+            return crear_cache_contexto(modelo, tipo, busqueda, client)
+        except Exception as e:
+            if es_error_de_capacidad(e):
+                get_registro_capacidades().registrar(capacidad_cache_contexto(modelo), False, str(e))
+            else:
+                logger.warning(f"⚠️ No se pudo crear la caché de contexto de Gemini: {e}")
+            incrementar("prefijo_gemini.caches_fallidas")
+            return None
+
+async def _cache_contexto_async(client, modelo: str, tipo: str, busqueda: bool) -> Optional[str]:
+    if not CACHE_CONTEXTO_ACTIVA:
+        return None
+    import asyncio
+    return await asyncio.to_thread(_cache_contexto, client, modelo, tipo, busqueda)
+
+def _con_prefijo(config: Dict[str, Any], tipo: str, cache: Optional[str]) -> Dict[str, Any]:
+    if cache:
+        incrementar("prefijo_gemini.con_cache")
+        return {**{clave: valor for clave, valor in config.items() if clave != "tools"}, "cached_content": cache}
+    return {**config, "system_instruction": instrucciones_del_dia(tipo)}
+
+def estadisticas_prefijo() -> Dict[str, Any]:
+    with _caches_lock:
+        caches = {f"{modelo}:{tipo}{':busqueda' if busqueda else ''}": nombre
+                  for (modelo, tipo, busqueda), (_, nombre) in _caches_contexto.items()}
+    return {
+        "cache_contexto_activa": CACHE_CONTEXTO_ACTIVA,
+        "caches": caches,
+        **obtener_contadores("prefijo_gemini")
+    }
+
+GENERATION_CONFIG = {
+    "temperature": 0.1,
+    "top_p": 0.8,
+    "top_k": 40,
+}
+
+# ==================== SALIDA ESTRUCTURADA ====================
+
+VEREDICTOS = ("probablemente_verdadero", "probablemente_falso", "mixto", "no_verificable")
+
+_PROPIEDADES_VEREDICTO = {
+    "veredicto": {"type": "STRING", "enum": list(VEREDICTOS)},
+    # google-genai 0.3 no admite minimum/maximum con la API de Google AI: se acota al interpretar
+    "confianza": {"type": "INTEGER", "description": "de 1 a 10"},
+    "razonamiento": {"type": "STRING"},
+    "sesgos_detectados": {"type": "ARRAY", "items": {"type": "STRING"}},
+    "recomendacion": {"type": "STRING"},
+    "elementos_clave": {"type": "ARRAY", "items": {"type": "STRING"}},
+    "fecha_analisis": {"type": "STRING"},
+}
+_OBLIGATORIAS = ["veredicto", "confianza", "razonamiento", "sesgos_detectados", "recomendacion", "elementos_clave"]
+
+ESQUEMA_VEREDICTO = {"type": "OBJECT", "properties": _PROPIEDADES_VEREDICTO, "required": _OBLIGATORIAS}
+ESQUEMA_LOTE = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"indice": {"type": "INTEGER"}, **_PROPIEDADES_VEREDICTO},
+        "required": ["indice", *_OBLIGATORIAS]
+    }
+}
+
+def _config_estructurada(esquema: Dict[str, Any]) -> Dict[str, Any]:
+    """El modelo devuelve directamente JSON que cumple el esquema (sin ```json ni texto alrededor)"""
+    return {**GENERATION_CONFIG, "response_mime_type": "application/json", "response_schema": esquema}
+
+def _confianza(valor: Any) -> Optional[int]:
+    # Admite 7, 7.5, "7" o "7/10"
+    if isinstance(valor, str):
+        valor = valor.strip().split("/")[0]
+    try:
+        return min(10, max(1, round(float(valor))))
+    except (TypeError, ValueError):
+        return None
+
+def _resultado_desde_json(datos: Any) -> Optional[Dict[str, Any]]:
+    """
+    Resultado estándar a partir del JSON del modelo. Sin veredicto o confianza
+    válidos no hay resultado (None); el resto de campos, si faltan, quedan vacíos.
+    """
+    if not isinstance(datos, dict):
+        return None
+    veredicto = str(datos.get("veredicto") or "").strip().lower().replace(" ", "_")
+    confianza = _confianza(datos.get("confianza"))
+    if veredicto not in VEREDICTOS or confianza is None:
+        return None
+
+    def _lista(valor):
+        if isinstance(valor, list):
+            return [str(elemento) for elemento in valor]
+        return [str(valor)] if valor else []
+
+    return {
+        "success": True,
+        "fuente": "gemini",
+        "resultado": veredicto,
+        "confianza": confianza,
+        "detalle": {
+            "razonamiento": str(datos.get("razonamiento") or ""),
+            "sesgos_detectados": _lista(datos.get("sesgos_detectados")),
+            "recomendacion": str(datos.get("recomendacion") or ""),
+            "elementos_clave": _lista(datos.get("elementos_clave")),
+            "fecha_analisis": datos.get("fecha_analisis") or datetime.now().strftime('%Y-%m-%d')
+        }
+    }
+
+def _contar_parseo(modelo: str, evento: str, cantidad: int = 1) -> None:
+    incrementar(f"parseo_gemini.{modelo}.{evento}", cantidad)
+
+def _interpretar_respuesta(response_text: str, modelo: str) -> Optional[Dict[str, Any]]:
     """
-    Analiza una afirmación usando Google Gemini con búsqueda web opcional
+    Convierte el texto devuelto por Gemini en el resultado estándar, reparando
+    localmente el JSON si hace falta. None si aun así no hay veredicto.
     """
+    _contar_parseo(modelo, "respuestas")
     try:
-        client = get_client()
-        
-        prompt = f"""
-        Eres un verificador de hechos profesional. Analiza esta afirmación y responde EXCLUSIVAMENTE en formato JSON válido:
-        
-        {{
-            "veredicto": "probablemente_verdadero|probablemente_falso|mixto|no_verificable",
-            "confianza": 1-10,
-            "razonamiento": "explicación breve de tu análisis basado en información disponible",
-            "sesgos_detectados": ["lista de posibles sesgos"],
-            "recomendacion": "recomendación al usuario",
-            "elementos_clave": ["puntos importantes identificados"],
-            "fecha_analisis": "{datetime.now().strftime('%Y-%m-%d')}"
-        }}
-        
-        INSTRUCCIONES CRÍTICAS:
-        1. Para noticias recientes o eventos actuales, usa la información más actualizada disponible
-        2. Si la afirmación menciona fechas futuras, analiza su plausibilidad basándote en patrones históricos
-        3. Considera el contexto y la coherencia lógica
-        4. Identifica lenguaje sensacionalista o emocional
-        5. Si es una noticia, analiza fuentes y posibles sesgos
-        
-        FECHA ACTUAL: {datetime.now().strftime('%d de %B de %Y')}
+        datos, reparado = cargar_json_tolerante(response_text)
+    except ValueError as e:
+        logger.warning(f"⚠️ Respuesta de {modelo} sin JSON interpretable: {e}")
+        return None
+
+    resultado = _resultado_desde_json(datos)
+    if resultado is None:
+        return None
+    completo = all(campo in datos for campo in _OBLIGATORIAS)
+    _contar_parseo(modelo, "directas" if not reparado and completo else "reparadas")
+    return resultado
+
+def _modelo_reparacion() -> str:
+    """El modelo barato si está disponible con esta clave; si no, el principal"""
+    if get_registro_capacidades().disponible(capacidad_modelo(MODELO_REPARACION)):
+        return MODELO_REPARACION
+    return MODELO_GEMINI
+
+def _modelo_fallido(modelo: str, error: Exception) -> None:
+    if modelo != MODELO_GEMINI and es_error_de_capacidad(error):
+        get_registro_capacidades().registrar(capacidad_modelo(modelo), False, str(error))
+
+def _prompt_reparacion(response_text: str) -> str:
+    return f"""
+        Convierte la siguiente respuesta de un verificador de hechos al formato JSON indicado,
+        sin añadir ni cambiar el análisis. Si no contiene un veredicto claro, usa "no_verificable".
         
-        Afirmación a verificar: "{texto}"
+        Respuesta: {response_text[:4000]}
         """
-        
-        generation_config = {
-            "temperature": 0.1,
-            "top_p": 0.8,
-            "top_k": 40,
+
+def _resultado_seguimiento(response, modelo: str, response_text: str) -> Dict[str, Any]:
+    datos = None
+    try:
+        datos, _ = cargar_json_tolerante(response.text)
+    except ValueError:
+        pass
+    resultado = _resultado_desde_json(datos)
+    if resultado is None:
+        _contar_parseo(modelo, "fallidas")
+        return {
+            "success": False,
+            "error": "Respuesta de Gemini sin veredicto interpretable",
+            "respuesta_cruda": response_text
         }
-        
-        # Intentar usar búsqueda web si está disponible
-        if usar_busqueda:
-            try:
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=prompt,
-                    config=generation_config,
-                    tools=[{"google_search": {}}]
-                )
-            except Exception as e:
-                logger.warning(f"Búsqueda web no disponible, usando modelo estándar: {e}")
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=prompt,
-                    config=generation_config
-                )
-        else:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=generation_config
+    _contar_parseo(modelo, "seguimientos")
+    return resultado
+
+def _reparar_con_seguimiento(client, response_text: str, modelo: str) -> Dict[str, Any]:
+    """Último recurso: una llamada corta al modelo barato para reformatear la respuesta"""
+    if not response_text:
+        _contar_parseo(modelo, "fallidas")
+        return {"success": False, "error": "Respuesta vacía de Gemini", "respuesta_cruda": response_text}
+    modelo_reparacion = _modelo_reparacion()
+    logger.warning(f"🩹 Reformateando respuesta de {modelo} con {modelo_reparacion}")
+    prompt = _prompt_reparacion(response_text)
+    try:
+        response = llamar_con_resiliencia(
+            "gemini",
+            lambda limite: con_timeout("gemini", lambda: client.models.generate_content(
+                model=modelo_reparacion, contents=prompt, config=_config_estructurada(ESQUEMA_VEREDICTO)
+            ), limite)
+        )
+    except Exception as e:
+        _modelo_fallido(modelo_reparacion, e)
+        logger.error(f"❌ Error reformateando respuesta de Gemini: {e}")
+        _contar_parseo(modelo, "fallidas")
+        return {"success": False, "error": f"Error parseando respuesta: {str(e)}", "respuesta_cruda": response_text}
+    return _resultado_seguimiento(response, modelo, response_text)
+
+async def _reparar_con_seguimiento_async(client, response_text: str, modelo: str) -> Dict[str, Any]:
+    if not response_text:
+        _contar_parseo(modelo, "fallidas")
+        return {"success": False, "error": "Respuesta vacía de Gemini", "respuesta_cruda": response_text}
+    modelo_reparacion = _modelo_reparacion()
+    logger.warning(f"🩹 Reformateando respuesta de {modelo} con {modelo_reparacion}")
+    prompt = _prompt_reparacion(response_text)
+    try:
+        response = await llamar_con_resiliencia_async(
+            "gemini", lambda limite: client.aio.models.generate_content(
+                model=modelo_reparacion, contents=prompt, config=_config_estructurada(ESQUEMA_VEREDICTO)
             )
+        )
+    except Exception as e:
+        _modelo_fallido(modelo_reparacion, e)
+        logger.error(f"❌ Error reformateando respuesta de Gemini: {e}")
+        _contar_parseo(modelo, "fallidas")
+        return {"success": False, "error": f"Error parseando respuesta: {str(e)}", "respuesta_cruda": response_text}
+    return _resultado_seguimiento(response, modelo, response_text)
+
+def estadisticas_parseo() -> Dict[str, Dict[str, Any]]:
+    """Respuestas por modelo y cómo se interpretaron: directas, reparadas en local, con seguimiento o fallidas"""
+    por_modelo: Dict[str, Dict[str, Any]] = {}
+    for nombre, valor in obtener_contadores("parseo_gemini").items():
+        modelo, evento = nombre.rsplit(".", 1)
+        por_modelo.setdefault(modelo, {})[evento] = valor
+    for contadores in por_modelo.values():
+        respuestas = contadores.get("respuestas", 0)
+        contadores["tasa_no_directas"] = round(1 - contadores.get("directas", 0) / respuestas, 4) if respuestas else 0
+        contadores["tasa_fallidas"] = round(contadores.get("fallidas", 0) / respuestas, 4) if respuestas else 0
+    return por_modelo
+
+# ==================== LLAMADAS ====================
+
+# Las herramientas van dentro de config. La API no admite response_schema
+# junto a herramientas: con búsqueda, el JSON se pide solo en el prompt.
+CONFIG_BUSQUEDA = {**GENERATION_CONFIG, "tools": [{"google_search": {}}]}
+
+def _usar_busqueda(usar_busqueda: bool, modelo: str) -> bool:
+    return usar_busqueda and get_registro_capacidades().disponible(capacidad_busqueda(modelo))
+
+def _busqueda_fallida(error: Exception, modelo: str) -> None:
+    """Si la búsqueda no está disponible se recuerda; si el fallo es transitorio se propaga"""
+    if not es_error_de_capacidad(error):
+        raise error
+    get_registro_capacidades().registrar(capacidad_busqueda(modelo), False, str(error))
+    logger.warning(f"Búsqueda web no disponible, usando modelo estándar: {error}")
+
+def _generar_contenido(
+    client,
+    prompt: str,
+    usar_busqueda: bool,
+    esquema: Dict[str, Any] = ESQUEMA_VEREDICTO,
+    modelo: str = MODELO_GEMINI,
+    tipo: str = "individual"
+):
+    # Búsqueda web solo si no se sabe ya que falla en este entorno
+    if _usar_busqueda(usar_busqueda, modelo):
+        try:
+            config = _con_prefijo(CONFIG_BUSQUEDA, tipo, _cache_contexto(client, modelo, tipo, True))
+            response = client.models.generate_content(model=modelo, contents=prompt, config=config)
+            get_registro_capacidades().registrar(capacidad_busqueda(modelo), True)
+            return response
+        except Exception as e:
+            _busqueda_fallida(e, modelo)
+    
+    return client.models.generate_content(
+        model=modelo,
+        contents=prompt,
+        config=_con_prefijo(_config_estructurada(esquema), tipo, _cache_contexto(client, modelo, tipo, False))
+    )
+
+async def _generar_contenido_async(
+    client,
+    prompt: str,
+    usar_busqueda: bool,
+    esquema: Dict[str, Any] = ESQUEMA_VEREDICTO,
+    modelo: str = MODELO_GEMINI,
+    tipo: str = "individual"
+):
+    if _usar_busqueda(usar_busqueda, modelo):
+        try:
+            config = _con_prefijo(CONFIG_BUSQUEDA, tipo, await _cache_contexto_async(client, modelo, tipo, True))
+            response = await client.aio.models.generate_content(model=modelo, contents=prompt, config=config)
+            get_registro_capacidades().registrar(capacidad_busqueda(modelo), True)
+            return response
+        except Exception as e:
+            _busqueda_fallida(e, modelo)
+    
+    cache = await _cache_contexto_async(client, modelo, tipo, False)
+    return await client.aio.models.generate_content(
+        model=modelo,
+        contents=prompt,
+        config=_con_prefijo(_config_estructurada(esquema), tipo, cache)
+    )
+
+def _error_de_nivel(nivel: str, modelo: str, error: Exception) -> Dict[str, Any]:
+    logger.error(f"❌ Error con Gemini API ({nivel}): {error}")
+    incrementar(f"niveles_gemini.{nivel}.errores")
+    if modelo != MODELO_GEMINI and es_error_de_capacidad(error):
+        get_registro_capacidades().registrar(capacidad_modelo(modelo), False, str(error))
+    return {
+        "success": False,
+        "error": f"Error con Gemini: {str(error)}"
+    }
+
+def _analizar_en_nivel(client, texto: str, nivel: str, usar_busqueda: bool) -> Dict[str, Any]:
+    configuracion = configuracion_nivel(nivel)
+    modelo = configuracion["modelo"]
+    busqueda = usar_busqueda and configuracion["busqueda"]
+    prompt = _construir_prompt(texto)
+    
+    try:
+        inicio = time.perf_counter()
+        # El cliente no admite timeout: se aplica el adaptativo esperando desde otro hilo
+        response = llamar_con_resiliencia(
+            "gemini",
+            lambda limite: con_timeout(
+                "gemini", lambda: _generar_contenido(client, prompt, busqueda, modelo=modelo), limite
+            )
+        )
+        registrar_llamada(nivel, response, round((time.perf_counter() - inicio) * 1000))
         
-        response_text = response.text.strip()
-        logger.info(f"📨 Respuesta Gemini recibida: {response_text[:100]}...")
-        
-        # Limpiar respuesta
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
+        response_text = (response.text or "").strip()
+        logger.info(f"📨 Respuesta Gemini ({nivel}) recibida: {response_text[:100]}...")
         
-        resultado = json.loads(response_text)
+        resultado = _interpretar_respuesta(response_text, modelo)
+        if resultado is None:
+            resultado = _reparar_con_seguimiento(client, response_text, modelo)
+    except Exception as e:
+        resultado = _error_de_nivel(nivel, modelo, e)
+    return {**resultado, "nivel": nivel, "modelo": modelo}
+
+async def _analizar_en_nivel_async(client, texto: str, nivel: str, usar_busqueda: bool) -> Dict[str, Any]:
+    configuracion = configuracion_nivel(nivel)
+    modelo = configuracion["modelo"]
+    busqueda = usar_busqueda and configuracion["busqueda"]
+    prompt = _construir_prompt(texto)
+    
+    try:
+        inicio = time.perf_counter()
+        async with limite_upstream("gemini"):
+            response = await llamar_con_resiliencia_async(
+                "gemini", lambda limite: _generar_contenido_async(client, prompt, busqueda, modelo=modelo)
+            )
+        registrar_llamada(nivel, response, round((time.perf_counter() - inicio) * 1000))
         
-        return {
-            "success": True,
-            "fuente": "gemini",
-            "resultado": resultado["veredicto"],
-            "confianza": resultado["confianza"],
-            "detalle": {
-                "razonamiento": resultado["razonamiento"],
-                "sesgos_detectados": resultado["sesgos_detectados"],
-                "recomendacion": resultado["recomendacion"],
-                "elementos_clave": resultado["elementos_clave"],
-                "fecha_analisis": resultado.get("fecha_analisis", datetime.now().strftime('%Y-%m-%d'))
-            }
-        }
+        response_text = (response.text or "").strip()
+        logger.info(f"📨 Respuesta Gemini (async, {nivel}) recibida: {response_text[:100]}...")
         
-    except json.JSONDecodeError as e:
-        logger.error(f"❌ Error parseando JSON de Gemini: {e}")
+        resultado = _interpretar_respuesta(response_text, modelo)
+        if resultado is None:
+            async with limite_upstream("gemini"):
+                resultado = await _reparar_con_seguimiento_async(client, response_text, modelo)
+    except Exception as e:
+        resultado = _error_de_nivel(nivel, modelo, e)
+    return {**resultado, "nivel": nivel, "modelo": modelo}
+
+def _motivo_escalado(resultado: Dict[str, Any]) -> str:
+    if not resultado.get("success"):
+        return f"fallo del nivel ligero ({resultado.get('error')})"
+    return f"confianza {resultado.get('confianza')} < {UMBRAL_ESCALADO}"
+
+def _elegir_tras_escalado(ligero: Dict[str, Any], completo: Dict[str, Any]) -> Dict[str, Any]:
+    # Si el nivel completo falla, un veredicto ligero de baja confianza es mejor que nada
+    if not completo.get("success") and ligero.get("success"):
+        return {**ligero, "escalado_fallido": True}
+    return {**completo, "escalado_desde": "ligero"}
+
+@con_latencia
+def analizar_con_gemini(texto: str, usar_busqueda: bool = True, nivel: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Analiza una afirmación usando Google Gemini con búsqueda web opcional.
+    Sin `nivel`, empieza por el nivel que elige el enrutador y escala al
+    completo si la confianza del ligero no llega al umbral.
+    """
+    try:
+        client = get_client()
+    except Exception as e:
+        logger.error(f"❌ Error con Gemini API: {e}")
         return {
             "success": False,
-            "error": f"Error parseando respuesta: {str(e)}",
-            "respuesta_cruda": response_text if 'response_text' in locals() else None
+            "error": f"Error con Gemini: {str(e)}"
         }
+    
+    nivel = nivel or elegir_nivel(texto)
+    resultado = _analizar_en_nivel(client, texto, nivel, usar_busqueda)
+    if debe_escalar(nivel, resultado):
+        registrar_escalado(_motivo_escalado(resultado))
+        resultado = _elegir_tras_escalado(resultado, _analizar_en_nivel(client, texto, "completo", usar_busqueda))
+    return resultado
+
+@con_latencia
+async def analizar_con_gemini_async(texto: str, usar_busqueda: bool = True, nivel: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Variante asíncrona de analizar_con_gemini usando el cliente aio de google-genai
+    """
+    try:
+        client = get_client()
     except Exception as e:
         logger.error(f"❌ Error con Gemini API: {e}")
         return {
             "success": False,
             "error": f"Error con Gemini: {str(e)}"
-        }
\ No newline at end of file
+        }
+    
+    nivel = nivel or elegir_nivel(texto)
+    resultado = await _analizar_en_nivel_async(client, texto, nivel, usar_busqueda)
+    if debe_escalar(nivel, resultado):
+        registrar_escalado(_motivo_escalado(resultado))
+        resultado = _elegir_tras_escalado(
+            resultado, await _analizar_en_nivel_async(client, texto, "completo", usar_busqueda)
+        )
+    return resultado
+
+# ==================== ANÁLISIS POR LOTES ====================
+
+def _construir_prompt_lote(textos: List[str]) -> str:
+    # Las afirmaciones van como JSON para que comillas y saltos de línea no rompan el prompt
+    afirmaciones = json.dumps(
+        [{"indice": indice, "afirmacion": texto} for indice, texto in enumerate(textos)],
+        ensure_ascii=False
+    )
+    return f"Afirmaciones a verificar: {afirmaciones}"
+
+def _interpretar_respuesta_lote(response_text: str, total: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Resultado por posición de cada afirmación del lote, emparejado por "indice".
+    Las que faltan o no se pueden interpretar quedan a None.
+    """
+    resultados: List[Optional[Dict[str, Any]]] = [None] * total
+    _contar_parseo(MODELO_GEMINI, "respuestas", total)
+    try:
+        elementos, reparado = cargar_json_tolerante(response_text)
+    except ValueError as e:
+        logger.error(f"❌ Error parseando JSON del lote de Gemini: {e}")
+        return resultados
+    if not isinstance(elementos, list):
+        return resultados
+
+    for posicion, elemento in enumerate(elementos):
+        if not isinstance(elemento, dict):
+            continue
+        indice = elemento.get("indice")
+        # Sin índice solo se puede confiar en el orden si el array está completo
+        if indice is None and len(elementos) == total:
+            indice = posicion
+        if not isinstance(indice, int) or not 0 <= indice < total or resultados[indice] is not None:
+            continue
+        resultados[indice] = _resultado_desde_json(elemento)
+        if resultados[indice] is not None:
+            completo = all(campo in elemento for campo in _OBLIGATORIAS)
+            _contar_parseo(MODELO_GEMINI, "directas" if not reparado and completo else "reparadas")
+    # Las que faltan se repiten por separado (y cuentan allí como respuesta propia)
+    _contar_parseo(MODELO_GEMINI, "reintentadas", sum(resultado is None for resultado in resultados))
+    return resultados
+
+def analizar_lote_con_gemini(textos: List[str], usar_busqueda: bool = True) -> List[Dict[str, Any]]:
+    """
+    Analiza varias afirmaciones con una sola llamada a Gemini. Las que no vengan
+    bien en la respuesta se repiten con una llamada individual cada una.
+    """
+    if len(textos) == 1:
+        return [analizar_con_gemini(textos[0], usar_busqueda)]
+
+    inicio = time.perf_counter()
+    try:
+        client = get_client()
+        prompt = _construir_prompt_lote(textos)
+        response = llamar_con_resiliencia(
+            "gemini",
+            lambda limite: con_timeout("gemini", lambda: _generar_contenido(client, prompt, usar_busqueda, ESQUEMA_LOTE, tipo="lote"), limite)
+        )
+        # Los lotes van siempre al nivel completo: el reparto es por afirmación
+        registrar_llamada("completo", response, round((time.perf_counter() - inicio) * 1000))
+        response_text = (response.text or "").strip()
+        logger.info(f"📨 Respuesta Gemini (lote de {len(textos)}) recibida: {response_text[:100]}...")
+        resultados = _interpretar_respuesta_lote(response_text, len(textos))
+    except Exception as e:
+        # Fallo de la llamada (no del formato): repetirla por afirmación solo multiplicaría la carga
+        logger.error(f"❌ Error con Gemini API (lote de {len(textos)}): {e}")
+        return [{"success": False, "error": f"Error con Gemini: {str(e)}"} for _ in textos]
+
+    latencia_ms = round((time.perf_counter() - inicio) * 1000)
+    for resultado in resultados:
+        if resultado is not None:
+            resultado.update(latencia_ms=latencia_ms, tamano_lote=len(textos))
+
+    fallidos = [indice for indice, resultado in enumerate(resultados) if resultado is None]
+    if fallidos:
+        logger.warning(f"⚠️ {len(fallidos)}/{len(textos)} afirmaciones del lote sin respuesta válida; se analizan por separado")
+        incrementar("micro_lotes_gemini.individuales", len(fallidos))
+        # Pool propio: el del verificador híbrido puede estar ocupado esperando a este lote
+        with ThreadPoolExecutor(max_workers=len(fallidos)) as ejecutor:
+            individuales = ejecutor.map(lambda indice: analizar_con_gemini(textos[indice], usar_busqueda), fallidos)
+            for indice, resultado in zip(fallidos, individuales):
+                resultados[indice] = resultado
+    return resultados
+
+# Micro-loteador global y llamadas que lo usan (lotes y cola de trabajos)
+_micro_loteador = None
+_agrupar_llamadas = contextvars.ContextVar("gemini_agrupar_llamadas", default=False)
+
+def get_micro_loteador():
+    global _micro_loteador
+    if _micro_loteador is None:
+        from services.micro_lotes import MicroLoteador
+        _micro_loteador = MicroLoteador(
+            "gemini",
+            analizar_lote_con_gemini,
+            ventana_ms=MICRO_LOTE_VENTANA_MS,
+            max_elementos=MICRO_LOTE_MAX_AFIRMACIONES
+        )
+    return _micro_loteador
+
+@contextmanager
+def agrupando_llamadas():
+    """
+    Dentro de este bloque (y de las tareas/hilos que hereden su contexto) las
+    llamadas a Gemini del verificador híbrido pasan por el micro-loteador.
+    Pensado para lotes y trabajos en cola: en peticiones interactivas la
+    respuesta más larga del lote añadiría latencia.
+    """
+    token = _agrupar_llamadas.set(True)
+    try:
+        yield
+    finally:
+        _agrupar_llamadas.reset(token)
+
+def llamadas_agrupadas() -> bool:
+    return _agrupar_llamadas.get()
+
+def analizar_con_gemini_agrupado(texto: str) -> Dict[str, Any]:
+    return get_micro_loteador().enviar(texto).result()
+
+async def analizar_con_gemini_agrupado_async(texto: str) -> Dict[str, Any]:
+    import asyncio
+    return await asyncio.wrap_future(get_micro_loteador().enviar(texto))
@@ -0,0 +1,121 @@
+# services/historial.py
+import base64
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Límite del conteo acotado: por encima solo se informa de un mínimo
+MAX_CONTEO_EXACTO = 10000
+
+def codificar_cursor(fecha: datetime, consulta_id: int) -> str:
+    """Cursor opaco con la posición (fecha_consulta, id) de la última fila servida"""
+    crudo = f"{fecha.isoformat()}|{consulta_id}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Lanza ValueError si el cursor no es válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha, consulta_id = base64.urlsafe_b64decode(cursor + relleno).decode().split("|")
+        return datetime.fromisoformat(fecha), int(consulta_id)
+    except Exception:
+        raise ValueError("Cursor de paginación no válido")
+
+def consultar_historial(
+    db: Session,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    offset: int = 0,
+    total: str = "estimado"
+) -> Dict[str, Any]:
+    """
+    Página del historial ordenada por (fecha_consulta, id) descendente.
+    Con cursor se pagina por clave (keyset) sobre el índice compuesto;
+    offset se mantiene para clientes antiguos pero es lento en páginas profundas.
+    """
+    from database import ConsultaNoticia
+
+    query = db.query(ConsultaNoticia)
+    if usuario_id:
+        query = query.filter(ConsultaNoticia.usuario_id == usuario_id)
+
+    if cursor:
+        fecha, consulta_id = decodificar_cursor(cursor)
+        query = query.filter(
+            tuple_(ConsultaNoticia.fecha_consulta, ConsultaNoticia.id) < tuple_(fecha, consulta_id)
+        )
+
+    query = query.order_by(ConsultaNoticia.fecha_consulta.desc(), ConsultaNoticia.id.desc())
+    if offset and not cursor:
+        query = query.offset(offset)
+
+    # Una fila de más para saber si existe página siguiente
+    filas = query.limit(limit + 1).all()
+    consultas = filas[:limit]
+    siguiente = None
+    if len(filas) > limit:
+        ultima = consultas[-1]
+        siguiente = codificar_cursor(ultima.fecha_consulta, ultima.id)
+
+    valor_total, tipo_total = _contar(db, usuario_id, total)
+
+    return {
+        "total": valor_total,
+        "total_tipo": tipo_total,
+        "limit": limit,
+        "offset": offset,
+        "usuario_id": usuario_id,
+        "siguiente_cursor": siguiente,
+        "consultas": [
+            {
+                "id": c.id,
+                "texto": c.texto[:100] + "..." if len(c.texto) > 100 else c.texto,
+                "resultado": c.resultado,
+                "url": c.url_consulta,
+                "fecha": c.fecha_consulta.isoformat(),
+                "usuario_id": c.usuario_id
+            }
+            for c in consultas
+        ]
+    }
+
+def _contar(db: Session, usuario_id: Optional[str], modo: str) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Total de filas según el modo pedido ('exacto', 'estimado' o 'ninguno').
+    Devuelve (total, tipo) con tipo 'exacto', 'estimado' o 'minimo'.
+    """
+    from database import ConsultaNoticia
+
+    if modo == "ninguno":
+        return None, None
+
+    if modo == "exacto":
+        query = db.query(func.count(ConsultaNoticia.id))
+        if usuario_id:
+            query = query.filter(ConsultaNoticia.usuario_id == usuario_id)
+        return query.scalar() or 0, "exacto"
+
+    if not usuario_id and db.get_bind().dialect.name == "postgresql":
+        # Estimación del planificador: no recorre la tabla
+        estimado = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'consultas_noticias'")
+        ).scalar()
+        if estimado is not None and estimado >= 0:
+            return int(estimado), "estimado"
+
+    # Conteo acotado: exacto para usuarios con pocas consultas; por encima de
+    # MAX_CONTEO_EXACTO solo se garantiza un mínimo
+    subconsulta = db.query(ConsultaNoticia.id)
+    if usuario_id:
+        subconsulta = subconsulta.filter(ConsultaNoticia.usuario_id == usuario_id)
+    subconsulta = subconsulta.limit(MAX_CONTEO_EXACTO + 1).subquery()
+    conteo = db.query(func.count()).select_from(subconsulta).scalar() or 0
+    if conteo > MAX_CONTEO_EXACTO:
+        return MAX_CONTEO_EXACTO, "minimo"
+    return conteo, "exacto"
@@ -1,115 +1,628 @@
 # services/hybrid_verifier.py
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Awaitable, Callable
 from sqlalchemy.orm import Session
+import os
+import json
+import time
 import logging
-from datetime import datetime
+import asyncio
+import ast
+from datetime import datetime, timedelta
 import re
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Ventana de las estadísticas por fuente/modo/latencia (servida desde los agregados diarios)
+ESTADISTICAS_VENTANA_DIAS = int(os.getenv("STATS_RESULTS_WINDOW_DAYS", "30"))
+# Modo del modo auto cuando el texto no da señales claras. "factcheck_first"
+# solo llama a Gemini si FactCheck no encuentra nada; "auto" lanza los dos a
+# la vez (menos latencia, una llamada a Gemini por cada afirmación ambigua)
+MODO_AUTO_POR_DEFECTO = os.getenv("AUTO_UNDECIDED_MODE", "factcheck_first")
+
 def verificar_hibrido(
     texto: str, 
     db: Session, 
     url: str = None, 
     usuario_id: str = None, 
     modo: str = "auto",
-    use_ia: bool = True
+    use_ia: bool = True,
+    texto_modo: str = None
 ) -> Dict[str, Any]:
     """
-    Sistema híbrido de verificación que combina FactCheck tradicional + Gemini AI
+    Sistema híbrido de verificación que combina FactCheck tradicional + Gemini AI.
+    `texto_modo` es el texto sin comprimir con el que se elige el modo auto
+    cuando `texto` lleva el artículo comprimido.
     """
     
-    # Guardar en base de datos
     from database import ConsultaNoticia
+    from services.cache_veredictos import get_cache, es_cacheable, normalizar_afirmacion
+    from services.indice_similitud import get_indice
+    from services.coalescencia import get_coalescedor
+    
+    inicio = time.perf_counter()
+    modo = _resolver_modo(modo, texto_modo or texto, use_ia)
+    cache = get_cache()
+    compartido = False
+    resultado_cacheado = cache.obtener(texto, modo)
+    if resultado_cacheado is None:
+        try:
+            resultado_cacheado = _buscar_veredicto_similar(db, texto, modo)
+        except Exception as e:
+            logger.error(f"Error buscando veredicto similar: {e}")
+            db.rollback()
+        if resultado_cacheado is not None:
+            cache.guardar(texto, modo, resultado_cacheado)
     
+    # Cerrar la transacción de lectura: la conexión vuelve al pool mientras se
+    # espera a los upstreams y solo se vuelve a pedir para el INSERT final
+    db.commit()
+    
+    # Una sola fila por verificación: se inserta al final con el resultado ya calculado
     consulta = ConsultaNoticia(
         texto_consultado=texto,
         url_consulta=url,
         usuario_id=usuario_id,
-        fecha_consulta=datetime.utcnow(),
-        resultado="procesando"
+        fecha_consulta=datetime.utcnow()
     )
     
     try:
+        if resultado_cacheado is not None:
+            # Veredicto ya conocido: sin llamadas externas
+            logger.info(f"⚡ Veredicto en cache - Modo: {modo}, Texto: {texto[:100]}...")
+            resultado = resultado_cacheado
+        else:
+            logger.info(f"🔍 Iniciando verificación híbrida - Modo: {modo}, Texto: {texto[:100]}...")
+            
+            # Peticiones idénticas simultáneas comparten una única llamada a los upstreams
+            resultado, compartido = get_coalescedor("verificaciones").ejecutar(
+                (modo, normalizar_afirmacion(texto)),
+                lambda: _ejecutar_estrategia(modo, texto)
+            )
+            
+            if not compartido and es_cacheable(resultado):
+                cache.guardar(texto, modo, resultado)
+        
+        # Guardar resultados en BD
+        for columna, valor in _columnas_consulta(
+            resultado, modo, _ms_desde(inicio), reutilizado=resultado_cacheado is not None
+        ).items():
+            setattr(consulta, columna, valor)
+        
         db.add(consulta)
         db.commit()
         db.refresh(consulta)
         
-        logger.info(f"🔍 Iniciando verificación híbrida - Modo: {modo}, Texto: {texto[:100]}...")
-        
-        # Si IA está desactivada, usar solo factcheck
-        if not use_ia:
-            modo = "solo_factcheck"
-        
-        # ESTRATEGIA AUTO: Decidir basado en el tipo de consulta
-        if modo == "auto":
-            modo = _elegir_modo_inteligente(texto)
-            logger.info(f"🤖 Modo auto seleccionado: {modo}")
+        if resultado_cacheado is None and not compartido and es_cacheable(resultado):
+            get_indice().agregar(consulta.id, texto)
         
-        # EJECUCIÓN SEGÚN MODO
-        if modo == "factcheck_first":
-            resultado = _estrategia_factcheck_primero(texto, db)
-        elif modo == "ia_first":
-            resultado = _estrategia_ia_primero(texto)
-        elif modo == "solo_ia":
-            resultado = _estrategia_solo_ia(texto)
-        elif modo == "solo_factcheck":
-            resultado = _estrategia_solo_factcheck(texto, db)
-        else:  # auto
-            resultado = _estrategia_auto(texto, db)
+        return _construir_respuesta(consulta.id, consulta.fecha_consulta, modo, texto, resultado)
         
-        # Guardar resultados en BD
-        consulta.resultado = resultado.get("resultado_final", "procesado")
-        consulta.respuesta_api = _preparar_respuesta_para_bd(resultado)
+    except Exception as e:
+        logger.error(f"❌ Error en verificación híbrida: {str(e)}")
         
+        db.rollback()
+        consulta.resultado = "error"
+        consulta.modo = modo
+        consulta.respuesta_api = f"Error en verificación híbrida: {str(e)}"
         db.add(consulta)
         db.commit()
-        db.refresh(consulta)
         
-        # ✅ RESPUESTA MEJORADA CON RAZONAMIENTO
-        respuesta = {
-            "success": True,
-            "consulta_id": consulta.id,
-            "fecha_procesamiento": consulta.fecha_consulta.isoformat(),
-            "modo_utilizado": modo,
-            "texto_consultado": texto[:500] + "..." if len(texto) > 500 else texto,
-            "resultado": resultado.get("resultado_final", "error"),
-            "confianza": resultado.get("confianza", 0),
-            "fuente_primaria": resultado.get("fuente_primaria", "desconocida"),
-            "tiene_verificacion_oficial": resultado.get("tiene_verificacion_oficial", False),
-            "recomendacion": resultado.get("recomendacion", ""),
-            # ✅ NUEVO: Razonamiento siempre disponible
-            "razonamiento": _obtener_razonamiento(resultado)
-        }
+        return _respuesta_error(e, consulta.id, modo)
+
+def _resolver_modo(modo: str, texto: str, use_ia: bool) -> str:
+    """Traduce el modo solicitado al modo concreto que se ejecutará"""
+    # Si IA está desactivada, usar solo factcheck
+    if not use_ia:
+        modo = "solo_factcheck"
+    
+    # ESTRATEGIA AUTO: Decidir basado en el tipo de consulta. Si no hay
+    # señales claras se usa MODO_AUTO_POR_DEFECTO ("auto" = fan-out de ambos backends)
+    if modo == "auto":
+        modo = _elegir_modo_inteligente(texto)
+        logger.info(f"🤖 Modo auto seleccionado: {modo}")
+    
+    # Con el circuito de Gemini abierto no se espera a un upstream caído
+    if modo != "solo_factcheck":
+        from services.resiliencia import get_circuito
+        from services.metricas import incrementar
+        if not get_circuito("gemini").disponible():
+            logger.warning(f"⚠️ Circuito de Gemini abierto: {modo} degradado a solo_factcheck")
+            incrementar("resiliencia.degradadas")
+            modo = "solo_factcheck"
+    
+    return modo
+
+def _ejecutar_estrategia(modo: str, texto: str) -> Dict[str, Any]:
+    """Ejecuta la estrategia correspondiente al modo ya resuelto (sin tocar la BD)"""
+    # EJECUCIÓN SEGÚN MODO
+    if modo == "factcheck_first":
+        return _estrategia_factcheck_primero(texto)
+    elif modo == "ia_first":
+        return _estrategia_ia_primero(texto)
+    elif modo == "solo_ia":
+        return _estrategia_solo_ia(texto)
+    elif modo == "solo_factcheck":
+        return _estrategia_solo_factcheck(texto)
+    else:  # auto
+        return _estrategia_auto(texto)
+
+def _construir_respuesta(
+    consulta_id: int,
+    fecha_consulta: datetime,
+    modo: str,
+    texto: str,
+    resultado: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Construye la respuesta pública de la verificación híbrida"""
+    # ✅ RESPUESTA MEJORADA CON RAZONAMIENTO
+    respuesta = {
+        "success": True,
+        "consulta_id": consulta_id,
+        "fecha_procesamiento": fecha_consulta.isoformat(),
+        "modo_utilizado": modo,
+        "texto_consultado": texto[:500] + "..." if len(texto) > 500 else texto,
+        "resultado": resultado.get("resultado_final", "error"),
+        "confianza": resultado.get("confianza", 0),
+        "fuente_primaria": resultado.get("fuente_primaria", "desconocida"),
+        "tiene_verificacion_oficial": resultado.get("tiene_verificacion_oficial", False),
+        "recomendacion": resultado.get("recomendacion", ""),
+        # ✅ NUEVO: Razonamiento siempre disponible
+        "razonamiento": _obtener_razonamiento(resultado)
+    }
+    
+    # ✅ Mantener detalles completos para compatibilidad
+    if resultado.get("detalle_ia"):
+        respuesta["analisis_ia"] = resultado["detalle_ia"]
+    
+    if resultado.get("detalle_factcheck"):
+        respuesta["verificacion_factcheck"] = resultado["detalle_factcheck"]
+    
+    if resultado.get("backends_agotados"):
+        respuesta["backends_agotados"] = resultado["backends_agotados"]
+    
+    if resultado.get("backends_fallidos"):
+        respuesta["backends_fallidos"] = resultado["backends_fallidos"]
+    
+    logger.info(f"✅ Verificación completada - Resultado: {resultado.get('resultado_final')}")
+    return respuesta
+
+def _respuesta_error(e: Exception, consulta_id: Optional[int], modo: str) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "error": str(e),
+        "consulta_id": consulta_id,
+        "modo_utilizado": modo,
+        "resultado": "error",
+        "confianza": 0,
+        "razonamiento": f"Error en el análisis: {str(e)}"  # ✅ Razonamiento incluso en error
+    }
+
+# ==================== PIPELINE ASÍNCRONO ====================
+
+# Callback de etapas intermedias: notificar("factcheck" | "gemini", resultado_backend)
+Notificador = Callable[[str, Dict[str, Any]], None]
+
+async def verificar_hibrido_async(
+    texto: str,
+    url: str = None,
+    usuario_id: str = None,
+    modo: str = "auto",
+    use_ia: bool = True,
+    notificar: Optional[Notificador] = None,
+    texto_modo: str = None
+) -> Dict[str, Any]:
+    """
+    Variante asíncrona de verificar_hibrido: las llamadas externas usan clientes
+    async y los accesos a BD se ejecutan en hilos con su propia sesión.
+    Si se pasa `notificar`, se invoca con (evento, datos) al terminar cada backend.
+    """
+    from services.indice_similitud import get_indice
+    
+    inicio = time.perf_counter()
+    modo = _resolver_modo(modo, texto_modo or texto, use_ia)
+    
+    try:
+        resultado = await _buscar_resultado_previo_async(texto, modo)
+        reutilizado = resultado is not None
+        nuevo = False
         
-        # ✅ Mantener detalles completos para compatibilidad
-        if resultado.get("detalle_ia"):
-            respuesta["analisis_ia"] = resultado["detalle_ia"]
+        if resultado is not None:
+            logger.info(f"⚡ Veredicto en cache (async) - Modo: {modo}, Texto: {texto[:100]}...")
+        else:
+            logger.info(f"🔍 Iniciando verificación híbrida (async) - Modo: {modo}, Texto: {texto[:100]}...")
+            resultado, nuevo = await _consultar_upstreams_async(texto, modo, notificar)
         
-        if resultado.get("detalle_factcheck"):
-            respuesta["verificacion_factcheck"] = resultado["detalle_factcheck"]
+        # Una sola fila por verificación, insertada con el resultado final
+        consulta_id, fecha_consulta = await asyncio.to_thread(
+            _crear_consulta, texto, url, usuario_id,
+            _columnas_consulta(resultado, modo, _ms_desde(inicio), reutilizado)
+        )
         
-        logger.info(f"✅ Verificación completada - Resultado: {resultado.get('resultado_final')}")
-        return respuesta
+        if nuevo:
+            get_indice().agregar(consulta_id, texto)
         
+        return _construir_respuesta(consulta_id, fecha_consulta, modo, texto, resultado)
+    
     except Exception as e:
-        logger.error(f"❌ Error en verificación híbrida: {str(e)}")
+        logger.error(f"❌ Error en verificación híbrida (async): {str(e)}")
         
-        consulta.resultado = "error"
-        consulta.respuesta_api = f"Error en verificación híbrida: {str(e)}"
+        consulta_id = None
+        try:
+            consulta_id, _ = await asyncio.to_thread(
+                _crear_consulta, texto, url, usuario_id, {
+                    "resultado": "error",
+                    "modo": modo,
+                    "respuesta_api": f"Error en verificación híbrida: {str(e)}"
+                }
+            )
+        except Exception as error_bd:
+            logger.error(f"❌ Error guardando consulta fallida: {error_bd}")
+        
+        return _respuesta_error(e, consulta_id, modo)
+
+async def _buscar_resultado_previo_async(texto: str, modo: str) -> Optional[Dict[str, Any]]:
+    """Busca un veredicto ya conocido: primero en la cache exacta, luego entre casi-duplicados"""
+    from services.cache_veredictos import get_cache
+    
+    cache = get_cache()
+    resultado = cache.obtener(texto, modo)
+    if resultado is None:
+        resultado = await asyncio.to_thread(_buscar_veredicto_similar_con_sesion, texto, modo)
+        if resultado is not None:
+            cache.guardar(texto, modo, resultado)
+    return resultado
+
+async def _consultar_upstreams_async(
+    texto: str,
+    modo: str,
+    notificar: Optional[Notificador] = None
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Ejecuta la estrategia (coalesciendo peticiones idénticas en vuelo).
+    Devuelve (resultado, nuevo): nuevo=True si esta llamada obtuvo un
+    veredicto cacheable que debe añadirse al índice de casi-duplicados.
+    Las peticiones que se unen a una llamada en vuelo no reciben etapas intermedias.
+    """
+    from services.cache_veredictos import get_cache, es_cacheable, normalizar_afirmacion
+    from services.coalescencia import get_coalescedor
+    
+    resultado, compartido = await get_coalescedor("verificaciones").ejecutar_async(
+        (modo, normalizar_afirmacion(texto)),
+        lambda: _ejecutar_estrategia_async(modo, texto, notificar)
+    )
+    
+    nuevo = not compartido and es_cacheable(resultado)
+    if nuevo:
+        get_cache().guardar(texto, modo, resultado)
+    return resultado, nuevo
+
+async def _ejecutar_estrategia_async(
+    modo: str,
+    texto: str,
+    notificar: Optional[Notificador] = None
+) -> Dict[str, Any]:
+    """Variante asíncrona de _ejecutar_estrategia"""
+    if modo == "factcheck_first":
+        return await _estrategia_factcheck_primero_async(texto, notificar)
+    elif modo in ("ia_first", "solo_ia"):
+        logger.info("🔄 Ejecutando estrategia: IA primero (async)")
+        resultado_ia = await _avisar_al_terminar("gemini", _analizar_con_gemini_async(texto), notificar)
+        return _anotar_latencias(_resolver_ia_primero(resultado_ia), gemini=resultado_ia)
+    elif modo == "solo_factcheck":
+        from services.factcheck_api import consultar_factcheck_async
+        logger.info("🔄 Ejecutando estrategia: Solo FactCheck (async)")
+        resultado_fc = await _avisar_al_terminar("factcheck", consultar_factcheck_async(texto), notificar)
+        return _anotar_latencias(_resolver_solo_factcheck(resultado_fc), factcheck=resultado_fc)
+    else:  # auto
+        return await _estrategia_auto_async(texto, notificar)
+
+async def _avisar_al_terminar(
+    evento: str,
+    llamada: Awaitable[Dict[str, Any]],
+    notificar: Optional[Notificador]
+) -> Dict[str, Any]:
+    """Espera la llamada a un backend y publica su resultado como etapa intermedia"""
+    resultado = await llamada
+    if notificar is not None:
+        notificar(evento, resultado)
+    return resultado
+
+# ==================== STREAMING (SSE) ====================
+
+def formatear_evento_sse(evento: str, datos: Dict[str, Any]) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+async def transmitir_verificacion(
+    verificacion: Callable[[Notificador], Awaitable[Dict[str, Any]]]
+) -> AsyncIterator[str]:
+    """
+    Ejecuta una verificación y emite en formato SSE cada etapa según termina.
+    El último evento ("resultado") lleva exactamente la respuesta JSON del
+    endpoint equivalente sin streaming.
+    """
+    cola: asyncio.Queue = asyncio.Queue()
+    tarea = asyncio.create_task(verificacion(lambda evento, datos: cola.put_nowait((evento, datos))))
+    tarea.add_done_callback(lambda _: cola.put_nowait(None))
+    
+    # Si el cliente se desconecta la tarea sigue: la consulta se guarda igualmente
+    while (etapa := await cola.get()) is not None:
+        yield formatear_evento_sse(*etapa)
+    yield formatear_evento_sse("resultado", tarea.result())
+
+# ==================== VERIFICACIÓN POR LOTES ====================
+
+LOTE_MAX_NOTICIAS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+LOTE_CONCURRENCIA = int(os.getenv("BATCH_CONCURRENCY", "10"))
+# Las filas del lote se insertan en bloques de este tamaño (o cada X segundos)
+LOTE_TAMANO_ESCRITURA = int(os.getenv("BATCH_WRITE_SIZE", "25"))
+LOTE_INTERVALO_ESCRITURA = float(os.getenv("BATCH_WRITE_INTERVAL_SECONDS", "1.0"))
+
+async def verificar_lote_async(
+    noticias: List[Any],
+    modo: str = "auto",
+    use_ia: bool = True,
+    concurrencia: int = LOTE_CONCURRENCIA
+) -> AsyncIterator[str]:
+    """
+    Verifica un lote de noticias y devuelve una línea NDJSON por noticia a
+    medida que terminan. Las noticias repetidas (mismo texto normalizado y
+    misma URL canónica) se verifican una sola vez y las filas de BD se
+    insertan en bloque.
+    """
+    from services.cache_veredictos import normalizar_afirmacion
+    from services.url_extractor import canonizar_url
+    from services.gemini_analyzer import agrupando_llamadas
+    
+    grupos: Dict[Tuple[str, Optional[str]], List[int]] = {}
+    for indice, noticia in enumerate(noticias):
+        clave = (
+            normalizar_afirmacion(noticia.texto or ""),
+            canonizar_url(noticia.url) if noticia.url and noticia.url.strip() else None
+        )
+        grupos.setdefault(clave, []).append(indice)
+    
+    logger.info(f"📦 Lote recibido - {len(noticias)} noticias, {len(grupos)} únicas, concurrencia {concurrencia}")
+    
+    semaforo = asyncio.Semaphore(concurrencia)
+    
+    async def _con_limite(clave, noticia):
+        async with semaforo:
+            try:
+                salida = await _procesar_noticia_lote(noticia, modo, use_ia)
+            except Exception as e:
+                logger.error(f"❌ Error en noticia del lote: {e}")
+                salida = {"error": str(e), "codigo": "error"}
+        return clave, salida
+    
+    # Las tareas heredan el contexto: sus llamadas a Gemini se agrupan en micro-lotes
+    with agrupando_llamadas():
+        tareas = [
+            asyncio.create_task(_con_limite(clave, noticias[indices[0]]))
+            for clave, indices in grupos.items()
+        ]
+    
+    pendientes = []
+    ultima_escritura = time.monotonic()
+    try:
+        for tarea in asyncio.as_completed(tareas):
+            clave, salida = await tarea
+            pendientes.extend((indice, noticias[indice], salida) for indice in grupos[clave])
+            
+            if len(pendientes) >= LOTE_TAMANO_ESCRITURA or time.monotonic() - ultima_escritura >= LOTE_INTERVALO_ESCRITURA:
+                for linea in await asyncio.to_thread(_guardar_bloque_lote, pendientes):
+                    yield linea
+                pendientes = []
+                ultima_escritura = time.monotonic()
+        
+        if pendientes:
+            for linea in await asyncio.to_thread(_guardar_bloque_lote, pendientes):
+                yield linea
+    finally:
+        # Si el cliente corta el stream no se siguen gastando llamadas
+        for tarea in tareas:
+            tarea.cancel()
+
+async def _procesar_noticia_lote(noticia: Any, modo: str, use_ia: bool) -> Dict[str, Any]:
+    """Extrae la URL (si hay) y obtiene el veredicto de una noticia del lote, sin tocar la BD"""
+    from services.url_extractor import extraer_texto_desde_url_async
+    from services.compresion_texto import combinar_con_extraido, combinar_sin_comprimir
+    
+    texto = texto_modo = noticia.texto or ""
+    if noticia.url and noticia.url.strip():
+        texto_extraido = await extraer_texto_desde_url_async(noticia.url.strip())
+        if texto_extraido.startswith("❌"):
+            return {"error": texto_extraido, "codigo": "error_url"}
+        texto_modo = combinar_sin_comprimir(texto, texto_extraido)
+        texto = combinar_con_extraido(texto, texto_extraido)
+    
+    if not texto.strip():
+        return {"error": "No se proporcionó texto para verificar", "codigo": "error_vacio"}
+    
+    inicio = time.perf_counter()
+    modo_resuelto = _resolver_modo(modo, texto_modo, use_ia)
+    resultado = await _buscar_resultado_previo_async(texto, modo_resuelto)
+    reutilizado = resultado is not None
+    nuevo = False
+    if resultado is None:
+        resultado, nuevo = await _consultar_upstreams_async(texto, modo_resuelto)
+    
+    return {
+        "texto": texto,
+        "modo": modo_resuelto,
+        "resultado": resultado,
+        "nuevo": nuevo,
+        "columnas": _columnas_consulta(resultado, modo_resuelto, _ms_desde(inicio), reutilizado)
+    }
+
+def _fila_lote(noticia: Any, salida: Dict[str, Any], ahora: datetime):
+    from database import ConsultaNoticia
+    
+    if "resultado" not in salida:
+        return None
+    return ConsultaNoticia(
+        texto_consultado=salida["texto"],
+        url_consulta=noticia.url,
+        usuario_id=noticia.usuario_id,
+        fecha_consulta=ahora,
+        **salida["columnas"]
+    )
+
+def _guardar_filas(filas: List[Any]) -> bool:
+    """Inserta `filas` en un solo commit; False si no se pudo (ya deshecho)"""
+    from database import SessionLocal
+    
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        db.add_all(filas)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error guardando consultas del lote: {e}")
+        return False
+    finally:
+        db.close()
+
+def _guardar_bloque_lote(pendientes: List[Tuple[int, Any, Dict[str, Any]]]) -> List[str]:
+    """
+    Inserta en un solo commit las consultas de un bloque del lote y genera sus
+    líneas NDJSON. Si el bloque falla se reintenta fila a fila, y las que
+    tampoco se guardan salen con success false y resultado "error_guardado".
+    """
+    from services.indice_similitud import get_indice
+    
+    ahora = datetime.utcnow()
+    filas = [_fila_lote(noticia, salida, ahora) for _, noticia, salida in pendientes]
+    guardadas = [fila is not None for fila in filas]
+    if not _guardar_filas([fila for fila in filas if fila is not None]):
+        # Una fila mala no debe dejar sin guardar al resto del bloque
+        logger.warning(f"🔁 Reintentando fila a fila un bloque de {len(pendientes)} noticias")
+        for posicion, (_, noticia, salida) in enumerate(pendientes):
+            if filas[posicion] is None:
+                continue
+            filas[posicion] = _fila_lote(noticia, salida, ahora)
+            guardadas[posicion] = _guardar_filas([filas[posicion]])
+    
+    lineas = []
+    indexadas = set()
+    for (indice, _, salida), fila, guardada in zip(pendientes, filas, guardadas):
+        if fila is None:
+            respuesta = {
+                "success": False,
+                "error": salida["error"],
+                "resultado": salida["codigo"],
+                "razonamiento": salida["error"]
+            }
+        elif not guardada:
+            respuesta = {
+                "success": False,
+                "error": "No se pudo guardar la verificación",
+                "resultado": "error_guardado",
+                "razonamiento": "Estamos teniendo problemas técnicos. Por favor, intenta más tarde."
+            }
+        else:
+            consulta_id = fila.id
+            respuesta = _construir_respuesta(consulta_id, ahora, salida["modo"], salida["texto"], salida["resultado"])
+            # Las noticias duplicadas comparten salida: se indexa una sola vez
+            if salida["nuevo"] and id(salida) not in indexadas:
+                get_indice().agregar(consulta_id, salida["texto"])
+                indexadas.add(id(salida))
+        lineas.append(json.dumps({"indice": indice, **respuesta}, ensure_ascii=False, default=str) + "\n")
+    return lineas
+
+def _crear_consulta(
+    texto: str,
+    url: Optional[str],
+    usuario_id: Optional[str],
+    columnas: Dict[str, Any]
+):
+    """Inserta la consulta ya resuelta (columnas de _columnas_consulta) con una sesión propia"""
+    from database import SessionLocal, ConsultaNoticia
+    
+    db = SessionLocal()
+    try:
+        consulta = ConsultaNoticia(
+            texto_consultado=texto,
+            url_consulta=url,
+            usuario_id=usuario_id,
+            fecha_consulta=datetime.utcnow(),
+            **columnas
+        )
         db.add(consulta)
         db.commit()
-        
+        return consulta.id, consulta.fecha_consulta
+    finally:
+        db.close()
+
+async def _estrategia_factcheck_primero_async(
+    texto: str,
+    notificar: Optional[Notificador] = None
+) -> Dict[str, Any]:
+    """Variante asíncrona de la estrategia FactCheck primero"""
+    logger.info("🔄 Ejecutando estrategia: FactCheck primero (async)")
+    
+    from services.factcheck_api import consultar_factcheck_async
+    from services.ejecutor_paralelo import (
+        GEMINI_ESPECULATIVO, PLAZO_HIBRIDO, ejecutar_con_especulacion_async
+    )
+    
+    resultado_ia = None
+    if GEMINI_ESPECULATIVO:
+        ejecucion = await ejecutar_con_especulacion_async(
+            principal=lambda: _avisar_al_terminar(
+                "factcheck", consultar_factcheck_async(texto, timeout=PLAZO_HIBRIDO), notificar
+            ),
+            especulativa=lambda: _avisar_al_terminar("gemini", _analizar_con_gemini_async(texto), notificar),
+            es_definitivo=_factcheck_es_definitivo
+        )
+        resultado_fc = ejecucion["principal"]
+        resultado_ia = ejecucion["especulativa"]
+    else:
+        resultado_fc = await _avisar_al_terminar("factcheck", consultar_factcheck_async(texto), notificar)
+    
+    if not _factcheck_es_definitivo(resultado_fc) and resultado_ia is None:
+        logger.info("🔍 FactCheck no encontró resultados, usando Gemini AI...")
+        resultado_ia = await _avisar_al_terminar("gemini", _analizar_con_gemini_async(texto), notificar)
+    
+    return _anotar_latencias(_resolver_factcheck_primero(resultado_fc, resultado_ia), resultado_fc, resultado_ia)
+
+async def _estrategia_auto_async(
+    texto: str,
+    notificar: Optional[Notificador] = None
+) -> Dict[str, Any]:
+    """Variante asíncrona de la estrategia auto (fan-out con plazo compartido)"""
+    logger.info("🔄 Ejecutando estrategia: Auto (async)")
+    
+    from services.factcheck_api import consultar_factcheck_async
+    from services.ejecutor_paralelo import ejecutar_en_paralelo_async, PLAZO_HIBRIDO
+    
+    ejecucion = await ejecutar_en_paralelo_async({
+        "factcheck": lambda: _avisar_al_terminar(
+            "factcheck", consultar_factcheck_async(texto, timeout=PLAZO_HIBRIDO), notificar
+        ),
+        "gemini": lambda: _avisar_al_terminar("gemini", _analizar_con_gemini_async(texto), notificar)
+    }, plazo=PLAZO_HIBRIDO)
+    
+    return _resolver_auto(ejecucion)
+
+async def _analizar_con_gemini_async(texto: str) -> Dict[str, Any]:
+    """Función interna para analizar con Gemini sin bloquear el event loop"""
+    try:
+        from services.gemini_analyzer import (
+            analizar_con_gemini_async,
+            analizar_con_gemini_agrupado_async,
+            llamadas_agrupadas
+        )
+        if llamadas_agrupadas():
+            return await analizar_con_gemini_agrupado_async(texto)
+        return await analizar_con_gemini_async(texto)
+    except Exception as e:
+        logger.error(f"Error llamando a Gemini analyzer: {e}")
         return {
             "success": False,
-            "error": str(e),
-            "consulta_id": consulta.id if 'consulta' in locals() else None,
-            "modo_utilizado": modo,
-            "resultado": "error",
-            "confianza": 0,
-            "razonamiento": f"Error en el análisis: {str(e)}"  # ✅ Razonamiento incluso en error
+            "error": f"Error con servicio de IA: {str(e)}"
         }
 
 def _obtener_razonamiento(resultado: Dict[str, Any]) -> str:
@@ -143,27 +656,29 @@ def _obtener_razonamiento(resultado: Dict[str, Any]) -> str:
     
     return razonamientos_por_defecto.get(resultado_final, "Análisis completado.")
 
+# Patrones de fechas futuras
+PATRONES_FUTUROS = [
+    r'\b202[5-9]\b', r'\b20[3-9][0-9]\b', r'\bpróximo año\b',
+    r'\ben \d{1,2} de [a-z]+ de 202[5-9]\b', r'\bpara 202[5-9]\b'
+]
+
+# Patrones de noticias recientes
+PALABRAS_NOTICIA_RECIENTE = [
+    "noticia", "anunció", "declaró", "informó", "según fuentes",
+    "última hora", "breaking", "twitter", "facebook", "red social"
+]
+
 def _detectar_tipo_contenido(texto: str) -> str:
     """
     Detecta el tipo de contenido para ajustar la estrategia
     """
     texto_lower = texto.lower()
     
-    # Patrones de fechas futuras
-    patrones_futuros = [
-        r'\b202[5-9]\b', r'\b20[3-9][0-9]\b', r'\bpróximo año\b',
-        r'\ben \d{1,2} de [a-z]+ de 202[5-9]\b', r'\bpara 202[5-9]\b'
-    ]
-    
-    for patron in patrones_futuros:
+    for patron in PATRONES_FUTUROS:
         if re.search(patron, texto_lower):
             return "contenido_futuro"
     
-    # Patrones de noticias recientes
-    if any(keyword in texto_lower for keyword in [
-        "noticia", "anunció", "declaró", "informó", "según fuentes",
-        "última hora", "breaking", "twitter", "facebook", "red social"
-    ]):
+    if any(keyword in texto_lower for keyword in PALABRAS_NOTICIA_RECIENTE):
         return "noticia_reciente"
     
     return "general"
@@ -213,18 +728,67 @@ def _elegir_modo_inteligente(texto: str) -> str:
     elif any(keyword in texto_lower for keyword in ia_keywords):
         return "ia_first"
     
-    # Por defecto: factcheck primero (más confiable cuando hay resultados)
-    return "factcheck_first"
+    # Por defecto: FactCheck primero, o ambos a la vez si AUTO_UNDECIDED_MODE=auto
+    return MODO_AUTO_POR_DEFECTO
 
-def _estrategia_factcheck_primero(texto: str, db: Session) -> Dict[str, Any]:
+def _estrategia_factcheck_primero(texto: str) -> Dict[str, Any]:
     """Primero intenta FactCheck, luego IA si no encuentra"""
     logger.info("🔄 Ejecutando estrategia: FactCheck primero")
     
-    # 1. FactCheck tradicional
-    from services.factcheck_api import verificar_api
-    resultado_fc = verificar_api(texto, db)
+    from services.factcheck_api import consultar_factcheck
+    from services.ejecutor_paralelo import GEMINI_ESPECULATIVO
     
-    if resultado_fc.get("success") and resultado_fc.get("resultado") == "verificado":
+    resultado_ia = None
+    if GEMINI_ESPECULATIVO:
+        # 1. FactCheck con Gemini especulativo en paralelo
+        from services.ejecutor_paralelo import ejecutar_con_especulacion, PLAZO_HIBRIDO
+        
+        ejecucion = ejecutar_con_especulacion(
+            principal=lambda: consultar_factcheck(texto, timeout=PLAZO_HIBRIDO),
+            especulativa=lambda: _analizar_con_gemini(texto),
+            es_definitivo=_factcheck_es_definitivo
+        )
+        resultado_fc = ejecucion["principal"]
+        resultado_ia = ejecucion["especulativa"]
+    else:
+        # 1. FactCheck tradicional
+        resultado_fc = consultar_factcheck(texto)
+    
+    # 2. Fallback a Gemini AI
+    if not _factcheck_es_definitivo(resultado_fc) and resultado_ia is None:
+        logger.info("🔍 FactCheck no encontró resultados, usando Gemini AI...")
+        resultado_ia = _analizar_con_gemini(texto)
+    
+    return _anotar_latencias(_resolver_factcheck_primero(resultado_fc, resultado_ia), resultado_fc, resultado_ia)
+
+def _anotar_latencias(
+    resultado: Dict[str, Any],
+    factcheck: Optional[Dict[str, Any]] = None,
+    gemini: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Copia al resultado de la estrategia la latencia de cada backend consultado
+    y marca los que fallaron (sus resultados no se cachean ni se reutilizan)
+    """
+    consultados = [(nombre, backend) for nombre, backend in (("factcheck", factcheck), ("gemini", gemini)) if backend is not None]
+    resultado["latencias_ms"] = {nombre: backend.get("latencia_ms") for nombre, backend in consultados}
+    _marcar_fallidos(resultado, consultados)
+    return resultado
+
+def _marcar_fallidos(resultado: Dict[str, Any], consultados: List[Tuple[str, Dict[str, Any]]]) -> None:
+    # Un backend caído (o con el circuito abierto) acaba como "no_encontrado":
+    # el veredicto depende del fallo y no debe guardarse como conocido
+    fallidos = [nombre for nombre, backend in consultados if not backend.get("success")]
+    if fallidos:
+        resultado["backends_fallidos"] = fallidos
+
+def _factcheck_es_definitivo(resultado_fc: Dict[str, Any]) -> bool:
+    """FactCheck basta por sí solo cuando encuentra una verificación existente"""
+    return bool(resultado_fc.get("success")) and resultado_fc.get("resultado") == "verificado"
+
+def _resolver_factcheck_primero(resultado_fc: Dict[str, Any], resultado_ia: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Decide el resultado de la estrategia FactCheck primero a partir de ambos backends"""
+    if _factcheck_es_definitivo(resultado_fc):
         logger.info("✅ FactCheck encontró verificación existente")
         return {
             "fuente_primaria": "factcheck",
@@ -236,11 +800,7 @@ def _estrategia_factcheck_primero(texto: str, db: Session) -> Dict[str, Any]:
             "recomendacion": "Esta afirmación ha sido verificada por fuentes oficiales de fact-checking."
         }
     
-    # 2. Fallback a Gemini AI
-    logger.info("🔍 FactCheck no encontró resultados, usando Gemini AI...")
-    resultado_ia = _analizar_con_gemini(texto)
-    
-    if resultado_ia["success"]:
+    if resultado_ia and resultado_ia["success"]:
         logger.info(f"🤖 Gemini AI completó análisis: {resultado_ia['resultado']}")
         return {
             "fuente_primaria": "gemini_fallback",
@@ -269,7 +829,10 @@ def _estrategia_ia_primero(texto: str) -> Dict[str, Any]:
     logger.info("🔄 Ejecutando estrategia: IA primero")
     
     resultado_ia = _analizar_con_gemini(texto)
-    
+    return _anotar_latencias(_resolver_ia_primero(resultado_ia), gemini=resultado_ia)
+
+def _resolver_ia_primero(resultado_ia: Dict[str, Any]) -> Dict[str, Any]:
+    """Decide el resultado de la estrategia IA primero"""
     if resultado_ia["success"]:
         logger.info(f"🤖 Gemini AI completó análisis: {resultado_ia['resultado']}")
         return {
@@ -296,13 +859,16 @@ def _estrategia_solo_ia(texto: str) -> Dict[str, Any]:
     logger.info("🔄 Ejecutando estrategia: Solo IA")
     return _estrategia_ia_primero(texto)
 
-def _estrategia_solo_factcheck(texto: str, db: Session) -> Dict[str, Any]:
+def _estrategia_solo_factcheck(texto: str) -> Dict[str, Any]:
     """Solo usa FactCheck tradicional"""
     logger.info("🔄 Ejecutando estrategia: Solo FactCheck")
     
-    from services.factcheck_api import verificar_api
-    resultado_fc = verificar_api(texto, db)
-    
+    from services.factcheck_api import consultar_factcheck
+    resultado_fc = consultar_factcheck(texto)
+    return _anotar_latencias(_resolver_solo_factcheck(resultado_fc), factcheck=resultado_fc)
+
+def _resolver_solo_factcheck(resultado_fc: Dict[str, Any]) -> Dict[str, Any]:
+    """Decide el resultado de la estrategia solo FactCheck"""
     if resultado_fc.get("success"):
         return {
             "fuente_primaria": "factcheck",
@@ -323,16 +889,34 @@ def _estrategia_solo_factcheck(texto: str, db: Session) -> Dict[str, Any]:
         "recomendacion": "No se encontraron verificaciones existentes para esta afirmación."
     }
 
-def _estrategia_auto(texto: str, db: Session) -> Dict[str, Any]:
+def _estrategia_auto(texto: str) -> Dict[str, Any]:
     """Estrategia balanceada que usa ambos sistemas de forma inteligente"""
     logger.info("🔄 Ejecutando estrategia: Auto (balanceada)")
     
-    from services.factcheck_api import verificar_api
-    resultado_fc = verificar_api(texto, db)
-    resultado_ia = _analizar_con_gemini(texto)
+    from services.factcheck_api import consultar_factcheck
+    from services.ejecutor_paralelo import ejecutar_en_paralelo, PLAZO_HIBRIDO
+    
+    # Lanzar ambos backends a la vez bajo un plazo compartido
+    ejecucion = ejecutar_en_paralelo({
+        "factcheck": lambda: consultar_factcheck(texto, timeout=PLAZO_HIBRIDO),
+        "gemini": lambda: _analizar_con_gemini(texto)
+    }, plazo=PLAZO_HIBRIDO)
+    
+    return _resolver_auto(ejecucion)
+
+def _resolver_auto(ejecucion: Dict[str, Any]) -> Dict[str, Any]:
+    """Combina el resultado de un fan-out FactCheck + Gemini"""
+    resultado_fc = ejecucion["resultados"]["factcheck"]
+    resultado_ia = ejecucion["resultados"]["gemini"]
+    logger.info(f"⏱️ Latencias backends: {ejecucion['latencias_ms']}")
     
     # Combinar resultados inteligentemente
-    return _combinar_resultados(resultado_fc, resultado_ia)
+    resultado = _combinar_resultados(resultado_fc, resultado_ia)
+    if ejecucion["agotados"]:
+        resultado["backends_agotados"] = ejecucion["agotados"]
+    _marcar_fallidos(resultado, [("factcheck", resultado_fc), ("gemini", resultado_ia)])
+    resultado["latencias_ms"] = ejecucion["latencias_ms"]
+    return resultado
 
 def _combinar_resultados(factcheck: Dict, ia: Dict) -> Dict[str, Any]:
     """Combina resultados de FactCheck e IA inteligentemente"""
@@ -459,7 +1043,13 @@ def _traducir_veredicto_combinado(veredicto_fc: str, veredicto_ia: str) -> str:
 def _analizar_con_gemini(texto: str) -> Dict[str, Any]:
     """Función interna para analizar con Gemini"""
     try:
-        from services.gemini_analyzer import analizar_con_gemini as gemini_analyzer
+        from services.gemini_analyzer import (
+            analizar_con_gemini as gemini_analyzer,
+            analizar_con_gemini_agrupado,
+            llamadas_agrupadas
+        )
+        if llamadas_agrupadas():
+            return analizar_con_gemini_agrupado(texto)
         return gemini_analyzer(texto)
     except Exception as e:
         logger.error(f"Error llamando a Gemini analyzer: {e}")
@@ -468,60 +1058,220 @@ def _analizar_con_gemini(texto: str) -> Dict[str, Any]:
             "error": f"Error con servicio de IA: {str(e)}"
         }
 
-def _preparar_respuesta_para_bd(resultado: Dict[str, Any]) -> str:
-    """Prepara la respuesta para almacenar en la base de datos"""
-    try:
-        # Extraer información clave para BD
-        respuesta_bd = {
-            "fuente_primaria": resultado.get("fuente_primaria"),
-            "veredicto_final": resultado.get("veredicto_final"),
-            "confianza": resultado.get("confianza"),
-            "tiene_verificacion_oficial": resultado.get("tiene_verificacion_oficial", False),
-            "timestamp": datetime.utcnow().isoformat()
-        }
+def _preparar_respuesta_para_bd(resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepara el payload JSON (columna respuesta_json) con el detalle de la verificación"""
+    # Extraer información clave para BD
+    respuesta_bd = {
+        "fuente_primaria": resultado.get("fuente_primaria"),
+        "veredicto_final": resultado.get("veredicto_final"),
+        "confianza": resultado.get("confianza"),
+        "tiene_verificacion_oficial": resultado.get("tiene_verificacion_oficial", False),
+        "recomendacion": resultado.get("recomendacion", ""),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    
+    # Añadir detalles específicos si existen
+    if "detalle_factcheck" in resultado and resultado["detalle_factcheck"]:
+        respuesta_bd["detalle_factcheck"] = resultado["detalle_factcheck"]
+    
+    if "detalle_ia" in resultado and resultado["detalle_ia"]:
+        # Limitar tamaño de detalle_ia para BD
+        detalle_ia = dict(resultado["detalle_ia"])
+        razonamiento = detalle_ia.get("razonamiento")
+        if isinstance(razonamiento, str) and len(razonamiento) > 500:
+            detalle_ia["razonamiento"] = razonamiento[:500] + "..."
+        respuesta_bd["detalle_ia"] = detalle_ia
+    
+    if resultado.get("backends_agotados"):
+        respuesta_bd["backends_agotados"] = resultado["backends_agotados"]
+    
+    if resultado.get("backends_fallidos"):
+        respuesta_bd["backends_fallidos"] = resultado["backends_fallidos"]
+    
+    # Garantiza que el payload es serializable a JSON (p. ej. fechas en los detalles)
+    return json.loads(json.dumps(respuesta_bd, ensure_ascii=False, default=str))
+
+def _columnas_consulta(
+    resultado: Dict[str, Any],
+    modo: str,
+    latencia_total_ms: Optional[int] = None,
+    reutilizado: bool = False
+) -> Dict[str, Any]:
+    """
+    Valores de las columnas estructuradas de ConsultaNoticia para un resultado.
+    Las latencias por backend solo se guardan si esta petición los consultó
+    (no en aciertos de cache ni en veredictos reutilizados).
+    """
+    latencias = {} if reutilizado else (resultado.get("latencias_ms") or {})
+    confianza = resultado.get("confianza")
+    return {
+        "resultado": resultado.get("resultado_final", "procesado"),
+        "modo": modo,
+        "fuente_primaria": resultado.get("fuente_primaria"),
+        "confianza": int(confianza) if isinstance(confianza, (int, float)) else None,
+        "latencia_factcheck_ms": latencias.get("factcheck"),
+        "latencia_gemini_ms": latencias.get("gemini"),
+        "latencia_total_ms": latencia_total_ms,
+        "respuesta_json": _preparar_respuesta_para_bd(resultado)
+    }
+
+def _ms_desde(inicio: float) -> int:
+    return round((time.perf_counter() - inicio) * 1000)
+
+def _resultado_desde_bd(fila: Any) -> Optional[Dict[str, Any]]:
+    """
+    Reconstruye el resultado de una estrategia a partir de una fila guardada.
+    Las filas anteriores a la columna respuesta_json (sin migrar) guardaban
+    str(dict) en respuesta_api.
+    """
+    respuesta_bd = fila.respuesta_json
+    if respuesta_bd is None:
+        try:
+            respuesta_bd = ast.literal_eval(fila.respuesta_api or "")
+        except (ValueError, SyntaxError):
+            return None
+    
+    if not isinstance(respuesta_bd, dict) or "fuente_primaria" not in respuesta_bd:
+        return None
+    
+    resultado = {
+        "fuente_primaria": respuesta_bd.get("fuente_primaria"),
+        "veredicto_final": respuesta_bd.get("veredicto_final"),
+        "confianza": respuesta_bd.get("confianza", 0),
+        "resultado_final": fila.resultado,
+        "tiene_verificacion_oficial": respuesta_bd.get("tiene_verificacion_oficial", False),
+        "recomendacion": respuesta_bd.get("recomendacion", "")
+    }
+    if respuesta_bd.get("detalle_factcheck"):
+        resultado["detalle_factcheck"] = respuesta_bd["detalle_factcheck"]
+    if respuesta_bd.get("detalle_ia"):
+        resultado["detalle_ia"] = respuesta_bd["detalle_ia"]
+    return resultado
+
+# Backends que consulta cada modo ya resuelto (factcheck_legacy: POST /verificar)
+BACKENDS_POR_MODO = {
+    "solo_factcheck": {"factcheck"},
+    "factcheck_legacy": {"factcheck"},
+    "ia_first": {"gemini"},
+    "solo_ia": {"gemini"},
+    "factcheck_first": {"factcheck", "gemini"},
+    "auto": {"factcheck", "gemini"},
+}
+
+def _cubre_modo(modo_guardado: Optional[str], modo: str) -> bool:
+    """True si el modo de una consulta guardada es igual o más completo que el pedido"""
+    return BACKENDS_POR_MODO.get(modo, {"factcheck", "gemini"}) <= BACKENDS_POR_MODO.get(modo_guardado, set())
+
+def _buscar_veredicto_similar(db: Session, texto: str, modo: str) -> Optional[Dict[str, Any]]:
+    """
+    Busca en el índice de casi-duplicados una consulta reciente ya verificada
+    y, si su texto supera el umbral de similitud, reutiliza su veredicto
+    """
+    from database import ConsultaNoticia
+    from services.indice_similitud import (
+        get_indice, jaccard, es_reutilizable, DUP_UMBRAL, DUP_VENTANA_DIAS
+    )
+    from services.metricas import incrementar
+    
+    candidatos = get_indice().buscar(texto)
+    if not candidatos:
+        return None
+    
+    limite = datetime.utcnow() - timedelta(days=DUP_VENTANA_DIAS)
+    filas = db.query(ConsultaNoticia)\
+        .filter(ConsultaNoticia.id.in_([consulta_id for consulta_id, _ in candidatos]))\
+        .filter(ConsultaNoticia.fecha_consulta >= limite)\
+        .all()
+    filas_por_id = {fila.id: fila for fila in filas}
+    
+    for consulta_id, _ in candidatos:
+        fila = filas_por_id.get(consulta_id)
+        if fila is None or not es_reutilizable(fila.resultado):
+            continue
+        
+        similitud = jaccard(texto, fila.texto)
+        if similitud < DUP_UMBRAL:
+            continue
         
-        # Añadir detalles específicos si existen
-        if "detalle_factcheck" in resultado and resultado["detalle_factcheck"]:
-            respuesta_bd["detalle_factcheck"] = resultado["detalle_factcheck"]
+        # Veredictos obtenidos con algún backend caído: no se dan por conocidos
+        if isinstance(fila.respuesta_json, dict) and (
+            fila.respuesta_json.get("backends_fallidos") or fila.respuesta_json.get("backends_agotados")
+        ):
+            continue
         
-        if "detalle_ia" in resultado and resultado["detalle_ia"]:
-            # Limitar tamaño de detalle_ia para BD
-            detalle_ia = resultado["detalle_ia"].copy()
-            if "razonamiento" in detalle_ia and len(detalle_ia["razonamiento"]) > 500:
-                detalle_ia["razonamiento"] = detalle_ia["razonamiento"][:500] + "..."
-            respuesta_bd["detalle_ia"] = detalle_ia
+        # Solo se reutiliza lo que se obtuvo consultando al menos los mismos backends
+        if not _cubre_modo(fila.modo, modo):
+            continue
         
-        return str(respuesta_bd)
+        resultado = _resultado_desde_bd(fila)
+        if resultado is None:
+            continue
+        # Sin IA solo valen veredictos que no dependan de Gemini
+        if modo == "solo_factcheck" and resultado["fuente_primaria"] != "factcheck":
+            continue
+        
+        logger.info(f"♻️ Reutilizando veredicto de consulta {consulta_id} (similitud {similitud:.2f})")
+        incrementar("casi_duplicados.reutilizados")
+        return resultado
     
+    incrementar("casi_duplicados.descartados")
+    return None
+
+def _buscar_veredicto_similar_con_sesion(texto: str, modo: str) -> Optional[Dict[str, Any]]:
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return _buscar_veredicto_similar(db, texto, modo)
     except Exception as e:
-        logger.error(f"Error preparando respuesta para BD: {e}")
-        return f"Resultado: {resultado.get('resultado_final', 'error')}"
+        logger.error(f"Error buscando veredicto similar: {e}")
+        return None
+    finally:
+        db.close()
 
 def obtener_estadisticas_hibridas(db: Session) -> Dict[str, Any]:
     """Obtiene estadísticas del uso del sistema híbrido"""
-    from database import ConsultaNoticia
-    from sqlalchemy import func
+    from database import estado_pool
+    from services.metricas import obtener_contadores
+    from services.cache_veredictos import get_cache
+    from services.indice_similitud import get_indice
+    from services.coalescencia import estadisticas_coalescencia
+    from services.gemini_analyzer import get_micro_loteador, estadisticas_parseo, estadisticas_prefijo
+    from services.capacidades_gemini import get_registro_capacidades
+    from services.niveles_gemini import estadisticas_niveles
+    from services.compresion_texto import estadisticas_compresion
+    from services.ejecutor_paralelo import get_pool
+    from services.resiliencia import estado_circuitos
+    from services.limite_peticiones import estado_limites
+    from services.cola_trabajos import estadisticas_trabajos
+    from services.estadisticas_agregadas import resumen_global
     
     try:
-        stats = db.query(
-            func.count(ConsultaNoticia.id).label("total_consultas"),
-            func.count(func.distinct(ConsultaNoticia.usuario_id)).label("usuarios_unicos"),
-            func.avg(func.length(ConsultaNoticia.texto_consultado)).label("longitud_promedio")
-        ).first()
-        
-        # Consulta para distribución de fuentes
-        distribucion_fuentes = db.query(
-            ConsultaNoticia.resultado,
-            func.count(ConsultaNoticia.id).label("cantidad")
-        ).group_by(ConsultaNoticia.resultado).all()
-        
+        # Totales servidos desde los agregados, sin recorrer consultas_noticias
         return {
-            "total_consultas": stats.total_consultas or 0,
-            "usuarios_unicos": stats.usuarios_unicos or 0,
-            "longitud_promedio_texto": round(stats.longitud_promedio or 0, 2),
-            "distribucion_resultados": {
-                resultado: cantidad for resultado, cantidad in distribucion_fuentes
-            }
+            **resumen_global(db),
+            "especulacion": obtener_contadores("especulacion"),
+            "ejecutor_hibrido": get_pool().estadisticas(),
+            "cache_veredictos": get_cache().estadisticas(),
+            "casi_duplicados": {
+                **get_indice().estadisticas(),
+                **obtener_contadores("casi_duplicados")
+            },
+            "coalescencia": estadisticas_coalescencia(),
+            "micro_lotes_gemini": get_micro_loteador().estadisticas(),
+            "parseo_gemini": estadisticas_parseo(),
+            "capacidades_gemini": get_registro_capacidades().estado(),
+            "niveles_gemini": estadisticas_niveles(),
+            "prefijo_gemini": estadisticas_prefijo(),
+            "compresion": estadisticas_compresion(),
+            "resiliencia": {
+                "circuitos": estado_circuitos(),
+                **obtener_contadores("resiliencia")
+            },
+            "limites": estado_limites(),
+            "resultados": _estadisticas_resultados(db),
+            "trabajos": estadisticas_trabajos(db),
+            "pool_bd": estado_pool()
         }
         
     except Exception as e:
@@ -534,30 +1284,11 @@ def obtener_estadisticas_hibridas(db: Session) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def limpiar_consultas_antiguas(db: Session, dias: int = 30) -> Dict[str, Any]:
-    """Limpia consultas más antiguas que X días"""
-    from database import ConsultaNoticia
-    from datetime import datetime, timedelta
+def _estadisticas_resultados(db: Session, dias: int = ESTADISTICAS_VENTANA_DIAS) -> Dict[str, Any]:
+    """
+    Volumen, confianza y latencias por fuente primaria y volumen por modo de
+    las consultas recientes, servidos desde los agregados diarios
+    """
+    from services.estadisticas_agregadas import resultados_recientes
     
-    try:
-        fecha_limite = datetime.utcnow() - timedelta(days=dias)
-        
-        consultas_eliminadas = db.query(ConsultaNoticia)\
-            .filter(ConsultaNoticia.fecha_consulta < fecha_limite)\
-            .delete()
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "consultas_eliminadas": consultas_eliminadas,
-            "fecha_limite": fecha_limite.isoformat()
-        }
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error limpiando consultas antiguas: {e}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
\ No newline at end of file
+    return resultados_recientes(db, dias)
@@ -0,0 +1,329 @@
+# services/indice_similitud.py
+import os
+import time
+import logging
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+from services.cache_veredictos import normalizar_afirmacion
+
+logger = logging.getLogger(__name__)
+
+# Similitud Jaccard mínima (sobre trigramas de palabras) para reutilizar un veredicto
+DUP_UMBRAL = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+# Solo se reutilizan consultas recientes
+DUP_VENTANA_DIAS = int(os.getenv("NEAR_DUP_WINDOW_DAYS", "30"))
+# Los textos muy cortos que difieren en pocas palabras suelen ser afirmaciones distintas
+DUP_MIN_PALABRAS = int(os.getenv("NEAR_DUP_MIN_WORDS", "8"))
+# Cada cuántas horas se sacan del índice las consultas que ya salieron de la ventana
+DUP_HORAS_COMPACTACION = float(os.getenv("NEAR_DUP_COMPACT_INTERVAL_HOURS", "6"))
+
+# Parámetros MinHash / LSH: 10 bandas de 3 filas sobre una firma de 32 valores
+NUM_VALORES = 32
+BANDAS = 10
+FILAS = 3
+BITS_CUBETA = 16
+_MASCARA_CUBETA = (1 << BITS_CUBETA) - 1
+_VACIO = 0xFFFFFFFF
+_EPOCH = datetime(1970, 1, 1)
+# Resultados no reutilizables como veredicto ("no_encontrado" no es un veredicto:
+# otra consulta con IA o más tarde en FactCheck puede dar uno)
+_RESULTADOS_NO_VALIDOS = ("error", "procesando", "procesado", "no_encontrado")
+
+def _shingles(texto: str) -> set:
+    """Trigramas de palabras sobre el texto normalizado"""
+    return _shingles_de_palabras(normalizar_afirmacion(texto).split())
+
+def _shingles_de_palabras(palabras: List[str]) -> set:
+    if len(palabras) < 3:
+        return {" ".join(palabras)} if palabras else set()
+    return {" ".join(palabras[i:i + 3]) for i in range(len(palabras) - 2)}
+
+def jaccard(texto_a: str, texto_b: str) -> float:
+    """Similitud Jaccard exacta entre los trigramas de dos textos"""
+    a, b = _shingles(texto_a), _shingles(texto_b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def firma_minhash(texto: str) -> List[int]:
+    """
+    Firma MinHash por "one permutation hashing": un único hash por trigrama
+    repartido en NUM_VALORES cubetas, con densificación por rotación para
+    las cubetas vacías
+    """
+    return _firma_de_shingles(_shingles(texto))
+
+def _firma_de_shingles(shingles: set) -> List[int]:
+    # hash() de Python basta: el índice vive en memoria y se reconstruye en cada proceso
+    firma = [_VACIO] * NUM_VALORES
+    for shingle in shingles:
+        h = hash(shingle) & 0xFFFFFFFFFFFFFFFF
+        cubeta = h % NUM_VALORES
+        valor = (h // NUM_VALORES) & 0xFFFFFFFF
+        if valor < firma[cubeta]:
+            firma[cubeta] = valor
+
+    if all(v == _VACIO for v in firma):
+        return firma
+
+    # Densificación: cada cubeta vacía toma el valor de la siguiente no vacía
+    for i in range(NUM_VALORES):
+        if firma[i] != _VACIO:
+            continue
+        distancia = 1
+        while firma[(i + distancia) % NUM_VALORES] == _VACIO:
+            distancia += 1
+        origen = firma[(i + distancia) % NUM_VALORES]
+        firma[i] = (origen + distancia * 0x9E3779B1) & 0xFFFFFFFF
+    return firma
+
+def _claves_bandas(firma: List[int]) -> List[int]:
+    return [
+        hash(tuple(firma[b * FILAS:(b + 1) * FILAS])) & _MASCARA_CUBETA
+        for b in range(BANDAS)
+    ]
+
+def _segundos(fecha: datetime) -> float:
+    """Fecha UTC naive (como fecha_consulta) en segundos desde epoch"""
+    return (fecha - _EPOCH).total_seconds()
+
+class IndiceCasiDuplicados:
+    """
+    Índice LSH en memoria de consultas verificadas. Guarda por cada consulta
+    su id, su fecha, una firma reducida a 16 bits por valor y sus claves de
+    banda; las cubetas son arrays de posiciones para mantener el consumo
+    acotado con millones de entradas. Las entradas solo se añaden al final:
+    compactar() saca las anteriores a una fecha y rehace las cubetas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vaciar()
+        self.ultima_reconstruccion: Optional[Dict[str, Any]] = None
+        self.ultima_compactacion: Optional[Dict[str, Any]] = None
+
+    def _vaciar(self) -> None:
+        self._ids = array("q")
+        self._fechas = array("d")
+        self._firmas = array("H")
+        self._claves = array("H")
+        self._cubetas: List[Dict[int, array]] = [dict() for _ in range(BANDAS)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def agregar(self, consulta_id: int, texto: str, fecha: Optional[datetime] = None) -> None:
+        """Añade una consulta al índice (actualización incremental)"""
+        palabras = normalizar_afirmacion(texto).split()
+        if len(palabras) < DUP_MIN_PALABRAS:
+            return
+        firma = _firma_de_shingles(_shingles_de_palabras(palabras))
+        claves = _claves_bandas(firma)
+        with self._lock:
+            posicion = len(self._ids)
+            self._ids.append(consulta_id)
+            self._fechas.append(_segundos(fecha or datetime.utcnow()))
+            self._firmas.extend(v & 0xFFFF for v in firma)
+            self._claves.extend(claves)
+            for banda, clave in enumerate(claves):
+                cubeta = self._cubetas[banda].get(clave)
+                if cubeta is None:
+                    cubeta = self._cubetas[banda][clave] = array("I")
+                cubeta.append(posicion)
+
+    def compactar(self, limite: datetime) -> int:
+        """
+        Saca del índice las consultas anteriores a `limite` (fuera de la
+        ventana o borradas por la purga). Las estructuras nuevas se construyen
+        sin el lock; al cambiarlas se copian también las entradas añadidas
+        mientras tanto. Devuelve cuántas se eliminaron.
+        """
+        inicio = time.perf_counter()
+        corte = _segundos(limite)
+        with self._lock:
+            total = len(self._ids)
+            ids, fechas, firmas, claves = self._ids, self._fechas, self._firmas, self._claves
+
+        conservar = [posicion for posicion in range(total) if fechas[posicion] >= corte]
+        eliminadas = total - len(conservar)
+        if not eliminadas:
+            return 0
+
+        nuevo = IndiceCasiDuplicados()
+
+        def _copiar(posiciones: Iterable[int]) -> None:
+            for posicion in posiciones:
+                destino = len(nuevo._ids)
+                nuevo._ids.append(ids[posicion])
+                nuevo._fechas.append(fechas[posicion])
+                nuevo._firmas.extend(firmas[posicion * NUM_VALORES:(posicion + 1) * NUM_VALORES])
+                claves_entrada = claves[posicion * BANDAS:(posicion + 1) * BANDAS]
+                nuevo._claves.extend(claves_entrada)
+                for banda, clave in enumerate(claves_entrada):
+                    cubeta = nuevo._cubetas[banda].get(clave)
+                    if cubeta is None:
+                        cubeta = nuevo._cubetas[banda][clave] = array("I")
+                    cubeta.append(destino)
+
+        _copiar(conservar)
+        with self._lock:
+            # Los arrays originales solo crecen: lo añadido desde la copia está al final
+            _copiar(range(total, len(self._ids)))
+            self._ids, self._fechas, self._firmas, self._claves = nuevo._ids, nuevo._fechas, nuevo._firmas, nuevo._claves
+            self._cubetas = nuevo._cubetas
+
+        self.ultima_compactacion = {
+            "eliminadas": eliminadas,
+            "limite": limite.isoformat(),
+            "segundos": round(time.perf_counter() - inicio, 2),
+            "fecha": datetime.utcnow().isoformat()
+        }
+        logger.info(f"🧹 Índice de casi-duplicados compactado: {eliminadas} consultas anteriores a {limite:%Y-%m-%d %H:%M}")
+        return eliminadas
+
+    def buscar(self, texto: str, limite: int = 5, umbral: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Devuelve hasta `limite` pares (consulta_id, similitud_estimada) por
+        encima del umbral, de más a menos similar. La similitud es una
+        estimación: conviene confirmarla con jaccard() sobre el texto real.
+        """
+        umbral = DUP_UMBRAL if umbral is None else umbral
+        palabras = normalizar_afirmacion(texto).split()
+        if len(palabras) < DUP_MIN_PALABRAS:
+            return []
+
+        firma = _firma_de_shingles(_shingles_de_palabras(palabras))
+        firma_corta = [v & 0xFFFF for v in firma]
+        claves = _claves_bandas(firma)
+
+        with self._lock:
+            posiciones = set()
+            for banda, clave in enumerate(claves):
+                cubeta = self._cubetas[banda].get(clave)
+                if cubeta is not None:
+                    posiciones.update(cubeta)
+
+            # Margen sobre el umbral para absorber el error de la estimación
+            minimo = max(0.0, umbral - 0.15)
+            encontrados = []
+            for posicion in posiciones:
+                inicio = posicion * NUM_VALORES
+                iguales = sum(
+                    1 for a, b in zip(firma_corta, self._firmas[inicio:inicio + NUM_VALORES]) if a == b
+                )
+                similitud = iguales / NUM_VALORES
+                if similitud >= minimo:
+                    encontrados.append((self._ids[posicion], similitud))
+
+        encontrados.sort(key=lambda par: (-par[1], -par[0]))
+        return encontrados[:limite]
+
+    def reconstruir(self, filas: Iterable[Tuple[int, str, datetime]]) -> int:
+        """Vacía el índice y lo rellena con tuplas (id, texto, fecha)"""
+        inicio = time.perf_counter()
+        with self._lock:
+            self._vaciar()
+
+        total = 0
+        for consulta_id, texto, fecha in filas:
+            self.agregar(consulta_id, texto, fecha)
+            total += 1
+
+        self.ultima_reconstruccion = {
+            "filas_leidas": total,
+            "entradas": len(self),
+            "segundos": round(time.perf_counter() - inicio, 2),
+            "fecha": datetime.utcnow().isoformat()
+        }
+        return total
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            cubetas = sum(len(b) for b in self._cubetas)
+            return {
+                "entradas": len(self._ids),
+                "cubetas": cubetas,
+                "umbral": DUP_UMBRAL,
+                "ventana_dias": DUP_VENTANA_DIAS,
+                "ultima_reconstruccion": self.ultima_reconstruccion,
+                "ultima_compactacion": self.ultima_compactacion
+            }
+
+# Índice global
+_indice = None
+
+def get_indice() -> IndiceCasiDuplicados:
+    """Obtener índice de casi-duplicados (singleton)"""
+    global _indice
+    if _indice is None:
+        _indice = IndiceCasiDuplicados()
+    return _indice
+
+def reconstruir_indice_desde_bd() -> None:
+    """Reconstruye el índice con las consultas verificadas recientes de la BD"""
+    from database import SessionLocal, ConsultaNoticia, TextoConsulta
+    from sqlalchemy import func
+
+    db = SessionLocal()
+    try:
+        limite = datetime.utcnow() - timedelta(days=DUP_VENTANA_DIAS)
+        filas = db.query(
+            ConsultaNoticia.id,
+            func.coalesce(TextoConsulta.texto, ConsultaNoticia.texto_consultado),
+            ConsultaNoticia.fecha_consulta
+        )\
+            .outerjoin(TextoConsulta, ConsultaNoticia.texto_hash == TextoConsulta.hash)\
+            .filter(ConsultaNoticia.fecha_consulta >= limite)\
+            .filter(ConsultaNoticia.resultado.notin_(_RESULTADOS_NO_VALIDOS))\
+            .order_by(ConsultaNoticia.id)\
+            .yield_per(10000)
+        total = get_indice().reconstruir(filas)
+        logger.info(f"✅ Índice de casi-duplicados reconstruido: {total} consultas")
+    except Exception as e:
+        logger.error(f"❌ Error reconstruyendo índice de casi-duplicados: {e}")
+    finally:
+        db.close()
+
+def iniciar_reconstruccion_indice() -> threading.Thread:
+    """Lanza la reconstrucción en segundo plano para no retrasar el arranque"""
+    hilo = threading.Thread(target=reconstruir_indice_desde_bd, name="indice-similitud", daemon=True)
+    hilo.start()
+    return hilo
+
+# ==================== COMPACTACIÓN PERIÓDICA ====================
+
+_parar_compactacion = threading.Event()
+_hilo_compactacion: Optional[threading.Thread] = None
+
+def compactar_indice() -> int:
+    """Saca del índice las consultas que ya salieron de la ventana de reutilización"""
+    return get_indice().compactar(datetime.utcnow() - timedelta(days=DUP_VENTANA_DIAS))
+
+def iniciar_compactacion_indice(intervalo_horas: float = DUP_HORAS_COMPACTACION) -> None:
+    global _hilo_compactacion
+    if intervalo_horas <= 0 or _hilo_compactacion is not None:
+        return
+
+    def _bucle():
+        while not _parar_compactacion.wait(intervalo_horas * 3600):
+            try:
+                compactar_indice()
+            except Exception as e:
+                logger.error(f"❌ Error compactando índice de casi-duplicados: {e}")
+
+    _parar_compactacion.clear()
+    _hilo_compactacion = threading.Thread(target=_bucle, name="compactacion-indice", daemon=True)
+    _hilo_compactacion.start()
+
+def detener_compactacion_indice() -> None:
+    global _hilo_compactacion
+    _parar_compactacion.set()
+    if _hilo_compactacion is not None:
+        _hilo_compactacion.join(timeout=5)
+        _hilo_compactacion = None
+
+def es_reutilizable(resultado: str) -> bool:
+    return resultado not in _RESULTADOS_NO_VALIDOS
@@ -0,0 +1,281 @@
+# services/limite_peticiones.py
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# "memoria": cubos por proceso (cada worker de uvicorn limita por separado)
+# "bd": cubos en la tabla cubos_limite, compartidos por todos los workers
+BACKEND_LIMITES = os.getenv("RATE_LIMIT_BACKEND", "memoria").lower()
+LIMITES_ACTIVOS = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Detrás del proxy de Railway/Render la IP real llega en X-Forwarded-For. Solo
+# se lee si se activa: sin proxy delante el cliente escribe la cabecera entera
+CONFIAR_EN_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+# Proxies de confianza delante de la app. Cada uno añade a la derecha la IP
+# desde la que le llegó la petición, así que la IP del cliente es la entrada
+# número SALTOS_PROXY contando desde la derecha; lo de más a la izquierda lo
+# puede escribir el propio cliente
+SALTOS_PROXY = max(1, int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "1")))
+# Cada cuántos segundos se descartan los cubos inactivos (ya llenos)
+INTERVALO_LIMPIEZA = 60.0
+
+_PERIODOS = {"s": 1, "min": 60, "h": 3600}
+
+def _limite(variable: str, por_defecto: str) -> Optional[Tuple[float, float]]:
+    """
+    Lee un límite "N/periodo" (periodo: s, min, h) y devuelve (capacidad, tokens
+    por segundo). La capacidad es también la ráfaga permitida. "0" lo desactiva.
+    """
+    valor = os.getenv(variable, por_defecto).strip()
+    if valor in ("", "0"):
+        return None
+    cantidad, _, periodo = valor.partition("/")
+    capacidad = float(cantidad)
+    return capacidad, capacidad / _PERIODOS[periodo or "min"]
+
+# Peticiones por cliente y endpoint
+LIMITES_ENDPOINT = {
+    "verificar_v2": _limite("RATE_LIMIT_VERIFICAR_V2", "30/min"),
+    "verificar_movil": _limite("RATE_LIMIT_VERIFICAR_MOVIL", "30/min"),
+    "verificar_lote": _limite("RATE_LIMIT_VERIFICAR_LOTE", "5/min"),
+}
+
+# Llamadas por cliente a cada upstream de pago, sumando todos los endpoints
+# (un lote consume un token por noticia)
+LIMITES_UPSTREAM_CLIENTE = {
+    "gemini": _limite("RATE_LIMIT_GEMINI", "60/h"),
+}
+
+class DecisionLimite:
+    __slots__ = ("permitido", "reintentar_en", "clave")
+
+    def __init__(self, permitido: bool, reintentar_en: float = 0.0, clave: Optional[str] = None):
+        self.permitido = permitido
+        self.reintentar_en = reintentar_en
+        self.clave = clave  # Cubo que ha rechazado la petición
+
+    @property
+    def retry_after(self) -> str:
+        """Valor de la cabecera Retry-After (segundos enteros, al menos 1)"""
+        return str(max(1, math.ceil(self.reintentar_en)))
+
+# ==================== BACKEND EN MEMORIA ====================
+
+class CubosEnMemoria:
+    """Token buckets por clave en un dict; todas las reservas de una petición se deciden a la vez"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cubos: Dict[str, List[float]] = {}  # clave -> [tokens, instante]
+        self._ultima_limpieza = time.monotonic()
+
+    def consumir(self, reservas: List[Tuple[str, Tuple[float, float], float]]) -> DecisionLimite:
+        ahora = time.monotonic()
+        with self._lock:
+            rellenos = []
+            for clave, (capacidad, tasa), coste in reservas:
+                cubo = self._cubos.get(clave)
+                tokens = capacidad if cubo is None else min(capacidad, cubo[0] + (ahora - cubo[1]) * tasa)
+                if tokens < coste:
+                    return DecisionLimite(False, (coste - tokens) / tasa, clave)
+                rellenos.append((clave, tokens - coste))
+            # Solo se descuenta si todos los cubos tienen saldo
+            for clave, tokens in rellenos:
+                self._cubos[clave] = [tokens, ahora]
+            if ahora - self._ultima_limpieza > INTERVALO_LIMPIEZA:
+                self._limpiar(ahora)
+        return DecisionLimite(True)
+
+    def _limpiar(self, ahora: float) -> None:
+        # Un cubo que ya se habría rellenado entero equivale a no tenerlo
+        limite = ahora - _periodo_maximo()
+        inactivos = [clave for clave, (_, instante) in self._cubos.items() if instante < limite]
+        for clave in inactivos:
+            del self._cubos[clave]
+        self._ultima_limpieza = ahora
+
+    def estado(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memoria", "cubos": len(self._cubos)}
+
+# ==================== BACKEND EN BD ====================
+
+class CubosEnBaseDatos:
+    """
+    Token buckets en la tabla cubos_limite. Cada reserva es un único UPSERT que
+    rellena, decide y descuenta en la propia BD, así que es atómica entre workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ultima_limpieza = time.time()
+
+    def consumir(self, reservas: List[Tuple[str, Tuple[float, float], float]]) -> DecisionLimite:
+        from database import SessionLocal
+
+        ahora = time.time()
+        db = SessionLocal()
+        try:
+            # Los cubos se consumen en orden; si uno rechaza, los anteriores no se devuelven
+            for clave, (capacidad, tasa), coste in reservas:
+                tokens, permitido = self._reservar(db, clave, capacidad, tasa, coste, ahora)
+                if not permitido:
+                    db.commit()
+                    return DecisionLimite(False, (coste - tokens) / tasa, clave)
+            db.commit()
+        except Exception as e:
+            # Sin BD no se bloquea el tráfico: el limitador no debe tumbar la API
+            db.rollback()
+            logger.error(f"❌ Error en el limitador de peticiones: {e}")
+            return DecisionLimite(True)
+        finally:
+            db.close()
+
+        with self._lock:
+            limpiar = ahora - self._ultima_limpieza > INTERVALO_LIMPIEZA
+            if limpiar:
+                self._ultima_limpieza = ahora
+        if limpiar:
+            self._limpiar(ahora)
+        return DecisionLimite(True)
+
+    def _reservar(self, db, clave: str, capacidad: float, tasa: float, coste: float, ahora: float):
+        from sqlalchemy import case, literal
+        from database import engine, CuboLimite
+
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        rellenado = CuboLimite.tokens + (literal(ahora) - CuboLimite.actualizado) * tasa
+        tokens = case((rellenado > capacidad, literal(capacidad)), else_=rellenado)
+        sentencia = insert(CuboLimite).values(
+            clave=clave, tokens=capacidad - coste, actualizado=ahora, permitido=True
+        )
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=[CuboLimite.clave],
+            set_={
+                "tokens": case((tokens >= coste, tokens - coste), else_=tokens),
+                "actualizado": ahora,
+                "permitido": tokens >= coste,
+            }
+        ).returning(CuboLimite.tokens, CuboLimite.permitido)
+        return db.execute(sentencia).one()
+
+    def _limpiar(self, ahora: float) -> None:
+        from database import SessionLocal, CuboLimite
+
+        db = SessionLocal()
+        try:
+            db.query(CuboLimite)\
+                .filter(CuboLimite.actualizado < ahora - _periodo_maximo())\
+                .delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ No se pudieron limpiar los cubos del limitador: {e}")
+        finally:
+            db.close()
+
+    def estado(self) -> Dict[str, Any]:
+        from database import SessionLocal, CuboLimite
+
+        db = SessionLocal()
+        try:
+            return {"backend": "bd", "cubos": db.query(CuboLimite).count()}
+        finally:
+            db.close()
+
+def _periodo_maximo() -> float:
+    """Segundos que tarda en rellenarse del todo el cubo más lento"""
+    limites = [l for l in (*LIMITES_ENDPOINT.values(), *LIMITES_UPSTREAM_CLIENTE.values()) if l]
+    return max((capacidad / tasa for capacidad, tasa in limites), default=0.0)
+
+_cubos = None
+
+def get_cubos():
+    global _cubos
+    if _cubos is None:
+        _cubos = CubosEnBaseDatos() if BACKEND_LIMITES == "bd" else CubosEnMemoria()
+    return _cubos
+
+# ==================== DECISIÓN ====================
+
+def ip_cliente(host: Optional[str], cabeceras: Dict[str, str]) -> Optional[str]:
+    if CONFIAR_EN_PROXY:
+        reenviada = cabeceras.get("x-forwarded-for")
+        if reenviada:
+            saltos = [salto.strip() for salto in reenviada.split(",") if salto.strip()]
+            if saltos:
+                # Con menos entradas que proxies, la más antigua la puso ya un proxy nuestro
+                return saltos[-min(SALTOS_PROXY, len(saltos))]
+    return host
+
+def identidades_cliente(ip: Optional[str], noticias: Iterable[Any]) -> Counter:
+    """
+    Claves que identifican al cliente y cuántas noticias aporta cada una.
+    usuario_id y dispositivo_id los elige el cliente, por eso la IP se limita siempre.
+    """
+    identidades = Counter()
+    for noticia in noticias:
+        if ip:
+            identidades[f"ip:{ip}"] += 1
+        if noticia.usuario_id:
+            identidades[f"usuario:{noticia.usuario_id}"] += 1
+        if noticia.dispositivo_id:
+            identidades[f"dispositivo:{noticia.dispositivo_id}"] += 1
+    return identidades
+
+def _reservas(endpoint: str, identidades: Counter, upstream: Optional[str]):
+    reservas = []
+    limite_endpoint = LIMITES_ENDPOINT.get(endpoint)
+    limite_upstream = LIMITES_UPSTREAM_CLIENTE.get(upstream) if upstream else None
+    for identidad, noticias in identidades.items():
+        if limite_endpoint:
+            reservas.append((f"{endpoint}:{identidad}", limite_endpoint, 1.0))
+        if limite_upstream:
+            # Un lote mayor que la capacidad vacía el cubo en lugar de no pasar nunca
+            reservas.append((f"{upstream}:{identidad}", limite_upstream, min(float(noticias), limite_upstream[0])))
+    return reservas
+
+def comprobar_limite(endpoint: str, identidades: Counter, upstream: Optional[str] = None) -> DecisionLimite:
+    """Consume un token por identidad del endpoint y uno por noticia del upstream"""
+    reservas = _reservas(endpoint, identidades, upstream) if LIMITES_ACTIVOS else []
+    if not reservas:
+        return DecisionLimite(True)
+
+    decision = get_cubos().consumir(reservas)
+    if decision.permitido:
+        incrementar("limites.permitidas")
+    else:
+        incrementar("limites.rechazadas")
+        incrementar(f"limites.rechazadas_{decision.clave.split(':', 1)[0]}")
+        logger.warning(f"🚦 Límite alcanzado en {decision.clave}; reintentar en {decision.retry_after}s")
+    return decision
+
+async def comprobar_limite_async(endpoint: str, identidades: Counter, upstream: Optional[str] = None) -> DecisionLimite:
+    # El backend en memoria no bloquea; el de BD se lleva a un hilo para no parar el event loop
+    if BACKEND_LIMITES == "bd":
+        return await asyncio.to_thread(comprobar_limite, endpoint, identidades, upstream)
+    return comprobar_limite(endpoint, identidades, upstream)
+
+def estado_limites() -> Dict[str, Any]:
+    def _formato(limite):
+        return None if limite is None else {"capacidad": limite[0], "por_minuto": round(limite[1] * 60, 2)}
+
+    return {
+        "activos": LIMITES_ACTIVOS,
+        **get_cubos().estado(),
+        "endpoints": {nombre: _formato(l) for nombre, l in LIMITES_ENDPOINT.items()},
+        "upstreams": {nombre: _formato(l) for nombre, l in LIMITES_UPSTREAM_CLIENTE.items()},
+        **obtener_contadores("limites")
+    }
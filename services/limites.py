@@ -0,0 +1,23 @@
+# services/limites.py
+import os
+import asyncio
+import weakref
+from typing import Dict
+
+# Máximo de llamadas asíncronas simultáneas por upstream (por proceso)
+LIMITES_UPSTREAM = {
+    "scraperapi": int(os.getenv("UPSTREAM_CONCURRENCY_SCRAPERAPI", "8")),
+    "factcheck": int(os.getenv("UPSTREAM_CONCURRENCY_FACTCHECK", "16")),
+    "gemini": int(os.getenv("UPSTREAM_CONCURRENCY_GEMINI", "8")),
+}
+
+# Un juego de semáforos por event loop (los semáforos de asyncio no se comparten entre loops)
+_semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+def limite_upstream(nombre: str) -> asyncio.Semaphore:
+    """Semáforo que acota la concurrencia hacia un upstream"""
+    loop = asyncio.get_running_loop()
+    por_loop = _semaforos.setdefault(loop, {})
+    if nombre not in por_loop:
+        por_loop[nombre] = asyncio.Semaphore(LIMITES_UPSTREAM[nombre])
+    return por_loop[nombre]
@@ -0,0 +1,45 @@
+# services/metricas.py
+import time
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+from typing import Dict, Callable
+
+# Contadores en memoria del proceso (se reinician con cada despliegue)
+_lock = threading.Lock()
+_contadores = defaultdict(int)
+
+def incrementar(nombre: str, cantidad: int = 1) -> None:
+    """Incrementa un contador con nombre tipo 'grupo.contador'"""
+    with _lock:
+        _contadores[nombre] += cantidad
+
+def obtener_contadores(grupo: str) -> Dict[str, int]:
+    """Devuelve los contadores de un grupo sin el prefijo"""
+    prefijo = f"{grupo}."
+    with _lock:
+        return {
+            nombre[len(prefijo):]: valor
+            for nombre, valor in _contadores.items()
+            if nombre.startswith(prefijo)
+        }
+
+def con_latencia(funcion: Callable) -> Callable:
+    """Añade "latencia_ms" al dict que devuelve la llamada a un backend (sync o async)"""
+    if asyncio.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltura_async(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = await funcion(*args, **kwargs)
+            resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000)
+            return resultado
+        return envoltura_async
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000)
+        return resultado
+    return envoltura
@@ -0,0 +1,94 @@
+# services/micro_lotes.py
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+class MicroLoteador:
+    """
+    Agrupa elementos enviados a la vez desde varios hilos o corrutinas: espera
+    `ventana_ms` desde el primero (o hasta juntar `max_elementos`) y procesa
+    el grupo con una sola llamada a `procesar`, que devuelve un resultado por
+    elemento y en el mismo orden. Cada llamante recibe un Future con el suyo.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        procesar: Callable[[List[Any]], List[Any]],
+        ventana_ms: float,
+        max_elementos: int,
+        max_lotes_simultaneos: int = 4
+    ):
+        self.nombre = nombre
+        self.procesar = procesar
+        self.ventana = ventana_ms / 1000
+        self.max_elementos = max_elementos
+        self._condicion = threading.Condition()
+        self._pendientes: List[Tuple[Any, Future]] = []
+        self._primero_en = 0.0
+        self._hilo: Optional[threading.Thread] = None
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_lotes_simultaneos, thread_name_prefix=f"lote-{nombre}")
+
+    def enviar(self, elemento: Any) -> Future:
+        futuro = Future()
+        with self._condicion:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name=f"micro-lotes-{self.nombre}", daemon=True)
+                self._hilo.start()
+            if not self._pendientes:
+                self._primero_en = time.monotonic()
+            self._pendientes.append((elemento, futuro))
+            self._condicion.notify()
+        return futuro
+
+    def _bucle(self) -> None:
+        while True:
+            with self._condicion:
+                while not self._pendientes:
+                    self._condicion.wait()
+                # Esperar a que se llene el lote o venza la ventana del primer elemento
+                while len(self._pendientes) < self.max_elementos:
+                    restante = self._primero_en + self.ventana - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                lote = self._pendientes[:self.max_elementos]
+                self._pendientes = self._pendientes[self.max_elementos:]
+                if self._pendientes:
+                    self._primero_en = time.monotonic()
+            self._ejecutor.submit(self._procesar_lote, lote)
+
+    def _procesar_lote(self, lote: List[Tuple[Any, Future]]) -> None:
+        # Los llamantes que ya se fueron (cancelados) no entran en la llamada
+        lote = [(elemento, futuro) for elemento, futuro in lote if futuro.set_running_or_notify_cancel()]
+        if not lote:
+            return
+
+        incrementar(f"micro_lotes_{self.nombre}.lotes")
+        incrementar(f"micro_lotes_{self.nombre}.elementos", len(lote))
+        try:
+            resultados = self.procesar([elemento for elemento, _ in lote])
+        except Exception as e:
+            logger.error(f"❌ Error procesando micro-lote {self.nombre}: {e}")
+            for _, futuro in lote:
+                futuro.set_exception(e)
+            return
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        contadores = obtener_contadores(f"micro_lotes_{self.nombre}")
+        lotes = contadores.get("lotes", 0)
+        with self._condicion:
+            pendientes = len(self._pendientes)
+        return {
+            **contadores,
+            "tamano_medio": round(contadores.get("elementos", 0) / lotes, 2) if lotes else 0,
+            "pendientes": pendientes
+        }
@@ -0,0 +1,128 @@
+# services/migracion_resultados.py
+import os
+import ast
+import json
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE_MIGRACION = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+def migrar_resultados(tamano_lote: int = TAMANO_LOTE_MIGRACION) -> Dict[str, int]:
+    """
+    Rellena las columnas estructuradas (modo, fuente_primaria, confianza,
+    respuesta_json) de las consultas antiguas a partir del str(dict) guardado
+    en respuesta_api. Recorre la tabla por id en lotes con un commit por lote,
+    así que se puede interrumpir y relanzar: las filas ya migradas no se
+    vuelven a tocar.
+    """
+    from database import SessionLocal, ConsultaNoticia
+
+    totales = {"revisadas": 0, "migradas": 0, "omitidas": 0, "modo_completado": 0}
+    ultimo_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            filas = db.query(ConsultaNoticia)\
+                .filter(ConsultaNoticia.id > ultimo_id)\
+                .filter(ConsultaNoticia.respuesta_json.is_(None))\
+                .filter(ConsultaNoticia.fuente_primaria.is_(None))\
+                .filter(ConsultaNoticia.respuesta_api.isnot(None))\
+                .filter(ConsultaNoticia.resultado != "error")\
+                .order_by(ConsultaNoticia.id)\
+                .limit(tamano_lote)\
+                .all()
+            if not filas:
+                break
+
+            for fila in filas:
+                columnas = _columnas_desde_legado(fila.respuesta_api)
+                if columnas is None:
+                    totales["omitidas"] += 1
+                    continue
+                for columna, valor in columnas.items():
+                    setattr(fila, columna, valor)
+                # El payload ya vive en respuesta_json: no duplicarlo
+                fila.respuesta_api = None
+                totales["migradas"] += 1
+
+            totales["revisadas"] += len(filas)
+            ultimo_id = filas[-1].id
+            db.commit()
+            logger.info(f"🔁 Migración de resultados: {totales['revisadas']} revisadas (hasta id {ultimo_id})")
+
+        totales["modo_completado"] = _completar_modo(db, tamano_lote)
+    finally:
+        db.close()
+
+    logger.info(f"✅ Migración de resultados terminada: {totales}")
+    return totales
+
+def _completar_modo(db, tamano_lote: int) -> int:
+    """
+    Las filas migradas antes de rellenar `modo` lo tienen en respuesta_json
+    (modo_utilizado). Sin modo, la búsqueda de casi-duplicados no las reutiliza.
+    """
+    from database import ConsultaNoticia
+
+    completadas = 0
+    ultimo_id = 0
+    while True:
+        filas = db.query(ConsultaNoticia)\
+            .filter(ConsultaNoticia.id > ultimo_id)\
+            .filter(ConsultaNoticia.modo.is_(None))\
+            .filter(ConsultaNoticia.respuesta_json.isnot(None))\
+            .order_by(ConsultaNoticia.id)\
+            .limit(tamano_lote)\
+            .all()
+        if not filas:
+            break
+        for fila in filas:
+            modo = (fila.respuesta_json or {}).get("modo_utilizado")
+            if modo:
+                fila.modo = modo
+                completadas += 1
+        ultimo_id = filas[-1].id
+        db.commit()
+    if completadas:
+        logger.info(f"🔁 Migración de resultados: modo completado en {completadas} consultas")
+    return completadas
+
+def _columnas_desde_legado(respuesta_api: str) -> Optional[Dict[str, Any]]:
+    """Traduce el respuesta_api antiguo a columnas; None si no se reconoce el formato"""
+    if respuesta_api == "Sin resultados":
+        # /verificar (factcheck_api.verificar_api) sin coincidencias
+        return {"modo": "factcheck_legacy", "fuente_primaria": "factcheck", "respuesta_json": {"detalle_factcheck": None}}
+
+    try:
+        respuesta_bd = ast.literal_eval(respuesta_api)
+    except (ValueError, SyntaxError):
+        return None
+    if not isinstance(respuesta_bd, dict):
+        return None
+
+    respuesta_bd = json.loads(json.dumps(respuesta_bd, ensure_ascii=False, default=str))
+
+    if "fuente_primaria" not in respuesta_bd:
+        # /verificar guardaba directamente el detalle de FactCheck
+        return {"modo": "factcheck_legacy", "fuente_primaria": "factcheck", "respuesta_json": {"detalle_factcheck": respuesta_bd}}
+
+    confianza = respuesta_bd.get("confianza")
+    return {
+        "modo": respuesta_bd.get("modo_utilizado"),
+        "fuente_primaria": respuesta_bd.get("fuente_primaria"),
+        "confianza": int(confianza) if isinstance(confianza, (int, float)) else None,
+        "respuesta_json": respuesta_bd
+    }
+
+if __name__ == "__main__":
+    # python -m services.migracion_resultados [tamano_lote]
+    import sys
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from database import create_tables
+    create_tables()
+    print(migrar_resultados(int(sys.argv[1]) if len(sys.argv) > 1 else TAMANO_LOTE_MIGRACION))
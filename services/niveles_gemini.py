@@ -0,0 +1,108 @@
+# services/niveles_gemini.py
+import os
+import logging
+from typing import Dict, Any, Optional
+
+from services.metricas import incrementar, obtener_contadores
+
+logger = logging.getLogger(__name__)
+
+# Enrutado por niveles: las afirmaciones cortas y atemporales van primero a un
+# modelo ligero sin búsqueda; solo si su confianza es baja se repite con el
+# nivel completo (modelo principal con búsqueda web)
+NIVELES_ACTIVOS = os.getenv("GEMINI_TIERING_ENABLED", "true").lower() == "true"
+MODELO_LIGERO = os.getenv("GEMINI_LIGHT_MODEL", "gemini-2.5-flash-lite")
+PALABRAS_MAX_LIGERO = int(os.getenv("GEMINI_LIGHT_MAX_WORDS", "60"))
+UMBRAL_ESCALADO = int(os.getenv("GEMINI_ESCALATION_CONFIDENCE", "7"))
+
+# Precios en USD por millón de tokens (entrada, salida) y por petición con búsqueda,
+# solo para estimar el coste de cada nivel
+PRECIOS_NIVEL = {
+    "ligero": (float(os.getenv("GEMINI_LIGHT_PRICE_INPUT_PER_M", "0.10")), float(os.getenv("GEMINI_LIGHT_PRICE_OUTPUT_PER_M", "0.40"))),
+    "completo": (float(os.getenv("GEMINI_PRICE_INPUT_PER_M", "0.30")), float(os.getenv("GEMINI_PRICE_OUTPUT_PER_M", "2.50"))),
+}
+PRECIO_BUSQUEDA = float(os.getenv("GEMINI_GROUNDING_PRICE_PER_REQUEST", "0.035"))
+
+def configuracion_nivel(nivel: str) -> Dict[str, Any]:
+    from services.gemini_analyzer import MODELO_GEMINI
+
+    if nivel == "ligero":
+        return {"modelo": MODELO_LIGERO, "busqueda": False}
+    return {"modelo": MODELO_GEMINI, "busqueda": True}
+
+def elegir_nivel(texto: str) -> str:
+    """
+    Nivel inicial para una afirmación, con las mismas señales que el modo auto:
+    lo que parece actualidad o fechas futuras necesita búsqueda desde el principio.
+    """
+    from services.hybrid_verifier import _detectar_tipo_contenido
+    from services.capacidades_gemini import get_registro_capacidades, capacidad_modelo
+
+    if not NIVELES_ACTIVOS:
+        return "completo"
+    if _detectar_tipo_contenido(texto) != "general":
+        return "completo"
+    if len(texto.split()) > PALABRAS_MAX_LIGERO:
+        return "completo"
+    if not get_registro_capacidades().disponible(capacidad_modelo(MODELO_LIGERO)):
+        return "completo"
+    return "ligero"
+
+def debe_escalar(nivel: str, resultado: Dict[str, Any]) -> bool:
+    if nivel != "ligero":
+        return False
+    return not resultado.get("success") or (resultado.get("confianza") or 0) < UMBRAL_ESCALADO
+
+def registrar_llamada(nivel: str, response: Any, latencia_ms: int) -> None:
+    """Latencia, tokens y coste estimado de una llamada de este nivel"""
+    uso = getattr(response, "usage_metadata", None)
+    entrada = getattr(uso, "prompt_token_count", None) or 0
+    salida = getattr(uso, "candidates_token_count", None) or 0
+    # Parte de la entrada servida desde caché (explícita o implícita de la API)
+    cacheados = getattr(uso, "cached_content_token_count", None) or 0
+    candidatos = getattr(response, "candidates", None) or []
+    con_busqueda = any(getattr(candidato, "grounding_metadata", None) for candidato in candidatos)
+
+    precio_entrada, precio_salida = PRECIOS_NIVEL[nivel]
+    coste = (entrada * precio_entrada + salida * precio_salida) / 1_000_000
+    if con_busqueda:
+        coste += PRECIO_BUSQUEDA
+
+    incrementar(f"niveles_gemini.{nivel}.llamadas")
+    incrementar(f"niveles_gemini.{nivel}.latencia_ms_total", latencia_ms)
+    incrementar(f"niveles_gemini.{nivel}.tokens_entrada", entrada)
+    incrementar(f"niveles_gemini.{nivel}.tokens_salida", salida)
+    incrementar(f"niveles_gemini.{nivel}.tokens_cacheados", cacheados)
+    # Los contadores son enteros: el coste se acumula en micro-dólares
+    incrementar(f"niveles_gemini.{nivel}.coste_micro_usd", round(coste * 1_000_000))
+    if con_busqueda:
+        incrementar(f"niveles_gemini.{nivel}.con_busqueda")
+
+def registrar_escalado(motivo: Optional[str]) -> None:
+    incrementar("niveles_gemini.ligero.escalados")
+    logger.info(f"⬆️ Escalando al nivel completo: {motivo}")
+
+def estadisticas_niveles() -> Dict[str, Any]:
+    por_nivel: Dict[str, Dict[str, Any]] = {}
+    for nombre, valor in obtener_contadores("niveles_gemini").items():
+        nivel, contador = nombre.split(".", 1)
+        por_nivel.setdefault(nivel, {})[contador] = valor
+
+    for nivel, contadores in por_nivel.items():
+        llamadas = contadores.get("llamadas", 0)
+        coste = contadores.pop("coste_micro_usd", 0) / 1_000_000
+        contadores["coste_estimado_usd"] = round(coste, 4)
+        contadores["coste_medio_usd"] = round(coste / llamadas, 6) if llamadas else 0
+        contadores["tokens_entrada_medios"] = round(contadores.get("tokens_entrada", 0) / llamadas) if llamadas else 0
+        contadores["latencia_media_ms"] = round(contadores.get("latencia_ms_total", 0) / llamadas) if llamadas else 0
+        if nivel == "ligero":
+            intentos = llamadas + contadores.get("errores", 0)
+            contadores["tasa_escalado"] = round(contadores.get("escalados", 0) / intentos, 4) if intentos else 0
+
+    return {
+        "activos": NIVELES_ACTIVOS,
+        "modelo_ligero": MODELO_LIGERO,
+        "palabras_max_ligero": PALABRAS_MAX_LIGERO,
+        "umbral_escalado": UMBRAL_ESCALADO,
+        "niveles": por_nivel
+    }
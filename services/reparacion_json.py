@@ -0,0 +1,73 @@
+# services/reparacion_json.py
+import re
+import json
+from typing import Any, List, Tuple
+
+_BLOQUE_CODIGO = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_COMA_FINAL = re.compile(r",(\s*[}\]])")
+
+def cargar_json_tolerante(texto: str) -> Tuple[Any, bool]:
+    """
+    Interpreta el JSON devuelto por un modelo. Devuelve (valor, reparado):
+    reparado=False si el texto ya era JSON válido. Corrige los fallos
+    habituales sin volver a llamar al modelo: bloque ```json```, texto antes
+    o después del JSON, comas finales y respuestas cortadas a medias.
+    Lanza ValueError si no queda nada interpretable.
+    """
+    texto = (texto or "").strip()
+    try:
+        return json.loads(texto), False
+    except json.JSONDecodeError:
+        pass
+
+    bloque = _BLOQUE_CODIGO.search(texto)
+    if bloque:
+        texto = bloque.group(1).strip()
+
+    inicio = min((i for i in (texto.find("{"), texto.find("[")) if i >= 0), default=-1)
+    if inicio < 0:
+        raise ValueError("La respuesta no contiene JSON")
+    for candidato in _candidatos(texto[inicio:]):
+        try:
+            return json.loads(_COMA_FINAL.sub(r"\1", candidato)), True
+        except json.JSONDecodeError as e:
+            error = e
+    raise ValueError(f"JSON irreparable: {error}")
+
+def _candidatos(texto: str) -> List[str]:
+    """
+    Recorre el texto desde la primera llave/corchete hasta el cierre que le
+    corresponde (ignorando lo que venga después). Si la respuesta se cortó,
+    propone cerrarla tal cual (cadena incluida) y, si eso no basta, cortarla
+    tras el último elemento completo (la última coma) y cerrar desde ahí.
+    """
+    pila: List[str] = []
+    ultima_coma = None
+    en_cadena = escapado = False
+    for posicion, caracter in enumerate(texto):
+        if en_cadena:
+            if escapado:
+                escapado = False
+            elif caracter == "\\":
+                escapado = True
+            elif caracter == '"':
+                en_cadena = False
+            continue
+        if caracter == '"':
+            en_cadena = True
+        elif caracter in "{[":
+            pila.append("}" if caracter == "{" else "]")
+        elif caracter in "}]":
+            if pila:
+                pila.pop()
+            if not pila:
+                return [texto[:posicion + 1]]
+        elif caracter == ",":
+            ultima_coma = (posicion, list(pila))
+
+    # Respuesta truncada
+    candidatos = [texto + ('"' if en_cadena else "") + "".join(reversed(pila))]
+    if ultima_coma is not None:
+        posicion, pila_coma = ultima_coma
+        candidatos.append(texto[:posicion] + "".join(reversed(pila_coma)))
+    return candidatos
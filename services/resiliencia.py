@@ -0,0 +1,336 @@
+# services/resiliencia.py
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple, TypeVar
+
+from services.limites import LIMITES_UPSTREAM
+from services.metricas import incrementar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Fallos seguidos que abren el circuito y segundos que permanece abierto
+UMBRAL_FALLOS = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+SEGUNDOS_ABIERTO = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# Timeout adaptativo: p95 de las últimas llamadas correctas × multiplicador, acotado por upstream
+MULTIPLICADOR_P95 = float(os.getenv("ADAPTIVE_TIMEOUT_P95_MULTIPLIER", "2"))
+MUESTRAS_LATENCIA = 200
+MUESTRAS_MINIMAS = 20
+# Presupuesto de reintentos: como mucho este porcentaje de las llamadas de la última ventana
+PROPORCION_REINTENTOS = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+REINTENTOS_MINIMOS = int(os.getenv("RETRY_BUDGET_MIN_PER_WINDOW", "3"))
+VENTANA_REINTENTOS = 60.0
+
+# (mínimo, máximo) del timeout por upstream; el máximo es el antiguo valor fijo
+TIMEOUTS_UPSTREAM = {
+    "scraperapi": (float(os.getenv("SCRAPERAPI_TIMEOUT_MIN_SECONDS", "3")), float(os.getenv("SCRAPERAPI_TIMEOUT_MAX_SECONDS", "20"))),
+    "factcheck": (float(os.getenv("FACTCHECK_TIMEOUT_MIN_SECONDS", "2")), float(os.getenv("FACTCHECK_TIMEOUT_MAX_SECONDS", "30"))),
+    "gemini": (float(os.getenv("GEMINI_TIMEOUT_MIN_SECONDS", "5")), float(os.getenv("GEMINI_TIMEOUT_MAX_SECONDS", "60"))),
+}
+
+class CircuitoAbierto(Exception):
+    """El upstream está marcado como caído: no se le llama hasta que pase el enfriamiento"""
+
+class SaturacionLocal(Exception):
+    """No queda hilo libre para llamar al upstream: la saturación es nuestra, no un fallo suyo"""
+
+class CircuitoUpstream:
+    """
+    Circuito cerrado/abierto/semiabierto de un upstream, con timeout adaptativo
+    y presupuesto de reintentos. Compartido por las llamadas síncronas y asíncronas.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        timeout_min: float,
+        timeout_max: float,
+        umbral_fallos: int = UMBRAL_FALLOS,
+        segundos_abierto: float = SEGUNDOS_ABIERTO
+    ):
+        self.nombre = nombre
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.umbral_fallos = umbral_fallos
+        self.segundos_abierto = segundos_abierto
+        self._lock = threading.Lock()
+        self._estado = "cerrado"
+        self._fallos_seguidos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._latencias = deque(maxlen=MUESTRAS_LATENCIA)
+        self._inicio_ventana = time.monotonic()
+        self._llamadas_ventana = 0
+        self._reintentos_ventana = 0
+
+    # ---- estado del circuito ----
+
+    def disponible(self) -> bool:
+        """Consulta sin efectos: False mientras esté abierto y sin cumplir el enfriamiento"""
+        with self._lock:
+            return not (self._estado == "abierto" and time.monotonic() - self._abierto_desde < self.segundos_abierto)
+
+    def permitir(self) -> bool:
+        """Reserva una llamada. En semiabierto solo se deja pasar una llamada de prueba."""
+        with self._lock:
+            if self._estado == "abierto":
+                if time.monotonic() - self._abierto_desde < self.segundos_abierto:
+                    return False
+                self._estado = "semiabierto"
+                self._prueba_en_curso = False
+                logger.info(f"🟡 Circuito {self.nombre}: semiabierto, probando")
+            if self._estado == "semiabierto":
+                if self._prueba_en_curso:
+                    return False
+                self._prueba_en_curso = True
+            self._contar_llamada()
+            return True
+
+    def registrar_exito(self, segundos: Optional[float] = None) -> None:
+        with self._lock:
+            if segundos is not None:
+                self._latencias.append(segundos)
+            self._fallos_seguidos = 0
+            if self._estado != "cerrado":
+                logger.info(f"🟢 Circuito {self.nombre}: cerrado")
+                incrementar(f"resiliencia.{self.nombre}.cerrados")
+            self._estado = "cerrado"
+            self._prueba_en_curso = False
+
+    def liberar(self) -> None:
+        """La llamada reservada no llegó al upstream: no cuenta ni como éxito ni como fallo"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self) -> None:
+        with self._lock:
+            self._fallos_seguidos += 1
+            if self._estado == "semiabierto" or self._fallos_seguidos >= self.umbral_fallos:
+                if self._estado != "abierto":
+                    logger.warning(f"🔴 Circuito {self.nombre}: abierto tras {self._fallos_seguidos} fallos seguidos")
+                    incrementar(f"resiliencia.{self.nombre}.aperturas")
+                self._estado = "abierto"
+                self._abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+
+    # ---- timeout adaptativo ----
+
+    def timeout(self) -> float:
+        with self._lock:
+            if len(self._latencias) < MUESTRAS_MINIMAS:
+                return self.timeout_max
+            ordenadas = sorted(self._latencias)
+            p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+        return min(self.timeout_max, max(self.timeout_min, p95 * MULTIPLICADOR_P95))
+
+    # ---- presupuesto de reintentos ----
+
+    def _contar_llamada(self) -> None:
+        ahora = time.monotonic()
+        if ahora - self._inicio_ventana >= VENTANA_REINTENTOS:
+            self._inicio_ventana = ahora
+            self._llamadas_ventana = 0
+            self._reintentos_ventana = 0
+        self._llamadas_ventana += 1
+
+    def gastar_reintento(self) -> bool:
+        with self._lock:
+            presupuesto = max(REINTENTOS_MINIMOS, self._llamadas_ventana * PROPORCION_REINTENTOS)
+            if self._reintentos_ventana >= presupuesto:
+                return False
+            self._reintentos_ventana += 1
+            return True
+
+    def estado(self) -> Dict[str, Any]:
+        timeout = self.timeout()
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "fallos_seguidos": self._fallos_seguidos,
+                "timeout_s": round(timeout, 2),
+                "muestras_latencia": len(self._latencias),
+                "llamadas_ventana": self._llamadas_ventana,
+                "reintentos_ventana": self._reintentos_ventana
+            }
+
+_circuitos: Dict[str, CircuitoUpstream] = {}
+_circuitos_lock = threading.Lock()
+
+def get_circuito(nombre: str) -> CircuitoUpstream:
+    with _circuitos_lock:
+        if nombre not in _circuitos:
+            timeout_min, timeout_max = TIMEOUTS_UPSTREAM[nombre]
+            _circuitos[nombre] = CircuitoUpstream(nombre, timeout_min, timeout_max)
+        return _circuitos[nombre]
+
+def estado_circuitos() -> Dict[str, Any]:
+    return {nombre: {**get_circuito(nombre).estado(), **_estado_hilos(nombre)} for nombre in TIMEOUTS_UPSTREAM}
+
+def es_transitorio(error: Exception) -> bool:
+    """Timeouts, errores de conexión, 429 y 5xx: merece la pena reintentar"""
+    import requests
+    import httpx
+
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, FuturesTimeout,
+                          requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                          httpx.TimeoutException, httpx.TransportError)):
+        return True
+    respuesta = getattr(error, "response", None)
+    codigo = getattr(respuesta, "status_code", None) or getattr(error, "code", None)
+    return isinstance(codigo, int) and (codigo == 429 or codigo >= 500)
+
+def es_error_de_peticion(error: Exception) -> bool:
+    """4xx (salvo 429): el upstream responde, el problema es la petición concreta"""
+    codigo = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "code", None)
+    return isinstance(codigo, int) and 400 <= codigo < 500 and codigo != 429
+
+def comprobar_respuesta(response: Any) -> Any:
+    """Convierte en excepción las respuestas HTTP que indican un upstream degradado (429 y 5xx)"""
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+def _espera_reintento() -> float:
+    return 0.1 + random.random() * 0.2
+
+# ==================== LLAMADAS ====================
+
+def llamar_con_resiliencia(nombre: str, llamada: Callable[[float], T], plazo: Optional[float] = None) -> T:
+    """
+    Ejecuta `llamada(timeout)` contra un upstream respetando su circuito.
+    Lanza CircuitoAbierto sin llamar si está abierto; si la llamada falla por
+    un error transitorio se reintenta una vez, solo si queda presupuesto.
+    """
+    circuito = get_circuito(nombre)
+    for intento in range(2):
+        if not circuito.permitir():
+            incrementar(f"resiliencia.{nombre}.rechazadas")
+            raise CircuitoAbierto(f"Circuito de {nombre} abierto")
+        timeout = circuito.timeout() if plazo is None else min(plazo, circuito.timeout())
+        inicio = time.perf_counter()
+        _espera_local.segundos = 0.0
+        try:
+            resultado = llamada(timeout)
+        except SaturacionLocal:
+            circuito.liberar()
+            raise
+        except Exception as e:
+            if es_error_de_peticion(e):
+                circuito.registrar_exito()
+                raise
+            circuito.registrar_fallo()
+            if intento == 0 and es_transitorio(e) and circuito.gastar_reintento():
+                incrementar(f"resiliencia.{nombre}.reintentos")
+                logger.warning(f"🔁 Reintentando {nombre} tras error transitorio: {e}")
+                time.sleep(_espera_reintento())
+                continue
+            raise
+        # La espera por un hilo libre de con_timeout no es latencia del upstream
+        circuito.registrar_exito(time.perf_counter() - inicio - _espera_local.segundos)
+        return resultado
+
+async def llamar_con_resiliencia_async(
+    nombre: str,
+    llamada: Callable[[float], Awaitable[T]],
+    plazo: Optional[float] = None
+) -> T:
+    """Variante asíncrona de llamar_con_resiliencia; el timeout se aplica con asyncio.wait_for"""
+    circuito = get_circuito(nombre)
+    for intento in range(2):
+        if not circuito.permitir():
+            incrementar(f"resiliencia.{nombre}.rechazadas")
+            raise CircuitoAbierto(f"Circuito de {nombre} abierto")
+        timeout = circuito.timeout() if plazo is None else min(plazo, circuito.timeout())
+        inicio = time.perf_counter()
+        try:
+            resultado = await asyncio.wait_for(llamada(timeout), timeout)
+        except Exception as e:
+            if es_error_de_peticion(e):
+                circuito.registrar_exito()
+                raise
+            circuito.registrar_fallo()
+            if intento == 0 and es_transitorio(e) and circuito.gastar_reintento():
+                incrementar(f"resiliencia.{nombre}.reintentos")
+                logger.warning(f"🔁 Reintentando {nombre} tras error transitorio: {e}")
+                await asyncio.sleep(_espera_reintento())
+                continue
+            raise
+        circuito.registrar_exito(time.perf_counter() - inicio)
+        return resultado
+
+# Clientes sin timeout propio (google-genai): la llamada corre en un pool por
+# upstream y se deja de esperar al vencer el plazo. El hilo de una llamada
+# abandonada sigue ocupado hasta que el cliente responde, así que el pool tiene
+# tantos hilos como plazas el semáforo y la plaza se devuelve al terminar la
+# llamada, no al abandonarla: con una plaza cogida siempre hay un hilo libre y
+# la llamada arranca sin esperar en la cola del pool. La espera por la plaza
+# sale del mismo plazo (la llamada recibe lo que queda) para no pasarse del
+# plazo del llamante; si no queda nada se lanza SaturacionLocal, que no cuenta
+# como fallo del upstream. hilos_abandonados en estado_circuitos dice cuántas
+# plazas retienen las llamadas abandonadas.
+_ejecutores_timeout: Dict[str, Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]] = {}
+_abandonadas_timeout: Dict[str, int] = {}
+_espera_local = threading.local()
+
+def _ejecutor_timeout(nombre: str) -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    with _circuitos_lock:
+        if nombre not in _ejecutores_timeout:
+            limite = LIMITES_UPSTREAM.get(nombre, 8)
+            _ejecutores_timeout[nombre] = (
+                ThreadPoolExecutor(max_workers=limite, thread_name_prefix=f"timeout-{nombre}"),
+                threading.BoundedSemaphore(limite)
+            )
+            _abandonadas_timeout[nombre] = 0
+        return _ejecutores_timeout[nombre]
+
+def _estado_hilos(nombre: str) -> Dict[str, Any]:
+    with _circuitos_lock:
+        if nombre not in _ejecutores_timeout:
+            return {}
+        return {
+            "hilos": LIMITES_UPSTREAM.get(nombre, 8),
+            "hilos_abandonados": _abandonadas_timeout[nombre]
+        }
+
+def con_timeout(nombre: str, funcion: Callable[[], T], timeout: float) -> T:
+    ejecutor, plazas = _ejecutor_timeout(nombre)
+    inicio_espera = time.perf_counter()
+    if not plazas.acquire(timeout=timeout):
+        incrementar(f"resiliencia.{nombre}.saturadas")
+        raise SaturacionLocal(f"Sin hilos libres para {nombre} en {timeout:.1f}s")
+    espera = time.perf_counter() - inicio_espera
+    _espera_local.segundos = getattr(_espera_local, "segundos", 0.0) + espera
+    restante = timeout - espera
+    if restante <= 0:
+        plazas.release()
+        incrementar(f"resiliencia.{nombre}.saturadas")
+        raise SaturacionLocal(f"Sin plazo para llamar a {nombre} tras {espera:.1f}s esperando hilo")
+
+    estado = {"terminada": False, "abandonada": False}
+
+    def _tarea():
+        try:
+            return funcion()
+        finally:
+            with _circuitos_lock:
+                estado["terminada"] = True
+                if estado["abandonada"]:
+                    _abandonadas_timeout[nombre] -= 1
+            plazas.release()
+
+    futuro = ejecutor.submit(_tarea)
+    try:
+        return futuro.result(timeout=restante)
+    except FuturesTimeout:
+        with _circuitos_lock:
+            if not estado["terminada"]:
+                estado["abandonada"] = True
+                _abandonadas_timeout[nombre] += 1
+        raise TimeoutError(f"{nombre} no respondió en {restante:.1f}s")
@@ -0,0 +1,202 @@
+# services/retencion.py
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Filas borradas por transacción: acota bloqueos y el volumen de WAL de cada commit
+TAMANO_LOTE_PURGA = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+# Pausa entre lotes para no competir con el tráfico de la API
+PAUSA_ENTRE_LOTES = float(os.getenv("RETENTION_BATCH_PAUSE_SECONDS", "0.1"))
+DIRECTORIO_ARCHIVO = os.getenv("RETENTION_ARCHIVE_DIR", "archivo_consultas")
+# Purga programada: 0 = desactivada (solo bajo demanda con DELETE /admin/limpiar)
+DIAS_RETENCION = int(os.getenv("RETENTION_DAYS", "0"))
+INTERVALO_PURGA_HORAS = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+
+# Nota: en PostgreSQL, particionar consultas_noticias por mes (PARTITION BY
+# RANGE (fecha_consulta)) convertiría la purga en un DROP/DETACH PARTITION
+# casi instantáneo. Requiere recrear la tabla, así que se deja como migración
+# manual; mientras tanto el borrado por lotes usa ix_consultas_fecha_id.
+
+_estado_purga: Dict[str, Any] = {"estado": "nunca_ejecutada"}
+_purga_lock = threading.Lock()
+
+def purgar_consultas_antiguas(
+    dias: int,
+    archivar: bool = False,
+    tamano_lote: int = TAMANO_LOTE_PURGA,
+    pausa: float = PAUSA_ENTRE_LOTES
+) -> Dict[str, Any]:
+    """
+    Borra las consultas más antiguas que `dias` en lotes pequeños, cada uno
+    en su propia transacción. Con `archivar`, cada lote se escribe antes a un
+    NDJSON comprimido con gzip y solo se borra una vez sincronizado a disco.
+    """
+    if not _purga_lock.acquire(blocking=False):
+        return {"success": False, "error": "Ya hay una purga en curso"}
+    return _purgar_y_liberar(dias, archivar, tamano_lote, pausa)
+
+def _purgar_y_liberar(dias: int, archivar: bool, tamano_lote: int, pausa: float) -> Dict[str, Any]:
+    """Ejecuta la purga con _purga_lock ya cogido por quien la lanza y lo suelta al terminar"""
+    try:
+        return _purgar(dias, archivar, tamano_lote, pausa)
+    finally:
+        _purga_lock.release()
+
+def _purgar(dias: int, archivar: bool, tamano_lote: int, pausa: float) -> Dict[str, Any]:
+    from database import SessionLocal, ConsultaNoticia
+    from services.textos_consulta import eliminar_textos_huerfanos
+    from services.indice_similitud import get_indice
+
+    inicio = time.perf_counter()
+    ahora = datetime.utcnow()
+    fecha_limite = ahora - timedelta(days=dias)
+    _estado_purga.clear()
+    _estado_purga.update(
+        estado="en_curso", dias=dias, fecha_limite=fecha_limite.isoformat(),
+        eliminadas=0, lotes=0, archivo=None, iniciada=ahora.isoformat(), error=None
+    )
+
+    archivo = crudo = None
+    db = SessionLocal()
+    try:
+        if archivar:
+            os.makedirs(DIRECTORIO_ARCHIVO, exist_ok=True)
+            ruta = os.path.join(
+                DIRECTORIO_ARCHIVO,
+                f"consultas_hasta_{fecha_limite:%Y%m%d}_{ahora:%Y%m%dT%H%M%S}.ndjson.gz"
+            )
+            crudo = open(ruta, "wb")
+            archivo = gzip.GzipFile(fileobj=crudo, mode="wb")
+            _estado_purga["archivo"] = ruta
+
+        columnas = ConsultaNoticia.__table__.columns
+        while True:
+            # Recorre el índice (fecha_consulta, id): cada lote es una lectura acotada
+            if archivar:
+                filas = db.query(ConsultaNoticia)\
+                    .filter(ConsultaNoticia.fecha_consulta < fecha_limite)\
+                    .order_by(ConsultaNoticia.fecha_consulta, ConsultaNoticia.id)\
+                    .limit(tamano_lote)\
+                    .all()
+                claves = [(fila.id, fila.texto_hash) for fila in filas]
+            else:
+                claves = db.query(ConsultaNoticia.id, ConsultaNoticia.texto_hash)\
+                    .filter(ConsultaNoticia.fecha_consulta < fecha_limite)\
+                    .order_by(ConsultaNoticia.fecha_consulta, ConsultaNoticia.id)\
+                    .limit(tamano_lote)\
+                    .all()
+            if not claves:
+                break
+            ids = [fila_id for fila_id, _ in claves]
+
+            if archivar:
+                for fila in filas:
+                    registro = {columna.name: getattr(fila, columna.key) for columna in columnas}
+                    registro["texto_consultado"] = fila.texto
+                    archivo.write((json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode())
+                # El lote queda en disco antes de borrarlo de la BD
+                archivo.flush()
+                crudo.flush()
+                os.fsync(crudo.fileno())
+
+            eliminadas = db.query(ConsultaNoticia)\
+                .filter(ConsultaNoticia.id.in_(ids))\
+                .delete(synchronize_session=False)
+            # Los textos que solo usaban estas consultas se van con ellas
+            eliminar_textos_huerfanos(db, [texto_hash for _, texto_hash in claves])
+            db.commit()
+            db.expunge_all()
+
+            _estado_purga["eliminadas"] += eliminadas
+            _estado_purga["lotes"] += 1
+            if len(ids) < tamano_lote:
+                break
+            if pausa:
+                time.sleep(pausa)
+
+        # Las consultas borradas dejan de proponerse como casi-duplicados
+        if _estado_purga["eliminadas"]:
+            get_indice().compactar(fecha_limite)
+        _estado_purga.update(
+            estado="completada",
+            segundos=round(time.perf_counter() - inicio, 2),
+            finalizada=datetime.utcnow().isoformat()
+        )
+        logger.info(f"🧹 Purga completada: {_estado_purga['eliminadas']} consultas anteriores a {fecha_limite.date()}")
+        return {"success": True, **_estado_purga}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error purgando consultas antiguas: {e}")
+        _estado_purga.update(estado="error", error=str(e))
+        return {"success": False, **_estado_purga}
+    finally:
+        if archivo is not None:
+            archivo.close()
+            crudo.close()
+        db.close()
+
+def iniciar_purga(dias: int, archivar: bool = False) -> bool:
+    """
+    Lanza la purga en segundo plano; False si ya había una en curso. El lock
+    se coge aquí y lo suelta el hilo: dos peticiones a la vez no pueden
+    recibir las dos un 202.
+    """
+    if not _purga_lock.acquire(blocking=False):
+        return False
+    try:
+        threading.Thread(
+            target=_purgar_y_liberar,
+            args=(dias, archivar, TAMANO_LOTE_PURGA, PAUSA_ENTRE_LOTES),
+            name="purga-consultas",
+            daemon=True
+        ).start()
+    except Exception:
+        _purga_lock.release()
+        raise
+    return True
+
+def estado_purga() -> Dict[str, Any]:
+    return dict(_estado_purga)
+
+# ==================== PURGA PROGRAMADA ====================
+
+_parar_programada = threading.Event()
+_hilo_programada: Optional[threading.Thread] = None
+
+def iniciar_retencion_programada(dias: int = DIAS_RETENCION, intervalo_horas: float = INTERVALO_PURGA_HORAS) -> None:
+    """Purga periódica (con archivado) si RETENTION_DAYS > 0"""
+    global _hilo_programada
+    if dias <= 0 or _hilo_programada is not None:
+        return
+
+    def _bucle():
+        while not _parar_programada.wait(intervalo_horas * 3600):
+            purgar_consultas_antiguas(dias, archivar=True)
+
+    _parar_programada.clear()
+    _hilo_programada = threading.Thread(target=_bucle, name="retencion-programada", daemon=True)
+    _hilo_programada.start()
+    logger.info(f"🟢 Retención programada: {dias} días, cada {intervalo_horas}h")
+
+def detener_retencion_programada() -> None:
+    global _hilo_programada
+    if _hilo_programada is not None:
+        _parar_programada.set()
+        _hilo_programada = None
+
+if __name__ == "__main__":
+    # python -m services.retencion <dias> [--archivar]
+    import sys
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    print(purgar_consultas_antiguas(int(sys.argv[1]), archivar="--archivar" in sys.argv[2:]))
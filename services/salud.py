@@ -0,0 +1,193 @@
+# services/salud.py
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from datetime import datetime
+from typing import Dict, Any, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se sondean los servicios externos y la BD en segundo plano
+INTERVALO_SONDEO = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "60"))
+TIMEOUT_SONDEO = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "10"))
+
+# ==================== SONDAS ====================
+# Cada sonda devuelve None si el servicio responde, "no_configurado" si falta
+# su clave, o lanza una excepción. Ninguna genera contenido ni gasta créditos.
+
+def sondear_gemini() -> Optional[str]:
+    """Lee los metadatos del modelo: comprueba clave y conectividad sin gastar tokens"""
+    from services.gemini_analyzer import get_client, MODELO_GEMINI
+
+    if not os.getenv("GEMINI_API_KEY"):
+        return "no_configurado"
+    get_client().models.get(model=MODELO_GEMINI)
+    return None
+
+def sondear_factcheck() -> Optional[str]:
+    import requests
+    from services.factcheck_api import FAKE_CHECK_API, API_KEY
+
+    response = requests.get(
+        FAKE_CHECK_API,
+        params={"query": "test", "pageSize": 1, "key": API_KEY},
+        timeout=TIMEOUT_SONDEO
+    )
+    response.raise_for_status()
+    return None
+
+def sondear_scraperapi() -> Optional[str]:
+    """El endpoint de cuenta de ScraperAPI no consume créditos"""
+    import requests
+
+    api_key = os.getenv("SCRAPERAPI_KEY")
+    if not api_key:
+        return "no_configurado"
+    response = requests.get("http://api.scraperapi.com/account", params={"api_key": api_key}, timeout=TIMEOUT_SONDEO)
+    response.raise_for_status()
+    return None
+
+def sondear_base_datos() -> Optional[str]:
+    from sqlalchemy import text
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+    return None
+
+SONDAS: Dict[str, Callable[[], Optional[str]]] = {
+    "gemini_ai": sondear_gemini,
+    "factcheck_api": sondear_factcheck,
+    "url_extractor": sondear_scraperapi,
+    "database": sondear_base_datos,
+}
+
+def _medir(sonda: Callable[[], Optional[str]]):
+    inicio = time.perf_counter()
+    marca = sonda()
+    return marca, round((time.perf_counter() - inicio) * 1000)
+
+def _ocultar_claves(mensaje: str) -> str:
+    """Los errores de requests incluyen la URL completa, con la clave de la API"""
+    from services.factcheck_api import API_KEY
+
+    for clave in (API_KEY, os.getenv("SCRAPERAPI_KEY"), os.getenv("GEMINI_API_KEY")):
+        # Claves de prueba muy cortas ("x") destrozarían el mensaje
+        if clave and len(clave) >= 8:
+            mensaje = mensaje.replace(clave, "***")
+    return mensaje
+
+# ==================== MONITOR ====================
+
+class MonitorSalud:
+    """
+    Sondea periódicamente los servicios y guarda el último estado de cada uno
+    (resultado, latencia y racha de errores) para servir /status sin llamadas en vivo.
+    """
+
+    def __init__(self, sondas: Dict[str, Callable[[], Optional[str]]] = SONDAS, intervalo: float = INTERVALO_SONDEO):
+        self.sondas = sondas
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._ejecutor = ThreadPoolExecutor(max_workers=len(sondas), thread_name_prefix="sonda")
+        self._estado: Dict[str, Dict[str, Any]] = {
+            nombre: {"estado": "unknown", "errores_consecutivos": 0} for nombre in sondas
+        }
+
+    def sondear(self, servicios: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Sondea en paralelo (todos o los indicados) y actualiza el estado guardado"""
+        nombres = list(servicios) if servicios is not None else list(self.sondas)
+        inicio = time.perf_counter()
+        futuros = {nombre: self._ejecutor.submit(_medir, self.sondas[nombre]) for nombre in nombres}
+
+        for nombre, futuro in futuros.items():
+            error = None
+            latencia_ms = None
+            try:
+                marca, latencia_ms = futuro.result(timeout=max(0.0, TIMEOUT_SONDEO - (time.perf_counter() - inicio)))
+            except FuturesTimeout:
+                marca, error = None, f"Sin respuesta en {TIMEOUT_SONDEO:g}s"
+            except Exception as e:
+                marca, error = None, _ocultar_claves(str(e))
+                latencia_ms = round((time.perf_counter() - inicio) * 1000)
+            self._registrar(nombre, marca, error, latencia_ms)
+
+        return self.estado()
+
+    def _registrar(self, nombre: str, marca: Optional[str], error: Optional[str], latencia_ms: Optional[int]) -> None:
+        ahora = datetime.utcnow().isoformat()
+        with self._lock:
+            anterior = self._estado[nombre]
+            if error is None:
+                estado = {
+                    "estado": marca or "healthy",
+                    "latencia_ms": latencia_ms,
+                    "ultimo_chequeo": ahora,
+                    "ultimo_exito": ahora,
+                    "errores_consecutivos": 0
+                }
+            else:
+                if anterior.get("errores_consecutivos", 0) == 0:
+                    logger.warning(f"⚠️ Servicio {nombre} no disponible: {error}")
+                estado = {
+                    "estado": "error",
+                    "latencia_ms": latencia_ms,
+                    "ultimo_chequeo": ahora,
+                    "ultimo_exito": anterior.get("ultimo_exito"),
+                    "errores_consecutivos": anterior.get("errores_consecutivos", 0) + 1,
+                    "error": error
+                }
+            self._estado[nombre] = estado
+
+    def estado(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {nombre: dict(estado) for nombre, estado in self._estado.items()}
+
+    def iniciar(self) -> None:
+        self._hilo = threading.Thread(target=self._bucle, name="monitor-salud", daemon=True)
+        self._hilo.start()
+        logger.info(f"🟢 Monitor de salud iniciado (cada {self.intervalo:g}s)")
+
+    def detener(self) -> None:
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=TIMEOUT_SONDEO)
+        self._ejecutor.shutdown(wait=False)
+
+    def _bucle(self) -> None:
+        # Primer sondeo al arrancar; después, cada intervalo
+        while True:
+            try:
+                self.sondear()
+            except Exception as e:
+                logger.error(f"❌ Error en el monitor de salud: {e}")
+            if self._parar.wait(self.intervalo):
+                break
+
+# Monitor global del proceso
+_monitor = None
+
+def get_monitor() -> MonitorSalud:
+    global _monitor
+    if _monitor is None:
+        _monitor = MonitorSalud()
+    return _monitor
+
+def iniciar_monitor_salud() -> MonitorSalud:
+    monitor = get_monitor()
+    if monitor._hilo is None:
+        monitor.iniciar()
+    return monitor
+
+def detener_monitor_salud() -> None:
+    global _monitor
+    if _monitor is not None:
+        _monitor.detener()
+        _monitor = None
@@ -0,0 +1,199 @@
+# services/textos_consulta.py
+import sys
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE_MIGRACION = 1000
+
+def hash_texto(texto: str) -> str:
+    """Clave de contenido del texto exacto (sha256 en hexadecimal)"""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+def _insertar_textos(db: Session, valores: List[Dict[str, Any]]) -> None:
+    """
+    Un solo INSERT multi-fila que ignora conflictos: dos escrituras simultáneas
+    del mismo texto nuevo no fallan
+    """
+    from database import TextoConsulta
+
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(TextoConsulta).values(valores).on_conflict_do_nothing())
+        return
+    if dialecto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(TextoConsulta).values(valores).on_conflict_do_nothing())
+        return
+
+    # Sin ON CONFLICT: si otro proceso insertó alguno de los textos a la vez, se
+    # repite fila a fila en su savepoint y el duplicado se da por bueno
+    conexion = db.connection()
+    try:
+        with conexion.begin_nested():
+            conexion.execute(TextoConsulta.__table__.insert(), valores)
+        return
+    except IntegrityError:
+        logger.info("🔁 Textos insertados a la vez por otra escritura: se repite fila a fila")
+    for fila in valores:
+        try:
+            with conexion.begin_nested():
+                conexion.execute(TextoConsulta.__table__.insert().values(**fila))
+        except IntegrityError:
+            pass
+
+def obtener_o_crear_textos(db: Session, textos: Iterable[str]) -> Dict[str, Any]:
+    """
+    Filas de textos_consulta de `textos` por hash, insertando las que falten.
+    Tres consultas como mucho para todo el conjunto: SELECT de los que ya
+    existen, INSERT de los nuevos y SELECT de lo insertado.
+    """
+    from database import TextoConsulta
+
+    por_hash = {hash_texto(texto): texto for texto in textos}
+    if not por_hash:
+        return {}
+
+    filas = {fila.hash: fila for fila in db.query(TextoConsulta).filter(TextoConsulta.hash.in_(list(por_hash)))}
+    nuevos = [clave for clave in por_hash if clave not in filas]
+    if nuevos:
+        ahora = datetime.utcnow()
+        _insertar_textos(db, [
+            {"hash": clave, "texto": por_hash[clave], "longitud": len(por_hash[clave]), "fecha_creacion": ahora}
+            for clave in nuevos
+        ])
+        filas.update((fila.hash, fila) for fila in db.query(TextoConsulta).filter(TextoConsulta.hash.in_(nuevos)))
+    return filas
+
+def obtener_o_crear_texto(db: Session, texto: str) -> Any:
+    """Fila de textos_consulta para `texto`, insertándola si no existe"""
+    return obtener_o_crear_textos(db, [texto])[hash_texto(texto)]
+
+def deduplicar_textos(session: Session, contexto, instancias) -> None:
+    """
+    before_flush: las consultas nuevas guardan su texto en textos_consulta
+    (una vez por contenido) y solo referencian su hash. Los textos de todo el
+    flush se resuelven juntos, así un add_all de un lote no va fila a fila.
+    """
+    from database import ConsultaNoticia
+
+    consultas = [
+        consulta for consulta in session.new
+        if isinstance(consulta, ConsultaNoticia) and consulta.texto_consultado is not None
+    ]
+    if not consultas:
+        return
+    filas = obtener_o_crear_textos(session, (consulta.texto_consultado for consulta in consultas))
+    for consulta in consultas:
+        consulta.texto_guardado = filas[hash_texto(consulta.texto_consultado)]
+        consulta.texto_consultado = None
+
+def eliminar_textos_huerfanos(db: Session, hashes) -> int:
+    """Borra los textos de `hashes` que ya no referencia ninguna consulta"""
+    from database import ConsultaNoticia, TextoConsulta
+
+    hashes = [clave for clave in set(hashes) if clave]
+    if not hashes:
+        return 0
+    referenciados = db.query(ConsultaNoticia.texto_hash)\
+        .filter(ConsultaNoticia.texto_hash.in_(hashes))\
+        .distinct()
+    return db.query(TextoConsulta)\
+        .filter(TextoConsulta.hash.in_(hashes))\
+        .filter(TextoConsulta.hash.notin_(referenciados))\
+        .delete(synchronize_session=False)
+
+# ==================== MIGRACIÓN ====================
+
+def migrar_textos(tamano_lote: int = TAMANO_LOTE_MIGRACION) -> Dict[str, int]:
+    """
+    Mueve texto_consultado de las filas antiguas a textos_consulta. Recorre
+    por id en lotes con un commit por lote; se puede interrumpir y relanzar.
+    """
+    from database import SessionLocal, ConsultaNoticia
+
+    totales = {"migradas": 0}
+    ultimo_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            filas = db.query(ConsultaNoticia)\
+                .filter(ConsultaNoticia.id > ultimo_id)\
+                .filter(ConsultaNoticia.texto_hash.is_(None))\
+                .filter(ConsultaNoticia.texto_consultado.isnot(None))\
+                .order_by(ConsultaNoticia.id)\
+                .limit(tamano_lote)\
+                .all()
+            if not filas:
+                break
+
+            textos = obtener_o_crear_textos(db, (fila.texto_consultado for fila in filas))
+            for fila in filas:
+                fila.texto_guardado = textos[hash_texto(fila.texto_consultado)]
+                fila.texto_consultado = None
+
+            totales["migradas"] += len(filas)
+            ultimo_id = filas[-1].id
+            db.commit()
+            logger.info(f"🔁 Migración de textos: {totales['migradas']} consultas (hasta id {ultimo_id})")
+    finally:
+        db.close()
+
+    logger.info(f"✅ Migración de textos terminada: {totales}")
+    return totales
+
+def informe_almacenamiento(db: Session) -> Dict[str, Any]:
+    """
+    Compara el texto que ocuparían las consultas guardando cada una su copia
+    con lo que ocupa deduplicado (un texto por contenido + un hash por fila)
+    """
+    from database import ConsultaNoticia, TextoConsulta
+
+    consultas, con_hash, caracteres_referenciados = db.query(
+        func.count(ConsultaNoticia.id),
+        func.count(ConsultaNoticia.texto_hash),
+        func.sum(TextoConsulta.longitud)
+    ).outerjoin(TextoConsulta, ConsultaNoticia.texto_hash == TextoConsulta.hash).one()
+    caracteres_sin_migrar = db.query(func.sum(func.length(ConsultaNoticia.texto_consultado))).scalar()
+    textos, caracteres_distintos = db.query(func.count(TextoConsulta.hash), func.sum(TextoConsulta.longitud)).one()
+
+    caracteres_referenciados = int(caracteres_referenciados or 0)
+    caracteres_distintos = int(caracteres_distintos or 0)
+    caracteres_sin_migrar = int(caracteres_sin_migrar or 0)
+
+    sin_deduplicar = caracteres_referenciados + caracteres_sin_migrar
+    # El hash (64 caracteres) se repite en la consulta y en la fila del texto
+    deduplicado = caracteres_distintos + 64 * (con_hash + textos) + caracteres_sin_migrar
+    return {
+        "consultas": consultas,
+        "consultas_migradas": con_hash,
+        "textos_distintos": textos,
+        "repeticiones_por_texto": round(con_hash / textos, 2) if textos else 0,
+        "caracteres_sin_deduplicar": sin_deduplicar,
+        "caracteres_deduplicados": deduplicado,
+        "ahorro_porcentaje": round(100 * (1 - deduplicado / sin_deduplicar), 1) if sin_deduplicar else 0
+    }
+
+if __name__ == "__main__":
+    # python -m services.textos_consulta [--informe]
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from database import create_tables, SessionLocal
+    create_tables()
+    if "--informe" not in sys.argv[1:]:
+        print(migrar_textos())
+    db = SessionLocal()
+    try:
+        print(informe_almacenamiento(db))
+    finally:
+        db.close()
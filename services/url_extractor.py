@@ -1,11 +1,22 @@
 import requests
+import asyncio
 import os
 import logging
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from services.coalescencia import get_coalescedor
+from services.limites import limite_upstream
+from services.clientes_http import cliente_upstream
+from services.resiliencia import llamar_con_resiliencia, llamar_con_resiliencia_async, comprobar_respuesta
 
 logger = logging.getLogger(__name__)
 
+SCRAPERAPI_URL = "http://api.scraperapi.com/"
+# Parámetros que no cambian el contenido de la página
+_PREFIJOS_SEGUIMIENTO = ("utm_", "fbclid", "gclid", "igshid", "mc_", "ref_src")
+MENSAJE_SIN_CONTENIDO = "❌ No se pudo extraer contenido automáticamente de este enlace. Por favor, copia y pega el texto manualmente."
+
 def extraer_con_scraperapi(url: str) -> str:
     """
     Extrae contenido usando ScraperAPI
@@ -19,41 +30,54 @@ def extraer_con_scraperapi(url: str) -> str:
         
         logger.info(f"🔗 ScraperAPI procesando: {url}")
         
-        params = {
-            "api_key": api_key,
-            "url": url,
-            "render": "false",    # Más rápido sin JavaScript
-            "autoparse": "true",  # Que ScraperAPI limpie el HTML
-            "country_code": "us"
-        }
-        
-        response = requests.get(
-            "http://api.scraperapi.com/",
-            params=params,
-            timeout=20
+        response = llamar_con_resiliencia(
+            "scraperapi",
+            lambda limite: comprobar_respuesta(requests.get(
+                SCRAPERAPI_URL,
+                params=_parametros_scraperapi(api_key, url),
+                timeout=limite
+            ))
         )
         
         logger.info(f"📡 ScraperAPI status: {response.status_code}")
         
         if response.status_code == 200:
-            # Procesar HTML devuelto por ScraperAPI
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Limpiar elementos no deseados
-            for element in soup(["script", "style", "nav", "header", "footer", "aside", "meta"]):
-                element.decompose()
-            
-            # Estrategia de extracción inteligente
-            contenido = extraer_contenido_estrategico(soup)
+            return procesar_html_scraperapi(response.content)
+        else:
+            logger.error(f"ScraperAPI error: {response.status_code}")
+            return ""
             
-            if contenido:
-                contenido = limpiar_texto(contenido)
-                logger.info(f"✅ ScraperAPI extrajo {len(contenido)} caracteres")
-                return contenido
-            else:
-                logger.warning("ScraperAPI no pudo extraer contenido")
-                return ""
-                
+    except Exception as e:
+        logger.error(f"Error ScraperAPI: {str(e)}")
+        return ""
+
+async def extraer_con_scraperapi_async(url: str) -> str:
+    """
+    Variante asíncrona de extraer_con_scraperapi (no bloquea el event loop)
+    """
+    try:
+        api_key = os.getenv("SCRAPERAPI_KEY")
+        
+        if not api_key:
+            logger.warning("SCRAPERAPI_KEY no configurada")
+            return ""
+        
+        logger.info(f"🔗 ScraperAPI (async) procesando: {url}")
+        
+        async def _pedir(limite: float):
+            client = cliente_upstream("scraperapi")
+            return comprobar_respuesta(await client.get(
+                SCRAPERAPI_URL, params=_parametros_scraperapi(api_key, url), timeout=limite
+            ))
+        
+        async with limite_upstream("scraperapi"):
+            response = await llamar_con_resiliencia_async("scraperapi", _pedir)
+        
+        logger.info(f"📡 ScraperAPI status: {response.status_code}")
+        
+        if response.status_code == 200:
+            # El parseo con BeautifulSoup es CPU: fuera del event loop
+            return await asyncio.to_thread(procesar_html_scraperapi, response.content)
         else:
             logger.error(f"ScraperAPI error: {response.status_code}")
             return ""
@@ -62,6 +86,36 @@ def extraer_con_scraperapi(url: str) -> str:
         logger.error(f"Error ScraperAPI: {str(e)}")
         return ""
 
+def _parametros_scraperapi(api_key: str, url: str) -> dict:
+    return {
+        "api_key": api_key,
+        "url": url,
+        "render": "false",    # Más rápido sin JavaScript
+        "autoparse": "true",  # Que ScraperAPI limpie el HTML
+        "country_code": "us"
+    }
+
+def procesar_html_scraperapi(html: bytes) -> str:
+    """
+    Limpia el HTML devuelto por ScraperAPI y extrae el contenido principal
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Limpiar elementos no deseados
+    for element in soup(["script", "style", "nav", "header", "footer", "aside", "meta"]):
+        element.decompose()
+    
+    # Estrategia de extracción inteligente
+    contenido = extraer_contenido_estrategico(soup)
+    
+    if contenido:
+        contenido = limpiar_texto(contenido)
+        logger.info(f"✅ ScraperAPI extrajo {len(contenido)} caracteres")
+        return contenido
+    else:
+        logger.warning("ScraperAPI no pudo extraer contenido")
+        return ""
+
 def extraer_contenido_estrategico(soup: BeautifulSoup) -> str:
     """
     Extrae contenido usando múltiples estrategias
@@ -122,31 +176,90 @@ def limpiar_texto(texto: str) -> str:
     
     return texto
 
+def _normalizar_url(url: str) -> str:
+    """
+    Añade esquema si falta; lanza ValueError si el dominio no es válido
+    """
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    parsed_url = urlparse(url)
+    if not parsed_url.netloc:
+        raise ValueError("URL inválida - dominio no válido")
+    
+    return url
+
+def canonizar_url(url: str) -> str:
+    """
+    Forma canónica de una URL: esquema y dominio en minúsculas, sin fragmento,
+    sin parámetros de seguimiento y sin barra final
+    """
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parsed_url = urlparse(url.strip())
+    parametros = [
+        (clave, valor) for clave, valor in parse_qsl(parsed_url.query, keep_blank_values=True)
+        if not clave.lower().startswith(_PREFIJOS_SEGUIMIENTO)
+    ]
+    return urlunparse((
+        parsed_url.scheme.lower(),
+        parsed_url.netloc.lower(),
+        parsed_url.path.rstrip('/') or '/',
+        parsed_url.params,
+        urlencode(sorted(parametros)),
+        ''
+    ))
+
 def extraer_texto_desde_url(url: str) -> str:
     """
     Función principal - usa ScraperAPI como primario
     """
     try:
-        # Normalizar URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        parsed_url = urlparse(url)
-        if not parsed_url.netloc:
-            return "❌ URL inválida - dominio no válido"
+        try:
+            url = _normalizar_url(url)
+        except ValueError as e:
+            return f"❌ {str(e)}"
         
         logger.info(f"🌐 Iniciando extracción para: {url}")
         
-        # 1. PRIMERO: Intentar con ScraperAPI
-        resultado = extraer_con_scraperapi(url)
+        # 1. PRIMERO: Intentar con ScraperAPI (una sola llamada por URL canónica en vuelo)
+        resultado, _ = get_coalescedor("urls").ejecutar(
+            canonizar_url(url), lambda: extraer_con_scraperapi(url)
+        )
         
         if resultado:
             return resultado
         
         # 2. Si ScraperAPI no devuelve contenido, mensaje claro
         logger.info("ScraperAPI no pudo extraer contenido")
-        return "❌ No se pudo extraer contenido automáticamente de este enlace. Por favor, copia y pega el texto manualmente."
+        return MENSAJE_SIN_CONTENIDO
+        
+    except Exception as e:
+        logger.error(f"Error en extracción: {str(e)}")
+        return f"❌ Error procesando enlace: {str(e)}" 
+
+async def extraer_texto_desde_url_async(url: str) -> str:
+    """
+    Variante asíncrona de extraer_texto_desde_url
+    """
+    try:
+        try:
+            url = _normalizar_url(url)
+        except ValueError as e:
+            return f"❌ {str(e)}"
+        
+        logger.info(f"🌐 Iniciando extracción (async) para: {url}")
+        
+        resultado, _ = await get_coalescedor("urls").ejecutar_async(
+            canonizar_url(url), lambda: extraer_con_scraperapi_async(url)
+        )
+        
+        if resultado:
+            return resultado
+        
+        logger.info("ScraperAPI no pudo extraer contenido")
+        return MENSAJE_SIN_CONTENIDO
         
     except Exception as e:
         logger.error(f"Error en extracción: {str(e)}")
-        return f"❌ Error procesando enlace: {str(e)}"
\ No newline at end of file
+        return f"❌ Error procesando enlace: {str(e)}"
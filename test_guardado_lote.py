@@ -0,0 +1,80 @@
+# test_guardado_lote.py
+# Guardado de los bloques de /verificar/lote cuando falla el commit: las
+# filas se reintentan una a una y las que no se guardan salen como error.
+#
+# Uso: python -m pytest -q test_guardado_lote.py (o python test_guardado_lote.py)
+import os
+import json
+import tempfile
+from types import SimpleNamespace
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/test_guardado_lote.db")
+
+from sqlalchemy import event
+
+from database import create_tables, SessionLocal, ConsultaNoticia
+from services.hybrid_verifier import _guardar_bloque_lote, _columnas_consulta
+
+create_tables()
+
+def _pendientes(textos):
+    pendientes = []
+    for indice, texto in enumerate(textos):
+        resultado = {"resultado_final": "mixto", "fuente_primaria": "gemini", "confianza": 6}
+        salida = {
+            "texto": texto,
+            "modo": "ia_first",
+            "resultado": resultado,
+            "nuevo": False,
+            "columnas": _columnas_consulta(resultado, "ia_first", 10)
+        }
+        pendientes.append((indice, SimpleNamespace(url=None, usuario_id="test-lote"), salida))
+    return pendientes
+
+class _FallarCommit:
+    """Hace fallar los flush con más de `maximo` consultas nuevas (None: todos)"""
+
+    def __init__(self, maximo=None):
+        self.maximo = maximo
+
+    def __call__(self, session, contexto, instancias):
+        nuevas = [fila for fila in session.new if isinstance(fila, ConsultaNoticia)]
+        if self.maximo is None or len(nuevas) > self.maximo:
+            raise RuntimeError("commit forzado a fallar")
+
+    def __enter__(self):
+        event.listen(SessionLocal, "before_flush", self)
+        return self
+
+    def __exit__(self, *error):
+        event.remove(SessionLocal, "before_flush", self)
+
+def _guardadas_de_prueba() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ConsultaNoticia).filter(ConsultaNoticia.usuario_id == "test-lote").count()
+    finally:
+        db.close()
+
+def test_bloque_fallido_se_reintenta_fila_a_fila():
+    antes = _guardadas_de_prueba()
+    with _FallarCommit(maximo=1):
+        lineas = [json.loads(linea) for linea in _guardar_bloque_lote(_pendientes(["uno", "dos", "tres"]))]
+
+    assert [linea["indice"] for linea in lineas] == [0, 1, 2]
+    assert all(linea["success"] and linea["consulta_id"] for linea in lineas)
+    assert _guardadas_de_prueba() == antes + 3
+
+def test_filas_sin_guardar_salen_como_error():
+    antes = _guardadas_de_prueba()
+    with _FallarCommit():
+        lineas = [json.loads(linea) for linea in _guardar_bloque_lote(_pendientes(["uno", "dos"]))]
+
+    assert all(not linea["success"] and linea["resultado"] == "error_guardado" for linea in lineas)
+    assert _guardadas_de_prueba() == antes
+
+if __name__ == "__main__":
+    test_bloque_fallido_se_reintenta_fila_a_fila()
+    test_filas_sin_guardar_salen_como_error()
+    print("✅ Guardado de lotes con commit fallido")